@@ -0,0 +1,286 @@
+"""
+HTTP JSON API over movie_storage_sql, served by aiohttp.
+
+The event loop only parses requests and writes responses; every SQLAlchemy
+call runs in a bounded thread pool (so at most `db_workers` connections are
+busy at once) and OMDb lookups run in a second, smaller pool so slow network
+calls cannot starve the database. Concurrent lookups of the same title share
+one OMDb request (single-flight).
+
+Run:
+    python movies.py serve --port 8080
+"""
+import asyncio
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from aiohttp import web
+
+import metrics
+import movie_storage_sql as storage
+import omdb_api
+import site_generator
+from omdb_cache import normalize_title
+
+STATIC_DIR = "_static"
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one: the first caller
+    runs `func` in the executor, everyone arriving while it is in flight
+    awaits the same result. Nothing is cached once the call has finished.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key, executor, func, *args):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+        self.calls += 1
+        future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        self._inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+#  Application state
+DB_EXECUTOR = web.AppKey("db_executor", ThreadPoolExecutor)
+OMDB_EXECUTOR = web.AppKey("omdb_executor", ThreadPoolExecutor)
+OMDB_FLIGHT = web.AppKey("omdb_flight", SingleFlight)
+SITE_FLIGHT = web.AppKey("site_flight", SingleFlight)
+OUTPUT_DIR = web.AppKey("output_dir", str)
+SITE_PAGE_SIZE = web.AppKey("site_page_size", object)
+
+
+async def run_db(request, func, *args, **kwargs):
+    """Run a blocking storage call in the bounded database pool."""
+    call = functools.partial(func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(request.app[DB_EXECUTOR], call)
+
+
+async def lookup_movie(request, title):
+    """fetch_movie through the OMDb pool, de-duplicating concurrent lookups of the same title."""
+    app = request.app
+    return await app[OMDB_FLIGHT].do(("omdb", normalize_title(title)), app[OMDB_EXECUTOR],
+                                       omdb_api.fetch_movie, title)
+
+
+def json_error(status, message):
+    return web.json_response({"error": message}, status=status)
+
+
+def http_error(exception_class, message):
+    """An aiohttp HTTP exception with a JSON error body, for raising from helpers."""
+    return exception_class(text=json.dumps({"error": message}), content_type="application/json")
+
+
+async def read_json(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise http_error(web.HTTPBadRequest, "Invalid JSON body")
+    if not isinstance(body, dict):
+        raise http_error(web.HTTPBadRequest, "Expected a JSON object")
+    return body
+
+
+def _query_param(request, name, convert, default=None):
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise http_error(web.HTTPBadRequest, f"Invalid value for {name}")
+
+
+async def _require_user(request):
+    username = request.match_info["user"]
+    if await run_db(request, storage.get_user_id, username) is None:
+        raise http_error(web.HTTPNotFound, f"User not found: {username}")
+    return username
+
+
+#  Users
+async def list_users(request):
+    users = await run_db(request, storage.list_users)
+    return web.json_response([{"username": name} for name in users])
+
+
+async def create_user(request):
+    username = str((await read_json(request)).get("username", "")).strip()
+    if not username:
+        return json_error(400, "username is required")
+    error = storage.username_error(username)
+    if error:
+        return json_error(400, error)
+    if await run_db(request, storage.get_user_id, username) is not None:
+        return json_error(409, f"User already exists: {username}")
+    await run_db(request, storage.add_user, username)
+    return web.json_response({"username": username}, status=201)
+
+
+#  Movies
+async def list_movies(request):
+    username = await _require_user(request)
+    try:
+        movies = await run_db(
+            request, storage.query_movies, username,
+            order_by=request.query.get("sort", "id"),
+            descending=request.query.get("desc", "").lower() in ("1", "true", "yes"),
+            limit=_query_param(request, "limit", int),
+            offset=_query_param(request, "offset", int, 0),
+            title_like=request.query.get("title") or None,
+            min_year=_query_param(request, "min_year", int),
+            max_year=_query_param(request, "max_year", int),
+            min_rating=_query_param(request, "min_rating", float),
+            max_rating=_query_param(request, "max_rating", float),
+        )
+    except ValueError as e:
+        return json_error(400, str(e))
+    return web.json_response(movies)
+
+
+async def add_movie(request):
+    username = await _require_user(request)
+    body = await read_json(request)
+    title = str(body.get("title", "")).strip()
+    if not title:
+        return json_error(400, "title is required")
+    if body.get("year") is not None and body.get("rating") is not None:
+        movie = {"title": title, "year": body["year"], "rating": body["rating"],
+                 "poster_url": body.get("poster_url", "")}
+    else:
+        movie = await lookup_movie(request, title)
+        if not movie:
+            return json_error(404, f"Movie not found: {title}")
+    [outcome] = await run_db(request, storage.add_movies_bulk, [movie], user=username)
+    status = {"added": 201, "duplicate": 409, "user_not_found": 404}.get(outcome, 400)
+    return web.json_response({"outcome": outcome, **movie}, status=status)
+
+
+async def get_movie(request):
+    username = await _require_user(request)
+    movie_id = int(request.match_info["movie_id"])
+    movie = await run_db(request, storage.get_movie, username, movie_id)
+    if movie is None:
+        return json_error(404, f"Movie not found: {movie_id}")
+    return web.json_response(movie)
+
+
+async def update_movie(request):
+    username = await _require_user(request)
+    movie_id = int(request.match_info["movie_id"])
+    rating = (await read_json(request)).get("rating")
+    if not isinstance(rating, (int, float)) or not 0 <= rating <= 10:
+        return json_error(400, "rating must be a number between 0 and 10")
+    [outcome] = await run_db(request, storage.update_ratings_bulk, [(movie_id, rating)], user=username)
+    if outcome != "updated":
+        return json_error(404, f"Movie not found: {movie_id}")
+    return web.json_response({"id": movie_id, "rating": rating, "outcome": outcome})
+
+
+async def delete_movie(request):
+    username = await _require_user(request)
+    movie_id = int(request.match_info["movie_id"])
+    [outcome] = await run_db(request, storage.delete_movies_bulk, [movie_id], user=username)
+    if outcome != "deleted":
+        return json_error(404, f"Movie not found: {movie_id}")
+    return web.json_response({"id": movie_id, "outcome": outcome})
+
+
+async def search_movies(request):
+    username = await _require_user(request)
+    query = request.query.get("q", "")
+    mode = request.query.get("mode", "prefix")
+    if mode not in storage.SEARCH_MODES:
+        return json_error(400, f"mode must be one of {', '.join(storage.SEARCH_MODES)}")
+    results = await run_db(request, storage.search_movies, username, query,
+                           limit=_query_param(request, "limit", int, 20), mode=mode)
+    return web.json_response(results)
+
+
+async def movie_stats(request):
+    username = await _require_user(request)
+    return web.json_response(await run_db(request, storage.movie_stats, username))
+
+
+#  Sites
+async def user_site(request):
+    """(Re)generate the user's site if it changed, then redirect to the static page."""
+    username = await _require_user(request)
+    page = _query_param(request, "page", int, 1)
+    app = request.app
+    status = await app[SITE_FLIGHT].do(("site", username), app[DB_EXECUTOR], functools.partial(
+        site_generator.generate_site, username,
+        output_dir=app[OUTPUT_DIR], page_size=app[SITE_PAGE_SIZE]))
+    if status == "no_movies":
+        return json_error(404, f"No movies available for {username}")
+    if status not in ("generated", "unchanged"):
+        return json_error(500, f"Site generation failed: {status}")
+    filename = site_generator.page_filename(username, page)
+    if not os.path.exists(os.path.join(app[OUTPUT_DIR], filename)):
+        return json_error(404, f"Page not found: {page}")
+    raise web.HTTPFound(f"/sites/{quote(filename)}")
+
+
+#  Metrics
+async def metrics_endpoint(request):
+    """Prometheus text format by default, ?format=json for the JSON export."""
+    if request.query.get("format") == "json":
+        return web.json_response(metrics.to_dict())
+    return web.Response(body=metrics.to_prometheus().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+async def _shutdown_executors(app):
+    app[DB_EXECUTOR].shutdown(wait=True)
+    app[OMDB_EXECUTOR].shutdown(wait=True)
+
+
+def create_app(db_workers=8, omdb_workers=4, output_dir=None, site_page_size=None):
+    """Build the aiohttp application with its own thread pools."""
+    output_dir = output_dir or site_generator.OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    app = web.Application()
+    app[DB_EXECUTOR] = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="db")
+    app[OMDB_EXECUTOR] = ThreadPoolExecutor(max_workers=omdb_workers, thread_name_prefix="omdb")
+    app[OMDB_FLIGHT] = SingleFlight()
+    app[SITE_FLIGHT] = SingleFlight()
+    app[OUTPUT_DIR] = output_dir
+    app[SITE_PAGE_SIZE] = site_page_size
+    app.on_cleanup.append(_shutdown_executors)
+
+    app.router.add_get("/users", list_users)
+    app.router.add_post("/users", create_user)
+    app.router.add_get("/users/{user}/movies", list_movies)
+    app.router.add_post("/users/{user}/movies", add_movie)
+    app.router.add_get(r"/users/{user}/movies/{movie_id:\d+}", get_movie)
+    app.router.add_patch(r"/users/{user}/movies/{movie_id:\d+}", update_movie)
+    app.router.add_delete(r"/users/{user}/movies/{movie_id:\d+}", delete_movie)
+    app.router.add_get("/users/{user}/search", search_movies)
+    app.router.add_get("/users/{user}/stats", movie_stats)
+    app.router.add_get("/users/{user}/site", user_site)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.router.add_static("/sites/", output_dir)
+    if os.path.isdir(STATIC_DIR):
+        app.router.add_static("/_static/", STATIC_DIR)
+    return app
+
+
+def serve(host="127.0.0.1", port=8080, db_workers=8, omdb_workers=4, site_page_size=None):
+    storage.init_db()
+    web.run_app(create_app(db_workers, omdb_workers, site_page_size=site_page_size), host=host, port=port)
@@ -0,0 +1,119 @@
+"""
+Load-test the HTTP API against a temp database and report p50/p99 latency
+per endpoint. The server runs in-process on a random port; the client keeps
+`--concurrency` requests in flight over one aiohttp session.
+
+Run from the project root:
+    python -m benchmarks.bench_api --movies 5000 --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+import api_server
+import movie_storage_sql as storage
+
+USER = "bench"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def request_mix(rng, total):
+    """(name, method, path, params/json) tuples: mostly reads, some writes."""
+    for i in range(total):
+        roll = rng.random()
+        if roll < 0.45:
+            yield "list", "GET", f"/users/{USER}/movies", {"sort": "rating", "desc": "1", "limit": "20"}
+        elif roll < 0.75:
+            yield "search", "GET", f"/users/{USER}/search", {"q": rng.choice(("star", "dark", "king", "moo"))}
+        elif roll < 0.85:
+            yield "stats", "GET", f"/users/{USER}/stats", None
+        else:
+            yield "add", "POST", f"/users/{USER}/movies", {"title": f"Load Movie {i}", "year": 2024, "rating": 5.0}
+
+
+async def run_load(base_url, requests, concurrency):
+    latencies = {}
+    statuses = {}
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+
+    async def worker(session):
+        while not queue.empty():
+            name, method, path, payload = queue.get_nowait()
+            kwargs = {"json": payload} if method == "POST" else {"params": payload}
+            start = time.perf_counter()
+            async with session.request(method, base_url + path, **kwargs) as response:
+                await response.read()
+            latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+async def main_async(args):
+    app = api_server.create_app(db_workers=args.db_workers, output_dir=os.path.join(args.directory, "sites"))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        rng = random.Random(42)
+        return await run_load(f"http://127.0.0.1:{port}", list(request_mix(rng, args.requests)), args.concurrency)
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movies", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-workers", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    words = ("star", "night", "dark", "king", "moon", "river", "ghost", "iron")
+    with tempfile.TemporaryDirectory() as directory:
+        args.directory = directory
+        storage.engine = storage.create_storage_engine(f"sqlite:///{os.path.join(directory, 'api.db')}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.init_db()
+            storage.add_user(USER)
+        storage.add_movies_bulk([{"title": f"{rng.choice(words).title()} {rng.choice(words).title()} {i}",
+                                  "year": rng.randint(1950, 2024), "rating": round(rng.uniform(1, 10), 1)}
+                                 for i in range(args.movies)], user=USER)
+
+        latencies, statuses, elapsed = asyncio.run(main_async(args))
+        storage.engine.dispose()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{total} requests, concurrency {args.concurrency}, {args.db_workers} db threads: "
+          f"{total / elapsed:.0f} req/s, statuses {dict(sorted(statuses.items()))}")
+    print(f"{'endpoint':<10} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for name, values in sorted(latencies.items()):
+        print(f"{name:<10} {len(values):7d} {percentile(values, 0.5):9.2f} "
+              f"{percentile(values, 0.99):9.2f} {statistics.fmean(values):9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare the single-row storage functions with the bulk (executemany) ones.
+
+Run from the project root:
+    python -m benchmarks.bench_bulk_writes --rows 10000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import movie_storage_sql as storage
+
+USER = "bench"
+
+
+def fresh_db(directory, name):
+    storage.engine = storage.create_storage_engine(f"sqlite:///{os.path.join(directory, name)}")
+    storage.init_db()
+    storage.add_user(USER)
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    # The single-row functions print one line per row
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    seconds = time.perf_counter() - start
+    return label, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    movies = [{"title": f"Movie {i}", "year": 1950 + i % 70, "rating": (i % 100) / 10, "poster_url": ""}
+              for i in range(args.rows)]
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        with contextlib.redirect_stdout(io.StringIO()):
+            fresh_db(directory, "single.db")
+        results.append(timed("add_movie (single)", lambda: [
+            storage.add_movie(m["title"], m["year"], m["rating"], m["poster_url"], user=USER) for m in movies
+        ]))
+        ids = list(storage.list_movies(USER).keys())
+        results.append(timed("update_movie (single)", lambda: [
+            storage.update_movie(movie_id, 5.0, user=USER) for movie_id in ids
+        ]))
+        results.append(timed("delete_movie (single)", lambda: [
+            storage.delete_movie(movie_id, user=USER) for movie_id in ids
+        ]))
+        storage.engine.dispose()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            fresh_db(directory, "bulk.db")
+        results.append(timed("add_movies_bulk", lambda: storage.add_movies_bulk(movies, user=USER)))
+        ids = list(storage.list_movies(USER).keys())
+        results.append(timed("update_ratings_bulk", lambda: storage.update_ratings_bulk(
+            [(movie_id, 5.0) for movie_id in ids], user=USER)))
+        results.append(timed("delete_movies_bulk", lambda: storage.delete_movies_bulk(ids, user=USER)))
+        storage.engine.dispose()
+
+    print(f"{args.rows} rows")
+    for label, seconds in results:
+        print(f"{label:<24} {seconds:8.3f}s  {args.rows / seconds:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Memory and build time of list_movies results per 100k rows: the old
+dict-per-row shape, Movie records and the columnar MovieColumns.
+
+"retained" is what the result keeps alive (tracemalloc, after building),
+"peak" includes temporary allocations such as the fetched database rows;
+"build" is the best of three untraced runs.
+
+Run from the project root:
+    python -m benchmarks.bench_movie_records --rows 100000
+"""
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import text
+
+import movie_storage_sql as storage
+from benchmarks import synthetic
+from movie_records import Movie, MovieColumns
+
+USER = "user0000"
+
+
+def measure(build, repeat=3):
+    """(retained bytes, peak bytes, best seconds) of a build; timed without tracemalloc's overhead."""
+    seconds = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = build()
+        seconds = min(seconds, time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained, peak, seconds
+
+
+def old_list_movies(username):
+    """list_movies as it was before Movie records: one dict per row."""
+    with storage.engine.connect() as connection:
+        result = connection.execute(
+            text(f"""
+                SELECT m.id, c.title, c.year, m.rating, c.poster_url
+                FROM {storage.MOVIES_JOIN} JOIN users u ON u.id = m.user_id
+                WHERE u.username=:username
+            """),
+            {"username": username}
+        ).fetchall()
+    return {row[0]: {"title": row[1], "year": row[2], "rating": row[3], "poster_url": row[4]} for row in result}
+
+
+def report(label, rows, retained, peak, seconds):
+    per_100k = 100_000 / rows
+    print(f"{label:<34} {retained * per_100k / 2**20:9.1f} MB {peak * per_100k / 2**20:9.1f} MB "
+          f"{seconds * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    pool = synthetic.movie_pool(args.rows)
+    raw = [(i, m["title"], m["year"], m["rating"], m["poster_url"]) for i, m in enumerate(pool, start=1)]
+    print(f"{args.rows:,} rows, scaled to 100k rows")
+    print(f"{'Shape':<34} {'retained':>12} {'peak':>12} {'build':>12}")
+
+    # The representations alone, built from rows already in memory
+    builds = [
+        ("dict of dicts (old)", lambda: {r[0]: {"title": r[1], "year": r[2], "rating": r[3], "poster_url": r[4]}
+                                         for r in raw}),
+        ("dict of Movie", lambda: {r[0]: Movie.from_row(r) for r in raw}),
+        ("MovieColumns", lambda: MovieColumns(raw)),
+    ]
+    for label, build in builds:
+        report(label, args.rows, *measure(build))
+
+    # End to end through the database (list cache disabled)
+    storage.list_cache = storage.ListCache(max_entries=0)
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic.create_database(directory, users=1, movies_per_user=args.rows)
+        for label, build in (
+            ("old list_movies (dicts)", lambda: old_list_movies(USER)),
+            ("list_movies (Movie)", lambda: storage.list_movies(USER)),
+            ("list_movie_columns", lambda: storage.list_movie_columns(USER)),
+        ):
+            report(label, args.rows, *measure(build))
+        storage.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
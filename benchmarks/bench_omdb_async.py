@@ -0,0 +1,100 @@
+"""
+Throughput of OMDb lookups against a local fake OMDb server that answers
+after a fixed delay (no network, no API key needed):
+  sequential fetch_movie, the bulk_import thread pool, and fetch_many_async.
+
+Run from the project root:
+    python -m benchmarks.bench_omdb_async --titles 1000 --latency-ms 20 --concurrency 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import threading
+import time
+
+from aiohttp import web
+
+import bulk_import
+import omdb_api
+import omdb_async
+
+
+def start_fake_omdb(latency):
+    """Run an aiohttp fake OMDb server in a background thread; returns its base URL."""
+    async def lookup(request):
+        await asyncio.sleep(latency)
+        title = request.query.get("t", "")
+        return web.json_response({"Response": "True", "Title": title, "Year": "1999–2001",
+                                  "imdbRating": "7.5", "Runtime": "101 min", "Poster": "N/A"})
+
+    ready = threading.Event()
+    state = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_get("/", lookup)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0, backlog=1024)
+        loop.run_until_complete(site.start())
+        state["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{state['port']}/"
+
+
+def timed(func):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--sequential-sample", type=int, default=100,
+                        help="Titles to time sequentially (extrapolated to --titles)")
+    parser.add_argument("--rate", type=float, default=0, help="Also run fetch_many_async at this requests/second")
+    args = parser.parse_args()
+
+    base_url = start_fake_omdb(args.latency_ms / 1000)
+    omdb_api.cache = None
+    omdb_api.client = omdb_api.OmdbClient(base_url=base_url, api_key="bench", pool_size=args.concurrency)
+    titles = [f"Movie {i}" for i in range(args.titles)]
+
+    def run_async(rate):
+        async def run():
+            async with omdb_async.AsyncOmdbClient(base_url=base_url, api_key="bench",
+                                                concurrency=args.concurrency, rate=rate) as client:
+                return await omdb_async.fetch_many_async(titles, client=client)
+        return asyncio.run(run())
+
+    rows = []
+    sample = titles[:args.sequential_sample]
+    seconds, _ = timed(lambda: [omdb_api.fetch_movie(title) for title in sample])
+    rows.append(("sequential fetch_movie", seconds * len(titles) / len(sample), "extrapolated"))
+    seconds, _ = timed(lambda: list(bulk_import.resolve_titles(titles, workers=args.concurrency, rate=0)))
+    rows.append((f"thread pool ({args.concurrency} workers)", seconds, ""))
+    seconds, movies = timed(lambda: run_async(0))
+    assert all(movie["year"] == 1999 for movie in movies.values())
+    rows.append((f"fetch_many_async ({args.concurrency})", seconds, ""))
+    if args.rate:
+        seconds, _ = timed(lambda: run_async(args.rate))
+        rows.append((f"fetch_many_async @ {args.rate:g}/s", seconds, ""))
+
+    print(f"{args.titles} titles, {args.latency_ms:g} ms simulated OMDb latency")
+    print(f"{'method':<32} {'seconds':>9} {'titles/s':>10}")
+    for label, seconds, note in rows:
+        print(f"{label:<32} {seconds:9.2f} {args.titles / seconds:10.0f} {note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Offline OMDb snapshot: compile time, cold start and lookup latency.
+
+"cold start" is opening a compiled snapshot and answering the first lookup
+(what a fresh process pays before its first offline add), compared with the
+naive alternative of parsing the whole JSONL dump into a dict. Lookups are
+timed per stage: exact titles, titles needing the looser key (case, accents,
+punctuation, articles), typos answered by the trigram index, and misses.
+
+Run from the project root:
+    python -m benchmarks.bench_omdb_snapshot --records 200000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import omdb_snapshot
+from benchmarks import synthetic
+from omdb_api import parse_movie
+from omdb_cache import normalize_title
+
+
+def omdb_records(count, seed=0):
+    """OMDb-style answers (the raw API JSON) for `count` synthetic movies."""
+    rng = random.Random(seed)
+    for movie in synthetic.movie_pool(count, seed):
+        yield {"Response": "True", "Title": movie["title"], "Year": str(movie["year"]),
+               "imdbRating": str(movie["rating"]), "imdbVotes": f"{rng.randint(5, 2_000_000):,}",
+               "imdbID": movie["imdb_id"], "Poster": movie["poster_url"], "Genre": movie["genre"],
+               "Runtime": f"{movie['runtime']} min", "Plot": "N/A"}
+
+
+def typo(title, rng):
+    """The title with two neighbouring letters swapped."""
+    i = rng.randrange(len(title) - 1)
+    return title[:i] + title[i + 1] + title[i] + title[i + 2:]
+
+
+def per_lookup(snapshot, titles):
+    """Median and p95 lookup time in µs, and how many titles were found."""
+    samples, found = [], 0
+    for title in titles:
+        start = time.perf_counter()
+        found += snapshot.lookup(title) is not None
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))], found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "omdb.jsonl")
+        path = os.path.join(directory, "omdb_snapshot.db")
+        with open(source, "w", encoding="utf-8") as f:
+            titles = []
+            for record in omdb_records(args.records):
+                f.write(json.dumps(record) + "\n")
+                titles.append(record["Title"])
+
+        start = time.perf_counter()
+        omdb_snapshot.compile_snapshot(source, path)
+        compile_seconds = time.perf_counter() - start
+        print(f"{args.records:,} records: compiled in {compile_seconds:.1f}s, "
+              f"{os.path.getsize(path) / 2**20:.1f} MB (dump {os.path.getsize(source) / 2**20:.1f} MB)")
+
+        cold = []
+        for _ in range(5):
+            start = time.perf_counter()
+            snapshot = omdb_snapshot.OmdbSnapshot(path)
+            snapshot.lookup(titles[0])
+            cold.append(time.perf_counter() - start)
+            snapshot.close()
+        start = time.perf_counter()
+        by_title = {normalize_title(movie["title"]): movie
+                    for movie in map(parse_movie, omdb_snapshot.read_records(source))}
+        load_seconds = time.perf_counter() - start
+        print(f"cold start (open + first lookup): {min(cold) * 1000:.2f} ms; "
+              f"loading the dump into a dict instead: {load_seconds * 1000:.0f} ms ({len(by_title):,} titles)")
+
+        sample = rng.sample(titles, args.lookups)
+        snapshot = omdb_snapshot.OmdbSnapshot(path)
+        print(f"{'lookup':<24} {'median':>10} {'p95':>10} {'found':>8}")
+        for label, queries in (
+            ("exact", sample),
+            ("normalized", [f"  the {title.upper()}!" for title in sample]),
+            ("typo (trigram)", [typo(title, rng) for title in sample]),
+            ("miss", [f"Zzq Xv {i}" for i in range(args.lookups)]),
+        ):
+            median, p95, found = per_lookup(snapshot, queries)
+            print(f"{label:<24} {median:>8.0f}µs {p95:>8.0f}µs {found:>5}/{len(queries)}")
+        snapshot.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Count SQL statements and pool checkouts per storage operation, and time them.
+
+Run from the project root:
+    python -m benchmarks.bench_queries_per_op --iterations 2000
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+
+import movie_storage_sql as storage
+
+USER = "bench"
+
+
+class Counter:
+    def __init__(self, engine):
+        self.statements = 0
+        self.checkouts = 0
+        event.listen(engine, "before_cursor_execute", self.on_execute)
+        event.listen(engine.pool, "checkout", self.on_checkout)
+
+    def on_execute(self, *args):
+        self.statements += 1
+
+    def on_checkout(self, *args):
+        self.checkouts += 1
+
+    def reset(self):
+        self.statements = self.checkouts = 0
+
+
+def measure(counter, label, func, iterations):
+    counter.reset()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(iterations):
+            func(i)
+    seconds = time.perf_counter() - start
+    print(f"{label:<16} {counter.statements / iterations:6.2f} queries/op "
+          f"{counter.checkouts / iterations:6.2f} connections/op "
+          f"{seconds / iterations * 1e6:10.1f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage.engine = storage.create_storage_engine(f"sqlite:///{os.path.join(directory, 'ops.db')}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.init_db()
+            storage.add_user(USER)
+        counter = Counter(storage.engine)
+
+        measure(counter, "add_movie", lambda i: storage.add_movie(f"Movie {i}", 2000, 5.0, user=USER), n)
+        ids = list(storage.list_movies(USER).keys())
+        measure(counter, "list_movies", lambda i: storage.list_movies(USER), min(n, 200))
+        cache, storage.list_cache = storage.list_cache, storage.ListCache(max_entries=0)
+        measure(counter, "list (no cache)", lambda i: storage.list_movies(USER), min(n, 200))
+        storage.list_cache = cache
+        # The menu's update flow: load the library to pick a movie, then write
+        measure(counter, "list + update", lambda i: (storage.list_movies(USER),
+                                                     storage.update_movie(ids[i], 6.0, user=USER)), min(n, 200))
+        measure(counter, "update_movie", lambda i: storage.update_movie(ids[i], 6.0, user=USER), n)
+        measure(counter, "delete_movie", lambda i: storage.delete_movie(ids[i], user=USER), n)
+        measure(counter, "unknown user", lambda i: storage.update_movie(1, 6.0, user="nobody"), n)
+        storage.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare title search through the FTS5 index with the old approach
+(load the whole library, substring match in Python).
+
+Run from the project root:
+    python -m benchmarks.bench_search --titles 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import movie_storage_sql as storage
+
+USER = "bench"
+WORDS = ("star", "night", "return", "dark", "city", "love", "war", "last", "king", "dead",
+         "river", "ghost", "summer", "blood", "secret", "road", "house", "golden", "iron", "moon")
+QUERIES = ("star", "ghost river", "golden", "kin", "xyzzy")
+
+
+def scan_search(query):
+    """What movies.search_movies used to do."""
+    query = query.lower()
+    return [m for m in storage.list_movies(USER).values() if query in m["title"].lower()]
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    movies = [{"title": " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 4))) + f" {i}",
+               "year": rng.randint(1920, 2024), "rating": round(rng.uniform(1, 10), 1)}
+              for i in range(args.titles)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage.engine = storage.create_storage_engine(f"sqlite:///{os.path.join(directory, 'search.db')}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.init_db()
+            storage.add_user(USER)
+        storage.add_movies_bulk(movies, user=USER)
+
+        print(f"{args.titles} titles, mean of {args.repeat} runs")
+        print(f"{'query':<14} {'scan ms':>10} {'fts ms':>10} {'fts hits (limit 20)':>20}")
+        for query in QUERIES:
+            scan_ms = timed(lambda: scan_search(query), args.repeat)
+            fts_ms = timed(lambda: storage.search_movies(USER, query), args.repeat)
+            hits = len(storage.search_movies(USER, query))
+            print(f"{query:<14} {scan_ms:10.2f} {fts_ms:10.2f} {hits:20d}")
+        storage.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Render a 10k-movie page with the old approach (read the template, build the
+grid with +=, re.sub with a callback) and with the compiled template engine.
+
+Run from the project root:
+    python -m benchmarks.bench_templates --movies 10000
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+
+import site_generator
+from template_engine import load_template
+
+TITLE = "bench's Movie Library"
+
+
+def render_old(movies):
+    with open(site_generator.TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    movie_grid = ""
+    for data in movies:
+        movie_grid += f"""
+        <div class="movie-item">
+            <img class="movie-poster" src="{data.get('poster_url', '')}" alt="{data['title']}">
+            <div class="movie-info">
+                <h2 class="movie-title">{data['title']}</h2>
+                <p class="movie-year">{data['year']}</p>
+                <p class="movie-rating">Rating: {data['rating']}</p>
+            </div>
+        </div>
+        """
+
+    def replace_placeholder(match):
+        key = match.group(0)
+        if key == "__TEMPLATE_TITLE__":
+            return TITLE
+        elif key == "__TEMPLATE_MOVIE_GRID__":
+            return movie_grid
+        elif key == "__TEMPLATE_DATE__":
+            return datetime.now().strftime("%Y-%m-%d %H:%M")
+        return ""
+
+    return re.sub(r"__\w+__", replace_placeholder, template)
+
+
+def render_new(movies):
+    template = load_template(site_generator.TEMPLATE_PATH)
+    item_template = load_template(site_generator.ITEM_TEMPLATE_PATH)
+    return template.render({
+        "__TEMPLATE_TITLE__": TITLE,
+        "__TEMPLATE_MOVIE_GRID__": site_generator.iter_movie_grid(item_template, movies),
+        "__TEMPLATE_DATE__": datetime.now().strftime("%Y-%m-%d %H:%M"),
+    })
+
+
+def timed(func, movies, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        html = func(movies)
+    return (time.perf_counter() - start) / repeat * 1000, len(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movies", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    movies = [{"title": f"Movie & Sequel {i}", "year": 1950 + i % 70, "rating": (i % 100) / 10,
+               "poster_url": f"https://example.com/poster/{i}.jpg"} for i in range(args.movies)]
+
+    print(f"{args.movies} movies, mean of {args.repeat} renders")
+    for label, func in (("re.sub + +=", render_old), ("compiled template", render_new)):
+        ms, size = timed(func, movies, args.repeat)
+        print(f"{label:<20} {ms:8.2f} ms  {size / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
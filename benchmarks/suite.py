@@ -0,0 +1,395 @@
+"""
+Benchmark suite for the storage and rendering paths on synthetic data
+(see benchmarks/synthetic.py): list, sort, filter, search, stats, single
+and bulk writes, bulk import with a fake fetch_movie, and site generation.
+
+Every scenario runs one warm-up and then `--repeat` timed runs; per-run
+setup (fresh users, cache clears) is not timed. Results are written as JSON
+and can be compared against a stored baseline: a scenario whose median is
+more than `--threshold` slower than the baseline counts as a regression and
+makes the run exit with status 1.
+
+Run from the project root:
+    python -m benchmarks.suite --users 10 --movies 2000 --out results.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --only search stats
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import bulk_import
+import movie_storage_sql as storage
+import site_generator
+from benchmarks import synthetic
+
+DEFAULT_THRESHOLD = 0.25
+BULK_SIZE = 1000
+MIN_SAMPLE_SECONDS = 0.02  # fast scenarios without setup loop until a sample takes this long
+
+
+class Context:
+    """The synthetic database and what scenarios need to know about it."""
+
+    def __init__(self, directory, users, movies_per_user, seed):
+        self.directory = directory
+        self.usernames, self.pool = synthetic.create_database(directory, users, movies_per_user, seed)
+        self.user = self.usernames[0]
+        self.movie_ids = list(storage.list_movies(self.user))
+        owned = {(m["title"], m["year"]) for m in storage.list_movies(self.user).values()}
+        self.unowned = [m for m in self.pool if (m["title"], m["year"]) not in owned]
+        self.output_dir = os.path.join(directory, "sites")
+        self.counter = 0
+
+    def new_user(self, movies=()):
+        """A fresh user (optionally with movies), so write scenarios start from the same state."""
+        self.counter += 1
+        username = f"scratch{self.counter:05d}"
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.add_user(username)
+        if movies:
+            storage.add_movies_bulk(movies, user=username)
+        return username
+
+
+#  Scenarios
+# Each returns (run, setup, ops): setup() is called untimed before every run
+# and its result is passed to run(); ops is the number of rows one run handles.
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@scenario("list_movies")
+def _list_movies(ctx):
+    return (lambda _: storage.list_movies(ctx.user)), storage.list_cache.clear, len(ctx.movie_ids)
+
+
+@scenario("list_movies_cached")
+def _list_movies_cached(ctx):
+    return (lambda _: storage.list_movies(ctx.user)), None, len(ctx.movie_ids)
+
+
+@scenario("query_sorted_page")
+def _query_sorted_page(ctx):
+    return (lambda _: storage.query_movies(ctx.user, order_by="rating", descending=True, limit=50)), None, 50
+
+
+@scenario("query_filtered")
+def _query_filtered(ctx):
+    return (lambda _: storage.query_movies(ctx.user, order_by="title", title_like="night",
+                                           min_year=1970, max_year=2010, min_rating=5)), None, 1
+
+
+@scenario("iter_sorted_pages")
+def _iter_sorted_pages(ctx):
+    def run(_):
+        return sum(len(page) for page in storage.iter_movies(ctx.user, page_size=500, order_by="title"))
+    return run, None, len(ctx.movie_ids)
+
+
+@scenario("search_prefix")
+def _search_prefix(ctx):
+    queries = [word[:3] for word in synthetic.WORDS]
+    queries_iter = iter(queries * 1000)
+    return (lambda _: storage.search_movies(ctx.user, next(queries_iter))), None, 1
+
+
+@scenario("search_phrase")
+def _search_phrase(ctx):
+    return (lambda _: storage.search_movies(ctx.user, "dark night", mode="phrase")), None, 1
+
+
+@scenario("random_movie")
+def _random_movie(ctx):
+    return (lambda _: storage.random_movie(ctx.user)), None, 1
+
+
+@scenario("random_weighted_k10")
+def _random_movie_weighted(ctx):
+    return (lambda _: storage.random_movie(ctx.user, k=10, weighted=True, min_rating=5)), None, 10
+
+
+@scenario("stats")
+def _stats(ctx):
+    return (lambda _: storage.movie_stats(ctx.user)), None, len(ctx.movie_ids)
+
+
+@scenario("add_movie")
+def _add_movie(ctx):
+    def setup():
+        return ctx.new_user(), ctx.unowned[ctx.counter % len(ctx.unowned)]
+
+    def run(args):
+        username, movie = args
+        storage.add_movie(movie["title"], movie["year"], movie["rating"], movie["poster_url"],
+                          user=username, imdb_id=movie["imdb_id"])
+    return run, setup, 1
+
+
+@scenario("update_movie")
+def _update_movie(ctx):
+    ids = iter(ctx.movie_ids * 1000)
+    return (lambda _: storage.update_movie(next(ids), 5.0, user=ctx.user)), None, 1
+
+
+@scenario("delete_movie")
+def _delete_movie(ctx):
+    def setup():
+        username = ctx.new_user(ctx.pool[:1])
+        return username, next(iter(storage.list_movies(username)))
+    return (lambda args: storage.delete_movie(args[1], user=args[0])), setup, 1
+
+
+@scenario("add_movies_bulk")
+def _add_movies_bulk(ctx):
+    movies = ctx.pool[:BULK_SIZE]
+    return (lambda username: storage.add_movies_bulk(movies, user=username)), ctx.new_user, len(movies)
+
+
+@scenario("update_ratings_bulk")
+def _update_ratings_bulk(ctx):
+    updates = [(movie_id, 7.5) for movie_id in ctx.movie_ids[:BULK_SIZE]]
+    return (lambda _: storage.update_ratings_bulk(updates, user=ctx.user)), None, len(updates)
+
+
+@scenario("delete_movies_bulk")
+def _delete_movies_bulk(ctx):
+    movies = ctx.pool[:BULK_SIZE]
+
+    def setup():
+        username = ctx.new_user(movies)
+        return username, list(storage.list_movies(username))
+    return (lambda args: storage.delete_movies_bulk(args[1], user=args[0])), setup, len(movies)
+
+
+@scenario("bulk_import")
+def _bulk_import(ctx):
+    titles = [movie["title"] for movie in ctx.pool[:BULK_SIZE]]
+    fetch = synthetic.fake_fetch(ctx.pool)
+
+    def run(username):
+        bulk_import.import_titles(titles, username, workers=8, rate=0, batch_size=100, fetch=fetch)
+    return run, ctx.new_user, len(titles)
+
+
+@scenario("site_generate")
+def _site_generate(ctx):
+    def run(_):
+        site_generator.generate_site(ctx.user, output_dir=ctx.output_dir, force=True)
+    return run, None, len(ctx.movie_ids)
+
+
+@scenario("site_generate_paged")
+def _site_generate_paged(ctx):
+    def run(_):
+        site_generator.generate_site(ctx.user, output_dir=ctx.output_dir, page_size=100, force=True)
+    return run, None, len(ctx.movie_ids)
+
+
+@scenario("site_unchanged")
+def _site_unchanged(ctx):
+    def run(_):
+        site_generator.generate_site(ctx.user, output_dir=ctx.output_dir)
+    return run, None, len(ctx.movie_ids)
+
+
+#  Running
+def measure(ctx, name, repeat):
+    """Per-run times of a scenario in ms: median, min and max over the samples."""
+    run, setup, ops = SCENARIOS[name](ctx)
+    samples = []
+    # Storage and site functions report on stdout; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm-up, which also tells how many runs make a sample long enough to time reliably
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        run(arg)
+        first = time.perf_counter() - start
+        loops = max(1, min(200, int(MIN_SAMPLE_SECONDS / max(first, 1e-6))))
+        if setup:
+            # Runs that need a fresh setup cannot be looped; take more samples instead
+            repeat, loops = repeat * loops, 1
+        for _ in range(repeat):
+            arg = setup() if setup else None
+            start = time.perf_counter()
+            for _ in range(loops):
+                run(arg)
+            samples.append((time.perf_counter() - start) / loops)
+    median = statistics.median(samples)
+    return {
+        "median_ms": median * 1000,
+        "min_ms": min(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+        "ops": ops,
+        "ops_per_sec": ops / median if median else 0.0,
+        "runs": repeat,
+        "loops": loops,
+    }
+
+
+def calibrate(rounds=5):
+    """
+    Best-of time in ms of a fixed Python + SQLite workload. Comparing it
+    between two runs tells how much faster or slower the machine itself was.
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, title TEXT, rating REAL)")
+        connection.executemany("INSERT INTO t (title, rating) VALUES (?, ?)",
+                               ((f"movie {i}", i % 100 / 10) for i in range(20000)))
+        connection.execute("SELECT title FROM t ORDER BY rating DESC, title").fetchall()
+        connection.close()
+        sorted(str(i * 7919 % 10007) for i in range(50000))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_suite(users, movies_per_user, repeat=5, seed=0, only=None):
+    """Build a synthetic database in a temp directory and time the selected scenarios."""
+    names = [name for name in SCENARIOS if not only or any(pattern in name for pattern in only)]
+    previous_engine = storage.engine
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            calibration = calibrate()
+            start = time.perf_counter()
+            ctx = Context(directory, users, movies_per_user, seed)
+            print(f"Synthetic database: {users} users x {movies_per_user} movies "
+                  f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            results = {}
+            for name in names:
+                results[name] = measure(ctx, name, repeat)
+                print(f"  {name:<22} {results[name]['median_ms']:10.3f} ms", file=sys.stderr)
+            calibration = min(calibration, calibrate())
+        finally:
+            storage.engine.dispose()
+            storage.engine = previous_engine
+            storage.list_cache.clear()
+    return {
+        "meta": {
+            "users": users,
+            "movies_per_user": movies_per_user,
+            "repeat": repeat,
+            "seed": seed,
+            "calibration_ms": calibration,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, normalize=False):
+    """
+    Compare two result documents scenario by scenario. Returns a list of
+    dicts with the baseline and current medians, their ratio and a status:
+    "regression" (slower than baseline * (1 + threshold)), "faster"
+    (quicker than baseline / (1 + threshold)), "ok", "new" or "missing".
+    With normalize, baseline times are first scaled by the ratio of the two
+    runs' calibration times, so a slower machine is not a regression.
+    """
+    current, previous = results["results"], baseline["results"]
+    scale = 1.0
+    if normalize and baseline["meta"].get("calibration_ms") and results["meta"].get("calibration_ms"):
+        scale = results["meta"]["calibration_ms"] / baseline["meta"]["calibration_ms"]
+    rows = []
+    for name in list(previous) + [name for name in current if name not in previous]:
+        now = current.get(name, {}).get("median_ms")
+        before = previous.get(name, {}).get("median_ms")
+        row = {"scenario": name, "baseline_ms": before, "current_ms": now, "ratio": None}
+        if now is None:
+            row["status"] = "missing"
+        elif before is None:
+            row["status"] = "new"
+        else:
+            row["ratio"] = now / (before * scale) if before else float("inf")
+            if row["ratio"] > 1 + threshold:
+                row["status"] = "regression"
+            elif row["ratio"] < 1 / (1 + threshold):
+                row["status"] = "faster"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def print_results(results):
+    print(f"{'Scenario':<22} {'median ms':>10} {'min ms':>10} {'ops/s':>12}")
+    for name, result in results["results"].items():
+        print(f"{name:<22} {result['median_ms']:10.3f} {result['min_ms']:10.3f} {result['ops_per_sec']:12,.0f}")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'Scenario':<22} {'baseline':>10} {'current':>10} {'ratio':>7}  status (threshold +{threshold:.0%})")
+    for row in rows:
+        before = f"{row['baseline_ms']:10.3f}" if row["baseline_ms"] is not None else f"{'-':>10}"
+        now = f"{row['current_ms']:10.3f}" if row["current_ms"] is not None else f"{'-':>10}"
+        ratio = f"{row['ratio']:7.2f}" if row["ratio"] is not None else f"{'-':>7}"
+        print(f"{row['scenario']:<22} {before} {now} {ratio}  {row['status']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--movies", type=int, default=2000, help="Movies per user")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Only scenarios containing one of these")
+    parser.add_argument("--out", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against this results file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a scenario counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--normalize", action="store_true",
+                        help="Scale the baseline by the machine speed difference (calibration run)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.users, args.movies, args.repeat, args.seed, args.only)
+    print_results(results)
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    sizes = ("users", "movies_per_user")
+    if any(baseline["meta"].get(key) != results["meta"][key] for key in sizes):
+        print(f"Warning: baseline was measured with "
+              f"{baseline['meta'].get('users')} users x {baseline['meta'].get('movies_per_user')} movies",
+              file=sys.stderr)
+    rows = compare(results, baseline, args.threshold, args.normalize)
+    if args.normalize:
+        print(f"Machine speed vs baseline: {results['meta']['calibration_ms'] / baseline['meta']['calibration_ms']:.2f}x "
+              f"(calibration {results['meta']['calibration_ms']:.1f} ms)")
+    print_comparison(rows, args.threshold)
+    regressions = [row["scenario"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
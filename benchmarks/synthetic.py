@@ -0,0 +1,82 @@
+"""
+Deterministic synthetic data for the benchmarks: N users x M movies in a
+fresh database. Users draw their movies from one shared pool of films, so
+libraries overlap in the catalog the way real ones do.
+"""
+import contextlib
+import io
+import os
+import random
+import time
+
+import movie_storage_sql as storage
+
+WORDS = (
+    "last", "dark", "night", "city", "star", "river", "ghost", "iron", "silent", "red",
+    "king", "road", "summer", "winter", "blood", "glass", "storm", "golden", "lost", "wild",
+    "secret", "empire", "heart", "shadow", "fire", "ocean", "dream", "machine", "garden", "war",
+    "love", "time", "house", "girl", "man", "world", "moon", "sun", "blue", "black",
+)
+GENRES = ("Drama", "Comedy", "Action", "Thriller", "Horror", "Sci-Fi", "Romance", "Animation")
+BATCH_SIZE = 1000
+
+
+def movie_pool(size, seed=0):
+    """`size` distinct movie dicts (title, year, rating, poster and catalog fields)."""
+    rng = random.Random(seed)
+    movies, seen = [], set()
+    for i in range(size):
+        title = " ".join(rng.sample(WORDS, rng.randint(1, 3))).title()
+        if title in seen:  # titles are unique so lookups by title are unambiguous
+            title = f"{title} {i}"
+        seen.add(title)
+        movies.append({
+            "title": title,
+            "year": rng.randint(1920, 2025),
+            "rating": round(rng.uniform(1.0, 10.0), 1),
+            "poster_url": f"https://posters.example/{i}.jpg",
+            "imdb_id": f"tt{1000000 + i:07d}",
+            "genre": rng.choice(GENRES),
+            "runtime": rng.randint(75, 190),
+            "plot": None,
+        })
+    return movies
+
+
+def populate(users, movies_per_user, seed=0, overlap=0.5):
+    """
+    Add `users` users with `movies_per_user` movies each to the current
+    storage engine. About `overlap` of each library is shared with other
+    users. Returns (usernames, pool); movies outside the libraries remain in
+    the pool for add scenarios.
+    """
+    rng = random.Random(seed)
+    pool_size = max(2 * movies_per_user, int(users * movies_per_user * (1 - overlap)))
+    pool = movie_pool(pool_size, seed)
+    usernames = [f"user{number:04d}" for number in range(users)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for username in usernames:
+            storage.add_user(username)
+            library = rng.sample(pool, movies_per_user)
+            for start in range(0, len(library), BATCH_SIZE):
+                storage.add_movies_bulk(library[start:start + BATCH_SIZE], user=username)
+    return usernames, pool
+
+
+def create_database(directory, users, movies_per_user, seed=0, name="synthetic.db"):
+    """Point storage at a new file database in `directory` and fill it; see populate."""
+    storage.engine = storage.create_storage_engine(f"sqlite:///{os.path.join(directory, name)}")
+    storage.init_db()
+    return populate(users, movies_per_user, seed)
+
+
+def fake_fetch(pool, latency=0.0):
+    """A fetch_movie stand-in answering from the pool ({} for unknown titles)."""
+    by_title = {movie["title"]: movie for movie in pool}
+
+    def fetch(title):
+        if latency:
+            time.sleep(latency)
+        return dict(by_title.get(title, {}))
+
+    return fetch
@@ -0,0 +1,136 @@
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import movie_storage_sql as storage
+from omdb_api import fetch_movie
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second on average."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def read_titles(path: str) -> list:
+    """
+    Read movie titles from a file. Supported formats (by extension):
+    .csv (a "title" column, or the first column), .jsonl (strings or objects
+    with a "title" key) and anything else as one title per line.
+    Blank entries and repeated titles are dropped, order is kept.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    titles = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if ext == ".csv":
+            rows = list(csv.reader(f))
+            if rows and "title" in [cell.strip().lower() for cell in rows[0]]:
+                column = [cell.strip().lower() for cell in rows[0]].index("title")
+                rows = rows[1:]
+            else:
+                column = 0
+            titles = [row[column] for row in rows if len(row) > column]
+        elif ext == ".jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                titles.append(entry.get("title", "") if isinstance(entry, dict) else str(entry))
+        else:
+            titles = f.read().splitlines()
+
+    return list(dict.fromkeys(title.strip() for title in titles if title.strip()))
+
+
+def resolve_titles(titles, workers=8, rate=5.0, fetch=None):
+    """
+    Look titles up concurrently with a bounded thread pool, never exceeding
+    `rate` OMDb requests per second. Yields (title, movie_dict) as they finish;
+    movie_dict is empty for titles that could not be resolved.
+    """
+    fetch = fetch or fetch_movie
+    limiter = RateLimiter(rate, burst=workers) if rate else None
+
+    def resolve(title):
+        if limiter:
+            limiter.acquire()
+        try:
+            return fetch(title)
+        except Exception as e:
+            print(f"Error resolving '{title}': {e}")
+            return {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(resolve, title): title for title in titles}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _insert_batch(movies, user):
+    """Insert a batch of movie dicts for one user in a single transaction."""
+    outcomes = storage.add_movies_bulk(movies, user=user)
+    return outcomes.count("added")
+
+
+def import_titles(titles, user, workers=8, rate=5.0, batch_size=100,
+                  report_every=50, fetch=None):
+    """
+    Resolve titles via OMDb and add the results to a user's library in
+    batched transactions. Prints progress and returns a summary dict.
+    """
+    if not storage.get_user_id(user):
+        print(f"User '{user}' not found.")
+        return None
+
+    total = len(titles)
+    summary = {"requested": total, "found": 0, "not_found": [], "inserted": 0}
+    batch = []
+    start = time.perf_counter()
+
+    for done, (title, movie) in enumerate(resolve_titles(titles, workers, rate, fetch), start=1):
+        if movie:
+            summary["found"] += 1
+            batch.append(movie)
+        else:
+            summary["not_found"].append(title)
+        if len(batch) >= batch_size:
+            summary["inserted"] += _insert_batch(batch, user)
+            batch = []
+        if done % report_every == 0 or done == total:
+            elapsed = time.perf_counter() - start
+            print(f"[{done}/{total}] resolved, {summary['inserted']} inserted, "
+                  f"{done / elapsed if elapsed else 0:.1f} titles/s")
+
+    if batch:
+        summary["inserted"] += _insert_batch(batch, user)
+
+    summary["seconds"] = time.perf_counter() - start
+    summary["titles_per_sec"] = total / summary["seconds"] if summary["seconds"] else 0.0
+    print(f"Imported {summary['inserted']} of {total} titles for {user} "
+          f"in {summary['seconds']:.1f}s ({summary['titles_per_sec']:.1f} titles/s).")
+    return summary
+
+
+def import_file(path, user, **kwargs):
+    """Read titles from a file (see read_titles) and import them for a user."""
+    return import_titles(read_titles(path), user, **kwargs)
@@ -0,0 +1,380 @@
+import argparse
+import contextlib
+import json
+import sys
+
+import bulk_import
+import library_io
+import metrics
+import movie_storage_sql as storage
+import omdb_snapshot
+import site_generator
+from omdb_api import fetch_movie
+
+# Exit codes (argparse itself exits with 2 on usage errors)
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_NOT_FOUND = 3
+
+MOVIE_COLUMNS = ("id", "title", "year", "rating")
+
+
+#  Output
+def print_table(rows, columns):
+    """Print a list of dicts as left-aligned text columns."""
+    if not rows:
+        return
+    cells = [[_format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    print("  ".join(column.upper().ljust(width) for column, width in zip(columns, widths)).rstrip())
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip())
+
+
+def _format_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    return str(value)
+
+
+def emit(args, data, columns=MOVIE_COLUMNS):
+    """Write data (a dict or a list of dicts) in the requested --format."""
+    if args.format == "json":
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+    elif isinstance(data, list):
+        print_table(data, columns)
+    else:
+        for key, value in data.items():
+            print(f"{key}: {_format_cell(value)}")
+
+
+def error(message):
+    print(message, file=sys.stderr)
+
+
+def require_user(args):
+    """Return True if --user exists, otherwise report it."""
+    if storage.get_user_id(args.user) is None:
+        error(f"User '{args.user}' not found.")
+        return False
+    return True
+
+
+#  Commands
+def cmd_users(args):
+    if args.create:
+        if storage.get_user_id(args.create) is not None:
+            error(f"User already exists: {args.create}")
+            return EXIT_FAILURE
+        # add_user reports on stdout; keep stdout clean for --format json
+        with contextlib.redirect_stdout(sys.stderr):
+            storage.add_user(args.create)
+        if storage.get_user_id(args.create) is None:
+            return EXIT_FAILURE
+    emit(args, [{"username": name} for name in storage.list_users()], ("username",))
+    return EXIT_OK
+
+
+def cmd_list(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    movies = storage.query_movies(
+        args.user, order_by=args.sort, descending=args.desc, limit=args.limit, offset=args.offset,
+        title_like=args.title, min_year=args.min_year, max_year=args.max_year,
+        min_rating=args.min_rating, max_rating=args.max_rating
+    )
+    emit(args, movies)
+    return EXIT_OK
+
+
+def cmd_add(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    if args.year is not None and args.rating is not None:
+        movie = {"title": args.title, "year": args.year, "rating": args.rating, "poster_url": args.poster_url}
+    else:
+        with contextlib.redirect_stdout(sys.stderr):
+            movie = fetch_movie(args.title)
+        if not movie:
+            error(f"Movie not found: {args.title}")
+            return EXIT_NOT_FOUND
+    [outcome] = storage.add_movies_bulk([movie], user=args.user)
+    emit(args, {"outcome": outcome, **movie})
+    return EXIT_OK if outcome == "added" else EXIT_FAILURE
+
+
+def cmd_delete(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    [outcome] = storage.delete_movies_bulk([args.movie_id], user=args.user)
+    emit(args, {"id": args.movie_id, "outcome": outcome})
+    return EXIT_OK if outcome == "deleted" else EXIT_NOT_FOUND
+
+
+def cmd_update(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    if not 0 <= args.rating <= 10:
+        error("Rating must be between 0 and 10.")
+        return EXIT_FAILURE
+    [outcome] = storage.update_ratings_bulk([(args.movie_id, args.rating)], user=args.user)
+    emit(args, {"id": args.movie_id, "rating": args.rating, "outcome": outcome})
+    return EXIT_OK if outcome == "updated" else EXIT_NOT_FOUND
+
+
+def cmd_stats(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    stats = storage.movie_stats(args.user)
+    if args.format == "json":
+        emit(args, stats)
+    elif not stats["count"]:
+        print(f"No movies available for {args.user}.")
+    else:
+        emit(args, {key: stats[key] for key in ("count", "mean", "median", "stddev")})
+        for kind in ("max", "min"):
+            titles = ", ".join(f"{m['title']} ({m['year']})" for m in stats[kind]["movies"])
+            print(f"{kind}: {stats[kind]['rating']:.1f} {titles}")
+        if args.extended:
+            for bucket, count in sorted(stats["histogram"].items()):
+                print(f"rating {bucket}: {count}")
+            for decade, info in sorted(stats["decades"].items()):
+                print(f"{decade}s: {info['count']} movies, mean {info['mean_rating']:.1f}")
+    return EXIT_OK
+
+
+def cmd_search(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    results = storage.search_movies(args.user, args.query, limit=args.limit, mode=args.mode)
+    emit(args, results)
+    return EXIT_OK if results else EXIT_NOT_FOUND
+
+
+def cmd_random(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    picked = storage.random_movie(
+        args.user, k=args.k, weighted=args.weighted, seed=args.seed,
+        title_like=args.title, min_year=args.min_year, max_year=args.max_year,
+        min_rating=args.min_rating, max_rating=args.max_rating
+    )
+    if not picked:
+        error(f"No movies available for {args.user}.")
+        return EXIT_NOT_FOUND
+    emit(args, picked)
+    return EXIT_OK
+
+
+def cmd_generate(args):
+    if not require_user(args):
+        return EXIT_NOT_FOUND
+    with contextlib.redirect_stdout(sys.stderr):
+        status = site_generator.generate_site(args.user, page_size=args.page_size, force=args.force,
+                                              local_posters=args.local_posters)
+    emit(args, {"user": args.user, "status": status})
+    return EXIT_OK if status in ("generated", "unchanged") else EXIT_FAILURE
+
+
+def cmd_import(args):
+    summary = bulk_import.import_file(
+        args.file, args.user,
+        workers=args.workers, rate=args.rate, batch_size=args.batch_size
+    )
+    return EXIT_OK if summary and summary["inserted"] else EXIT_FAILURE
+
+
+def cmd_export(args):
+    for username in args.users or ():
+        if storage.get_user_id(username) is None:
+            error(f"User '{username}' not found.")
+            return EXIT_NOT_FOUND
+    library_io.export_library(args.file, args.users, fmt=args.file_format, batch_size=args.batch_size)
+    return EXIT_OK
+
+
+def cmd_import_library(args):
+    try:
+        summary = library_io.import_library(
+            args.file, user=args.user, fmt=args.file_format, on_duplicate=args.on_duplicate,
+            create_users=not args.no_create_users, batch_size=args.batch_size
+        )
+    except (OSError, ValueError) as e:
+        error(f"Cannot import {args.file}: {e}")
+        return EXIT_FAILURE
+    return EXIT_FAILURE if summary["invalid"] or summary["user_not_found"] else EXIT_OK
+
+
+def cmd_compile_snapshot(args):
+    try:
+        count = omdb_snapshot.compile_snapshot(args.source, args.out)
+    except (OSError, ValueError) as e:
+        error(f"Cannot compile {args.source}: {e}")
+        return EXIT_FAILURE
+    emit(args, {"records": count, "snapshot": args.out})
+    return EXIT_OK
+
+
+def cmd_generate_all(args):
+    results = site_generator.generate_all_sites(
+        args.users, workers=args.workers, page_size=args.page_size, force=args.force,
+        local_posters=args.local_posters
+    )
+    failed = [r for r in results if r["status"] not in ("generated", "unchanged", "no_movies")]
+    return EXIT_FAILURE if failed else EXIT_OK
+
+
+def cmd_serve(args):
+    import api_server  # imported lazily: aiohttp is only needed for the server
+    api_server.serve(args.host, args.port, db_workers=args.db_workers, omdb_workers=args.omdb_workers,
+                     site_page_size=args.page_size)
+    return EXIT_OK
+
+
+def cmd_interactive(args):
+    import movies  # imported lazily: movies.py imports this module
+    movies.main()
+    return EXIT_OK
+
+
+#  Parser
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="movies.py",
+        description="Movie App. Run without arguments for the interactive menu."
+    )
+    parser.add_argument("--metrics-out", metavar="FILE",
+                        help="After the command, write its metrics to FILE (Prometheus text for *.prom, else JSON)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--format", choices=("table", "json"), default="table", help="Output format")
+    user = argparse.ArgumentParser(add_help=False)
+    user.add_argument("--user", required=True, help="Username")
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--title", help="Only titles containing this text")
+    filters.add_argument("--min-year", type=int)
+    filters.add_argument("--max-year", type=int)
+    filters.add_argument("--min-rating", type=float)
+    filters.add_argument("--max-rating", type=float)
+
+    users_parser = subparsers.add_parser("users", parents=[output], help="List (or create) users")
+    users_parser.add_argument("--create", metavar="USERNAME", help="Create this user first")
+    users_parser.set_defaults(func=cmd_users)
+
+    list_parser = subparsers.add_parser("list", parents=[user, output, filters], help="List movies")
+    list_parser.add_argument("--sort", choices=sorted(storage.SORT_COLUMNS), default="id")
+    list_parser.add_argument("--desc", action="store_true", help="Sort descending")
+    list_parser.add_argument("--limit", type=int, default=None)
+    list_parser.add_argument("--offset", type=int, default=0)
+    list_parser.set_defaults(func=cmd_list)
+
+    add_parser = subparsers.add_parser("add", parents=[user, output], help="Add a movie (looked up on OMDb)")
+    add_parser.add_argument("title")
+    add_parser.add_argument("--year", type=int, help="With --rating: skip the OMDb lookup")
+    add_parser.add_argument("--rating", type=float, help="With --year: skip the OMDb lookup")
+    add_parser.add_argument("--poster-url", default="")
+    add_parser.set_defaults(func=cmd_add)
+
+    delete_parser = subparsers.add_parser("delete", parents=[user, output], help="Delete a movie by ID")
+    delete_parser.add_argument("movie_id", type=int)
+    delete_parser.set_defaults(func=cmd_delete)
+
+    update_parser = subparsers.add_parser("update", parents=[user, output], help="Update a movie's rating")
+    update_parser.add_argument("movie_id", type=int)
+    update_parser.add_argument("rating", type=float)
+    update_parser.set_defaults(func=cmd_update)
+
+    stats_parser = subparsers.add_parser("stats", parents=[user, output], help="Rating statistics")
+    stats_parser.add_argument("--extended", action="store_true", help="Include histogram and decades")
+    stats_parser.set_defaults(func=cmd_stats)
+
+    search_parser = subparsers.add_parser("search", parents=[user, output], help="Search movie titles")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--mode", choices=storage.SEARCH_MODES, default="prefix")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.set_defaults(func=cmd_search)
+
+    random_parser = subparsers.add_parser("random", parents=[user, output, filters], help="Pick a random movie")
+    random_parser.add_argument("-k", type=int, default=None, help="Pick this many distinct movies")
+    random_parser.add_argument("--weighted", action="store_true", help="Favour higher ratings")
+    random_parser.add_argument("--seed", type=int, default=None, help="Make the pick reproducible")
+    random_parser.set_defaults(func=cmd_random)
+
+    generate_parser = subparsers.add_parser("generate", parents=[user, output], help="Generate the user's website")
+    generate_parser.add_argument("--page-size", type=int, default=None, help="Movies per page (default: one page)")
+    generate_parser.add_argument("--force", action="store_true", help="Rebuild even if nothing changed")
+    generate_parser.add_argument("--local-posters", action="store_true",
+                                 help="Download posters once and link local thumbnails")
+    generate_parser.set_defaults(func=cmd_generate)
+
+    import_parser = subparsers.add_parser("import", help="Bulk import titles from a file")
+    import_parser.add_argument("file", help="Titles as .txt (one per line), .csv or .jsonl")
+    import_parser.add_argument("--user", required=True, help="Username to import into")
+    import_parser.add_argument("--workers", type=int, default=8, help="Concurrent OMDb lookups")
+    import_parser.add_argument("--rate", type=float, default=5.0, help="Max OMDb requests per second")
+    import_parser.add_argument("--batch-size", type=int, default=100, help="Rows per insert transaction")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="Export libraries to a JSONL or CSV file")
+    export_parser.add_argument("file", help="Output file (.csv for CSV, anything else JSONL)")
+    export_parser.add_argument("--users", nargs="+", help="Only these users (default: all)")
+    export_parser.add_argument("--file-format", choices=library_io.FORMATS, help="Override the format")
+    export_parser.add_argument("--batch-size", type=int, default=library_io.BATCH_SIZE,
+                               help="Rows fetched per round trip")
+    export_parser.set_defaults(func=cmd_export)
+
+    restore_parser = subparsers.add_parser("import-library", help="Import libraries from an export file")
+    restore_parser.add_argument("file", help="A file written by export (.csv or .jsonl)")
+    restore_parser.add_argument("--user", help="Import every movie into this user instead")
+    restore_parser.add_argument("--file-format", choices=library_io.FORMATS, help="Override the format")
+    restore_parser.add_argument("--on-duplicate", choices=storage.DUPLICATE_POLICIES, default="skip",
+                                help="Keep the existing rating (skip) or take the imported one (update)")
+    restore_parser.add_argument("--no-create-users", action="store_true",
+                                help="Reject movies of users that do not exist")
+    restore_parser.add_argument("--batch-size", type=int, default=library_io.BATCH_SIZE,
+                                help="Rows per insert transaction")
+    restore_parser.set_defaults(func=cmd_import_library)
+
+    snapshot_parser = subparsers.add_parser("compile-snapshot", parents=[output],
+                                            help="Compile an OMDb JSONL dump for offline lookups")
+    snapshot_parser.add_argument("source", help="JSONL file, one raw OMDb answer per line")
+    snapshot_parser.add_argument("--out", default=omdb_snapshot.SNAPSHOT_PATH,
+                                 help="Snapshot database to write (default: OMDB_SNAPSHOT_PATH)")
+    snapshot_parser.set_defaults(func=cmd_compile_snapshot)
+
+    all_parser = subparsers.add_parser("generate-all", help="Generate the websites of all users in parallel")
+    all_parser.add_argument("--users", nargs="+", help="Only these users (default: all)")
+    all_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    all_parser.add_argument("--page-size", type=int, default=None, help="Movies per page (default: one page)")
+    all_parser.add_argument("--force", action="store_true", help="Rebuild even if nothing changed")
+    all_parser.add_argument("--local-posters", action="store_true",
+                            help="Download posters once and link local thumbnails")
+    all_parser.set_defaults(func=cmd_generate_all)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve the HTTP JSON API")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--db-workers", type=int, default=8, help="Threads for database calls")
+    serve_parser.add_argument("--omdb-workers", type=int, default=4, help="Threads for OMDb lookups")
+    serve_parser.add_argument("--page-size", type=int, default=None, help="Movies per generated site page")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    interactive_parser = subparsers.add_parser("interactive", help="Start the interactive menu")
+    interactive_parser.set_defaults(func=cmd_interactive)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Bring an older database up to the current schema; migration notes go to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        storage.init_db()
+    try:
+        return args.func(args)
+    finally:
+        if args.metrics_out:
+            metrics.write(args.metrics_out)
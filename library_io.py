@@ -0,0 +1,144 @@
+"""
+Streaming backup and migration of user libraries as JSONL or CSV files.
+
+Both directions stream: export writes rows as they come out of
+storage.export_movies, import reads the file lazily and hands it to
+storage.import_movies in batches, one transaction per batch. A file holds
+one record per movie with the fields of storage.EXPORT_FIELDS, so an export
+of one user or of all users can be imported into another database.
+"""
+import csv
+import json
+import os
+import tempfile
+import time
+from itertools import islice
+
+import movie_storage_sql as storage
+
+FORMATS = ("jsonl", "csv")
+BATCH_SIZE = 1000  # records per import transaction / rows per export fetch
+REPORT_EVERY = 10_000  # rows between progress lines
+
+
+def file_format(path, fmt=None):
+    """The format to use for path: fmt if given, else by extension (.csv, anything else JSONL)."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown library format: {fmt}")
+    return fmt
+
+
+class Progress:
+    """Counts rows and prints the count and rows/s every `every` rows."""
+
+    def __init__(self, verb, every=REPORT_EVERY):
+        self.verb = verb
+        self.every = every
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def seconds(self):
+        return time.perf_counter() - self.start
+
+    def rows_per_sec(self):
+        seconds = self.seconds()
+        return self.rows / seconds if seconds else 0.0
+
+    def add(self, rows=1):
+        before = self.rows
+        self.rows += rows
+        if self.every and self.rows // self.every > before // self.every:
+            print(f"{self.rows} rows {self.verb}, {self.rows_per_sec():.0f} rows/s")
+
+    def summary(self, **counts):
+        return {"rows": self.rows, **counts, "seconds": self.seconds(), "rows_per_sec": self.rows_per_sec()}
+
+
+#  Export
+def _jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def export_library(path, usernames=None, fmt=None, batch_size=BATCH_SIZE, report_every=REPORT_EVERY):
+    """
+    Write the movies of the given users (default: all users) to path as JSONL
+    or CSV, streaming rows from the database. The file is written next to path
+    and swapped in when complete, so a failed export never leaves half a backup.
+    Prints progress and returns a summary dict (rows, users, seconds, rows_per_sec).
+    """
+    fmt = file_format(path, fmt)
+    progress = Progress("exported", report_every)
+    users = set()
+
+    def counted(records):
+        for record in records:
+            users.add(record["username"])
+            progress.add()
+            yield record
+
+    records = counted(storage.export_movies(usernames, batch_size=batch_size))
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                writer = csv.DictWriter(f, fieldnames=storage.EXPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                f.writelines(_jsonl_lines(records))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    summary = progress.summary(users=len(users))
+    print(f"Exported {summary['rows']} movies of {summary['users']} users to {path} "
+          f"in {summary['seconds']:.1f}s ({summary['rows_per_sec']:.0f} rows/s).")
+    return summary
+
+
+#  Import
+def read_library(path, fmt=None):
+    """
+    Yield the records of an exported library file one at a time. CSV values
+    are strings (empty for missing); add_movies_bulk's validation converts them.
+    """
+    fmt = file_format(path, fmt)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield {key: value if value != "" else None for key, value in row.items()}
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def import_library(path, user=None, fmt=None, on_duplicate="skip", create_users=True,
+                   batch_size=BATCH_SIZE, report_every=REPORT_EVERY):
+    """
+    Import an exported library file in batched transactions (see
+    storage.import_movies). With `user`, every record goes to that user instead
+    of the one in the file. Prints progress and returns a summary dict with the
+    count of each outcome (added, updated, duplicate, invalid, user_not_found).
+    """
+    progress = Progress("imported", report_every)
+    counts = dict.fromkeys(("added", "updated", "duplicate", "invalid", "user_not_found"), 0)
+    records = read_library(path, fmt)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        for outcome in storage.import_movies(batch, user=user, on_duplicate=on_duplicate,
+                                             create_users=create_users):
+            counts[outcome] += 1
+        progress.add(len(batch))
+
+    summary = progress.summary(**counts)
+    print(f"Imported {summary['rows']} rows from {path} in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_sec']:.0f} rows/s): {counts['added']} added, {counts['updated']} updated, "
+          f"{counts['duplicate']} duplicates, {counts['invalid']} invalid.")
+    return summary
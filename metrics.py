@@ -0,0 +1,372 @@
+"""
+In-process metrics: labelled counters and latency histograms, exported as
+JSON or in the Prometheus text exposition format.
+
+    STORAGE = metrics.instrument("storage")       # decorator: call latency, errors, rows
+    with OMDB_HTTP_SECONDS.time(): ...             # context manager on any histogram
+    metrics.instrument_engine(engine)              # per-query latency via cursor events
+
+Set MOVIES_METRICS=0 (or metrics.enabled = False) to stop recording.
+"""
+import bisect
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds, from sub-millisecond queries to slow OMDb calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+enabled = os.getenv("MOVIES_METRICS", "1") != "0"
+
+
+#  Metric Types
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values tuple -> value or histogram state
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _items(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    """A value that only goes up, one per label combination."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        return [{"labels": labels, "value": value} for labels, value in self._items()]
+
+
+class _HistogramState:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self, size):
+        self.counts = [0] * size  # per bucket, the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def copy(self):
+        state = _HistogramState(0)
+        state.counts, state.count, state.sum, state.max = list(self.counts), self.count, self.sum, self.max
+        return state
+
+
+class Histogram(_Metric):
+    """Observations sorted into fixed buckets, plus their count, sum and max."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = _HistogramState(len(self.buckets) + 1)
+            state.counts[bisect.bisect_left(self.buckets, value)] += 1
+            state.count += 1
+            state.sum += value
+            state.max = max(state.max, value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent inside the with block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, state, q):
+        """Estimate a quantile by interpolating inside its bucket."""
+        rank = q * state.count
+        seen = 0
+        for i, n in enumerate(state.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else state.max
+                return min(state.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return state.max
+
+    def _summary(self, state):
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.buckets + ("+Inf",), state.counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            "count": state.count,
+            "sum": state.sum,
+            "max": state.max,
+            "mean": state.sum / state.count if state.count else 0.0,
+            "p50": self._quantile(state, 0.50),
+            "p95": self._quantile(state, 0.95),
+            "p99": self._quantile(state, 0.99),
+            "buckets": buckets,
+        }
+
+    def summary(self, **labels):
+        """count, sum, max, mean, estimated p50/p95/p99 and cumulative buckets for one label set."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return self._summary(state) if state else {"count": 0}
+
+    def _items(self):
+        # Copies, so exporters never read a state that is being updated
+        return [(labels, state.copy()) for labels, state in super()._items()]
+
+    def samples(self):
+        return [{"labels": labels, **self._summary(state)} for labels, state in self._items()]
+
+
+#  Registry
+class Registry:
+    """Named metrics; asking twice for the same name returns the same metric."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, labelnames, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind} "
+                                 f"with labels {metric.labelnames}")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get(Counter, name, labelnames, help_text)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, labelnames, help_text, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def reset(self):
+        """Forget all recorded values (the metrics themselves stay registered)."""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def to_dict(self):
+        return {name: {"type": metric.kind, "help": metric.help, "samples": metric.samples()}
+                for name, metric in sorted(self._metrics.items())}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in metric._items():
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(metric.buckets + ("+Inf",), value.counts):
+                    cumulative += n
+                    le = bound if bound == "+Inf" else _number(bound)
+                    lines.append(f"{name}_bucket{_label_text({**labels, 'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {_number(value.sum)}")
+                lines.append(f"{name}_count{_label_text(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+counter = registry.counter
+histogram = registry.histogram
+reset = registry.reset
+to_dict = registry.to_dict
+to_json = registry.to_json
+to_prometheus = registry.to_prometheus
+
+
+def write(path):
+    """Write all metrics to a file: Prometheus text for *.prom, JSON otherwise."""
+    content = to_prometheus() if path.endswith(".prom") else to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+#  Decorators
+_operation = threading.local()
+
+
+def current_operation():
+    """Name of the innermost instrumented function running on this thread, or None."""
+    stack = getattr(_operation, "stack", None)
+    return stack[-1] if stack else None
+
+
+def _default_rows(result):
+    """Lists count their items, None counts as nothing, anything else as one row."""
+    if result is None:
+        return 0
+    return len(result) if isinstance(result, list) else 1
+
+
+def instrument(component, rows=_default_rows):
+    """
+    Decorator factory for the functions of a component (e.g. "storage"):
+    records <component>_call_seconds{function}, <component>_errors_total{function}
+    and <component>_rows_returned_total{function} (counted with `rows`).
+    While the function runs, database queries are attributed to it.
+    Generator functions are not supported: instrument what they call instead.
+    """
+    calls = histogram(f"{component}_call_seconds", f"Latency of {component} functions in seconds",
+                      ("function",))
+    errors = counter(f"{component}_errors_total", f"{component} calls that raised", ("function",))
+    returned = counter(f"{component}_rows_returned_total", f"Rows returned by {component} functions",
+                       ("function",))
+
+    def decorator(func=None, *, rows=rows):
+        if func is None:  # used as @STORAGE(rows=len)
+            return functools.partial(decorator, rows=rows)
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            stack = _operation.__dict__.setdefault("stack", [])
+            stack.append(name)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                errors.inc(function=name)
+                raise
+            finally:
+                calls.observe(time.perf_counter() - start, function=name)
+                stack.pop()
+            returned.inc(rows(result), function=name)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def timed(metric, **labels):
+    """Decorator: observe each call's duration in a histogram; works on coroutine functions too."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with metric.time(**labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metric.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+#  SQLAlchemy Query Timing
+DB_QUERY_SECONDS = histogram("db_query_seconds", "Database statement latency in seconds",
+                             ("function", "statement"))
+
+
+def _statement_kind(statement):
+    words = statement.split(None, 1)
+    return words[0].upper() if words else ""
+
+
+def instrument_engine(engine):
+    """
+    Time every statement on the engine (executemany counts once) into
+    db_query_seconds, labelled with the instrumented function that issued it
+    ("other" outside one) and the SQL verb.
+    """
+    from sqlalchemy import event  # only needed by callers that have an engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        DB_QUERY_SECONDS.observe(time.perf_counter() - starts.pop(),
+                                 function=current_operation() or "other",
+                                 statement=_statement_kind(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        connection = exception_context.connection
+        starts = connection.info.get("metrics_query_start") if connection is not None else None
+        if starts:
+            starts.pop()
+
+    return engine
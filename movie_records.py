@@ -0,0 +1,115 @@
+"""
+Compact result types for movie rows.
+
+Movie replaces the per-row {"title", "year", "rating", "poster_url"} dicts
+returned by list_movies; MovieColumns holds many rows column by column for
+analytics code that scans ratings or years without needing row objects.
+"""
+from array import array
+from typing import NamedTuple, Optional
+
+FIELDS = ("id", "title", "year", "rating", "poster_url")
+KEYS = FIELDS[1:]  # the keys of the old row dicts; the id was their dict key
+
+
+class Movie(NamedTuple):
+    """
+    One movie row as an immutable named tuple of (id, title, year, rating,
+    poster_url), about half the size of the dict it replaces. Read fields as
+    attributes (movie.title). For existing callers, movie["title"] and
+    movie.get("title") also read a field by name; everything else (iteration,
+    len(), ==, JSON) behaves like the plain tuple it is, so use to_dict() for
+    the old {"title", "year", "rating", "poster_url"} dict and replace()
+    instead of item assignment.
+    """
+    id: int
+    title: str
+    year: int
+    rating: float
+    poster_url: Optional[str] = None
+
+    #  Dict-style reads
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in FIELDS:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    #  Conversion
+    def to_dict(self):
+        """The old row dict (without the id)."""
+        return {"title": self.title, "year": self.year, "rating": self.rating, "poster_url": self.poster_url}
+
+    def replace(self, **changes):
+        """A copy with some fields changed, e.g. movie.replace(rating=9.0)."""
+        return self._replace(**changes)
+
+
+# Movie.from_row(row) builds a record from an (id, title, year, rating, poster_url)
+# sequence such as a database row, in a single C-level tuple construction.
+Movie.from_row = Movie._make
+
+
+class MovieColumns:
+    """
+    Movie rows stored column by column: ids, years and ratings in typed
+    arrays, titles and poster URLs in lists. There is no per-row object, so
+    scans such as sum(columns.ratings) touch one buffer; columns[i] builds a
+    Movie on demand and columns.get(movie_id) looks one up by id.
+    """
+    __slots__ = ("ids", "titles", "years", "ratings", "poster_urls", "_positions")
+
+    def __init__(self, rows=()):
+        self.ids = array("q")
+        self.titles = []
+        self.years = array("l")
+        self.ratings = array("d")
+        self.poster_urls = []
+        self._positions = None
+        self.extend(rows)
+
+    def extend(self, rows):
+        """Append (id, title, year, rating, poster_url) rows."""
+        rows = list(rows)
+        if not rows:
+            return
+        ids, titles, years, ratings, poster_urls = zip(*rows)
+        self.ids.extend(ids)
+        self.titles.extend(titles)
+        self.years.extend(years)
+        self.ratings.extend(ratings)
+        self.poster_urls.extend(poster_urls)
+        self._positions = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MovieColumns(zip(self.ids[index], self.titles[index], self.years[index],
+                                    self.ratings[index], self.poster_urls[index]))
+        return Movie(self.ids[index], self.titles[index], self.years[index],
+                     self.ratings[index], self.poster_urls[index])
+
+    def __iter__(self):
+        return map(Movie, self.ids, self.titles, self.years, self.ratings, self.poster_urls)
+
+    def get(self, movie_id, default=None):
+        """The movie with this id, or default (the id index is built on first use)."""
+        if self._positions is None:
+            self._positions = {movie_id: i for i, movie_id in enumerate(self.ids)}
+        index = self._positions.get(movie_id)
+        return default if index is None else self[index]
+
+    def column(self, name):
+        """One column by field name ("id", "title", "year", "rating" or "poster_url")."""
+        return getattr(self, {"id": "ids", "title": "titles", "year": "years",
+                              "rating": "ratings", "poster_url": "poster_urls"}[name])
+
+    def to_dict(self):
+        """The list_movies shape: {id: Movie}."""
+        return {movie.id: movie for movie in self}
@@ -1,10 +1,92 @@
 # movie_storage_sql.py
-from sqlalchemy import create_engine, text
+import contextlib
+import heapq
+import math
+import os
+import random
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
 
-DB_URL = "sqlite:///data/movies.db"
-engine = create_engine(DB_URL, echo=False)
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool, StaticPool
+
+import metrics
+from movie_records import Movie, MovieColumns
+
+DEFAULT_DB_URL = "sqlite:///data/movies.db"
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+# Latency, errors and rows returned per storage function (see metrics.py)
+instrumented = metrics.instrument("storage")
+
+
+#  Engine Configuration
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def create_storage_engine(url=None, journal_mode=None, synchronous=None, busy_timeout_ms=None,
+                          cache_size_kb=None, mmap_size=None, pool_size=None):
+    """
+    Create the SQLAlchemy engine for the movie database.
+    Every argument falls back to an environment variable, then to a default:
+      url             MOVIES_DB_URL                 sqlite:///data/movies.db
+      journal_mode    MOVIES_DB_JOURNAL_MODE        WAL
+      synchronous     MOVIES_DB_SYNCHRONOUS         NORMAL
+      busy_timeout_ms MOVIES_DB_BUSY_TIMEOUT_MS     5000
+      cache_size_kb   MOVIES_DB_CACHE_SIZE_KB       20000 (page cache per connection)
+      mmap_size       MOVIES_DB_MMAP_SIZE           268435456 (bytes, 0 disables)
+      pool_size       MOVIES_DB_POOL_SIZE           5
+    The pragmas are applied to every new DBAPI connection via a "connect" event.
+    In-memory databases share a single connection (StaticPool) so all threads
+    see the same data; file databases get a QueuePool.
+    """
+    url = url or os.getenv("MOVIES_DB_URL", DEFAULT_DB_URL)
+    journal_mode = journal_mode or os.getenv("MOVIES_DB_JOURNAL_MODE", "WAL")
+    synchronous = synchronous or os.getenv("MOVIES_DB_SYNCHRONOUS", "NORMAL")
+    busy_timeout_ms = busy_timeout_ms if busy_timeout_ms is not None else _env_int("MOVIES_DB_BUSY_TIMEOUT_MS", 5000)
+    cache_size_kb = cache_size_kb if cache_size_kb is not None else _env_int("MOVIES_DB_CACHE_SIZE_KB", 20000)
+    mmap_size = mmap_size if mmap_size is not None else _env_int("MOVIES_DB_MMAP_SIZE", 256 * 1024 * 1024)
+    pool_size = pool_size if pool_size is not None else _env_int("MOVIES_DB_POOL_SIZE", 5)
+    journal_mode, synchronous = journal_mode.upper(), synchronous.upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown journal mode: {journal_mode}")
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f"Unknown synchronous mode: {synchronous}")
+
+    in_memory = url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+    if in_memory:
+        new_engine = create_engine(url, echo=False, poolclass=StaticPool,
+                                   connect_args={"check_same_thread": False})
+    else:
+        new_engine = create_engine(url, echo=False, poolclass=QueuePool,
+                                   pool_size=pool_size, max_overflow=pool_size * 2,
+                                   connect_args={"check_same_thread": False,
+                                                 "timeout": busy_timeout_ms / 1000})
+
+    @event.listens_for(new_engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size={-int(cache_size_kb)}")
+        cursor.close()
+
+    return metrics.instrument_engine(new_engine)
+
+
+engine = create_storage_engine()
 
 # Create tables if they don't exist
+@instrumented
 def init_db():
     with engine.connect() as connection:
         connection.execute(text("""
@@ -25,113 +107,1152 @@ def init_db():
         )
         """))
         connection.commit()
+    migrate()
+
+
+#  Schema Migrations
+def _report_duplicate_movies(connection):
+    """Print how many duplicate movies migration 4 removes per user (it keeps each one's oldest copy)."""
+    removed = connection.execute(text("""
+        SELECT COALESCE(u.username, '#' || m.user_id), COUNT(*)
+        FROM movies m LEFT JOIN users u ON u.id = m.user_id
+        WHERE m.id NOT IN (SELECT MIN(id) FROM movies GROUP BY user_id, title, year)
+        GROUP BY m.user_id ORDER BY m.user_id
+    """)).fetchall()
+    if removed:
+        users = ", ".join(f"{username}: {count}" for username, count in removed)
+        print(f"Migration 4: removed {sum(count for _, count in removed)} duplicate movies, "
+              f"keeping the oldest copy of each ({users}).")
+
+
+# Ordered (version, description, statements); a statement is SQL or a function
+# called with the connection. Append new steps, never edit applied ones.
+MIGRATIONS = [
+    (1, "index movies by user", [
+        "CREATE INDEX IF NOT EXISTS idx_movies_user ON movies(user_id)",
+    ]),
+    (2, "index movies by user and rating", [
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_rating ON movies(user_id, rating)",
+    ]),
+    (3, "index movies by user and title", [
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_title ON movies(user_id, title COLLATE NOCASE)",
+    ]),
+    (4, "one movie per user, title and year", [
+        # Keep the oldest copy of existing duplicates so the unique index can be built
+        _report_duplicate_movies,
+        """DELETE FROM movies WHERE id NOT IN (
+               SELECT MIN(id) FROM movies GROUP BY user_id, title, year
+           )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_movies_user_title_year ON movies(user_id, title, year)",
+    ]),
+    (5, "full-text index on movie titles", [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+               title, content='movies', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+           )""",
+        """CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+               INSERT INTO movies_fts(rowid, title) VALUES (new.id, new.title);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+               INSERT INTO movies_fts(movies_fts, rowid, title) VALUES ('delete', old.id, old.title);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title ON movies BEGIN
+               INSERT INTO movies_fts(movies_fts, rowid, title) VALUES ('delete', old.id, old.title);
+               INSERT INTO movies_fts(rowid, title) VALUES (new.id, new.title);
+           END""",
+        # Backfill the index from the rows that already exist
+        "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",
+    ]),
+    (6, "shared movie catalog", [
+        # One row per film, shared by all users; imdb_id is NULL for movies added by hand
+        """CREATE TABLE IF NOT EXISTS catalog (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               imdb_id TEXT,
+               title TEXT NOT NULL,
+               year INTEGER NOT NULL,
+               poster_url TEXT,
+               genre TEXT,
+               runtime INTEGER,
+               plot TEXT
+           )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_catalog_imdb_id ON catalog(imdb_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_catalog_title_year ON catalog(title, year)",
+        """INSERT INTO catalog (title, year, poster_url)
+           SELECT title, year, MAX(poster_url) FROM movies GROUP BY title, year""",
+        # Per-user rows keep only the link and the personal rating; movie IDs are preserved
+        "DROP TRIGGER IF EXISTS movies_fts_insert",
+        "DROP TRIGGER IF EXISTS movies_fts_delete",
+        "DROP TRIGGER IF EXISTS movies_fts_update",
+        "DROP TABLE IF EXISTS movies_fts",
+        """CREATE TABLE movies_new (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               user_id INTEGER NOT NULL,
+               catalog_id INTEGER NOT NULL,
+               rating REAL NOT NULL,
+               FOREIGN KEY(user_id) REFERENCES users(id),
+               FOREIGN KEY(catalog_id) REFERENCES catalog(id)
+           )""",
+        """INSERT INTO movies_new (id, user_id, catalog_id, rating)
+           SELECT m.id, m.user_id, c.id, m.rating
+           FROM movies m JOIN catalog c ON c.title = m.title AND c.year = m.year""",
+        "DROP TABLE movies",
+        "ALTER TABLE movies_new RENAME TO movies",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_movies_user_catalog ON movies(user_id, catalog_id)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_rating ON movies(user_id, rating)",
+        "CREATE INDEX IF NOT EXISTS idx_catalog_title ON catalog(title COLLATE NOCASE)",
+        # Title search now indexes the catalog
+        """CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+               title, content='catalog', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+           )""",
+        """CREATE TRIGGER IF NOT EXISTS catalog_fts_insert AFTER INSERT ON catalog BEGIN
+               INSERT INTO catalog_fts(rowid, title) VALUES (new.id, new.title);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS catalog_fts_delete AFTER DELETE ON catalog BEGIN
+               INSERT INTO catalog_fts(catalog_fts, rowid, title) VALUES ('delete', old.id, old.title);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS catalog_fts_update AFTER UPDATE OF title ON catalog BEGIN
+               INSERT INTO catalog_fts(catalog_fts, rowid, title) VALUES ('delete', old.id, old.title);
+               INSERT INTO catalog_fts(rowid, title) VALUES (new.id, new.title);
+           END""",
+        "INSERT INTO catalog_fts(catalog_fts) VALUES ('rebuild')",
+    ]),
+    (7, "index movies by user and id", [
+        # Per-user MIN/MAX(id) and id seeks for random_movie
+        "CREATE INDEX IF NOT EXISTS idx_movies_user_id ON movies(user_id, id)",
+    ]),
+    (8, "identify catalog films by title and year only without an imdb_id", [
+        # Different films can share a title and year (remakes); only hand-added rows are matched that way
+        "DROP INDEX IF EXISTS uq_catalog_title_year",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_catalog_title_year ON catalog(title, year) WHERE imdb_id IS NULL",
+    ]),
+]
+
+
+@instrumented
+def get_schema_version():
+    """Return the highest applied migration version (0 for a fresh database)."""
+    with engine.connect() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """))
+        connection.commit()
+        return connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+@instrumented
+def migrate():
+    """Apply all pending migrations in order, each in its own transaction."""
+    list_cache.clear()
+    current = get_schema_version()
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as connection:
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.execute(text(statement))
+            connection.execute(
+                text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
 
 
 #  User Functions
+@instrumented
 def list_users():
     """Return a list of all users."""
     with engine.connect() as connection:
         result = connection.execute(text("SELECT username FROM users"))
         return [row[0] for row in result.fetchall()]
 
+
+USERNAME_MAX_LENGTH = 64
+PAGE_SEPARATOR = "~"  # joins a username and a page number in site file names (see site_generator)
+# Path separators, characters Windows rejects in file names and the page separator
+USERNAME_FORBIDDEN = set('/\\:*?"<>|' + PAGE_SEPARATOR)
+
+
+def username_error(username):
+    """
+    Why a username cannot be used, or None if it is valid. Usernames become
+    file names of the generated sites, so path separators, a leading dot
+    (".", "..", hidden files) and control characters are rejected.
+    """
+    if not isinstance(username, str) or not username.strip():
+        return "Username cannot be empty."
+    if username != username.strip():
+        return "Username cannot start or end with whitespace."
+    if len(username) > USERNAME_MAX_LENGTH:
+        return f"Username cannot be longer than {USERNAME_MAX_LENGTH} characters."
+    if username.startswith("."):
+        return "Username cannot start with '.'."
+    if any(c in USERNAME_FORBIDDEN or unicodedata.category(c).startswith("C") for c in username):
+        return "Username cannot contain control characters or any of / \\ : * ? \" < > | ~."
+    return None
+
+
+def _insert_user(connection, username):
+    """Create a validated user on an open connection and return its id; ValueError if the name is invalid."""
+    error = username_error(username)
+    if error:
+        raise ValueError(error)
+    return connection.execute(
+        text("INSERT INTO users (username) VALUES (:username)"),
+        {"username": username}
+    ).lastrowid
+
+
+@instrumented
 def add_user(username):
     """Create a new user."""
     with engine.connect() as connection:
         try:
-            connection.execute(
-                text("INSERT INTO users (username) VALUES (:username)"),
-                {"username": username}
-            )
+            _insert_user(connection, username)
             connection.commit()
             print(f"User '{username}' created successfully.")
         except Exception as e:
             print(f"Error creating user: {e}")
 
 
+@instrumented
 def get_user_id(username):
     """Return the user ID for a given username."""
     with engine.connect() as connection:
-        result = connection.execute(
-            text("SELECT id FROM users WHERE username=:username"),
-            {"username": username}
-        ).fetchone()
+        return _resolve_user_id(connection, username)
+
+
+def _resolve_user_id(connection, username):
+    """get_user_id on an already open connection."""
+    result = connection.execute(
+        text("SELECT id FROM users WHERE username=:username"),
+        {"username": username}
+    ).fetchone()
     return result[0] if result else None
 
 
+#  list_movies Cache
+LIST_CACHE_SIZE = _env_int("MOVIES_LIST_CACHE_SIZE", 64)  # libraries kept in memory (0 disables)
+LIST_CACHE_MODE = os.getenv("MOVIES_LIST_CACHE_MODE", "local")  # "local" or "shared"
+
+
+class ListCache:
+    """
+    Bounded LRU of list_movies results, keyed by (engine, username, data version).
+    Every write through this module bumps the user's version before it starts
+    and again after it commits, so a result read while the write was running
+    can never be served afterwards. Adds also bump the catalog version: they can
+    complete a shared catalog row (e.g. its poster) that other users list too.
+
+    "local" mode only sees writes made by this process. "shared" mode (for
+    several processes writing one database file) adds SQLite's
+    PRAGMA data_version, read on a dedicated connection, to the key: it changes
+    whenever any other connection commits, so every such write invalidates all
+    entries. It costs one PRAGMA per list_movies call.
+    """
+
+    def __init__(self, max_entries=LIST_CACHE_SIZE, mode=LIST_CACHE_MODE):
+        if mode not in ("local", "shared"):
+            raise ValueError(f"Unknown list cache mode: {mode}")
+        self.max_entries = max_entries
+        self.mode = mode
+        self._entries = OrderedDict()  # key -> {movie_id: movie}
+        self._versions = {}  # username -> version
+        self._catalog_version = 0
+        self._watchers = {}  # engine -> DBAPI connection used for PRAGMA data_version
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _data_version(self, db_engine):
+        watcher = self._watchers.get(db_engine)
+        if watcher is None:
+            # Outside the pool: data_version only changes for commits by *other* connections
+            cargs, cparams = db_engine.dialect.create_connect_args(db_engine.url)
+            watcher = self._watchers[db_engine] = db_engine.dialect.connect(*cargs, **cparams)
+        return watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def key(self, db_engine, username):
+        with self._lock:
+            key = (db_engine, username, self._versions.get(username, 0), self._catalog_version)
+            if self.mode == "shared":
+                key += (self._data_version(db_engine),)
+        return key
+
+    def get(self, key):
+        """Return a copy of the cached library, or None on a miss."""
+        with self._lock:
+            movies = self._entries.get(key)
+            if movies is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+        # Movie records are immutable, so only the mapping itself needs copying
+        return dict(movies)
+
+    def put(self, key, movies):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = dict(movies)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def bump(self, username=None, catalog=False):
+        """Invalidate a user's entries (and with catalog=True, everyone's)."""
+        with self._lock:
+            if username is not None:
+                self._versions[username] = self._versions.get(username, 0) + 1
+            if catalog:
+                self._catalog_version += 1
+
+    @contextlib.contextmanager
+    def invalidating(self, username, catalog=False):
+        """Bump around a write: before it starts and after it commits (or fails)."""
+        self.bump(username, catalog)
+        try:
+            yield
+        finally:
+            self.bump(username, catalog)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._catalog_version += 1
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+
+list_cache = ListCache()
+
+
 #  Movie Functions
+# The user is resolved inside each statement (join / subquery on users.username),
+# so every operation is a single statement on a single connection.
+USER_ID_SUBQUERY = "(SELECT id FROM users WHERE username=:username)"
+
+# A user's movie row only holds the personal rating and a link to the shared
+# catalog row (title, year, poster and OMDb details), one per film for all users.
+MOVIES_JOIN = "movies m JOIN catalog c ON c.id = m.catalog_id"
+
+# Insert a film into the catalog, or fill in the details an existing row is
+# missing. A film is identified by imdb_id when known; only films without one
+# are matched by (title, year), and only to other rows without one, so two
+# films sharing a title and year are never merged.
+CATALOG_UPSERT = """
+    INSERT INTO catalog (imdb_id, title, year, poster_url, genre, runtime, plot)
+    {source}
+    ON CONFLICT(imdb_id) DO NOTHING
+    ON CONFLICT(title, year) WHERE imdb_id IS NULL DO UPDATE SET
+        poster_url = COALESCE(NULLIF(catalog.poster_url, ''), excluded.poster_url),
+        genre = COALESCE(catalog.genre, excluded.genre),
+        runtime = COALESCE(catalog.runtime, excluded.runtime),
+        plot = COALESCE(catalog.plot, excluded.plot)
+"""
+# Run before CATALOG_UPSERT: a film first added without an imdb_id (manually or
+# by migration 6) takes the imdb_id and missing details of a later OMDb add of
+# the same title and year, so that add finds the same catalog row instead of
+# creating a second one
+CATALOG_ADOPT_IMDB_ID = """
+    UPDATE catalog SET
+        imdb_id = :imdb_id,
+        poster_url = COALESCE(NULLIF(poster_url, ''), :poster_url),
+        genre = COALESCE(genre, :genre),
+        runtime = COALESCE(runtime, :runtime),
+        plot = COALESCE(plot, :plot)
+    WHERE imdb_id IS NULL AND title=:title AND year=:year
+      AND NOT EXISTS (SELECT 1 FROM catalog WHERE imdb_id=:imdb_id)
+"""
+CATALOG_VALUES = "VALUES (:imdb_id, :title, :year, :poster_url, :genre, :runtime, :plot)"
+# Catalog id for a movie added by users.id. Without an imdb_id, a film the user
+# already has with that title and year comes first, so the add is a duplicate
+CATALOG_ID_SUBQUERY = f"""(CASE WHEN :imdb_id IS NULL
+    THEN COALESCE(
+        (SELECT c.id FROM {MOVIES_JOIN} WHERE m.user_id=users.id AND c.title=:title AND c.year=:year LIMIT 1),
+        (SELECT id FROM catalog WHERE title=:title AND year=:year AND imdb_id IS NULL))
+    ELSE (SELECT id FROM catalog WHERE imdb_id=:imdb_id)
+END)"""
+
+
+@instrumented(rows=len)
 def list_movies(username):
-    """Return all movies for a user as a dict keyed by movie ID."""
-    user_id = get_user_id(username)
-    if not user_id:
-        return {}
+    """
+    Return all movies for a user as {movie_id: Movie} (served from list_cache when
+    unchanged). Movie records also read fields by name (movie["title"]).
+    """
+    key = list_cache.key(engine, username)
+    cached = list_cache.get(key)
+    if cached is not None:
+        return cached
 
     with engine.connect() as connection:
         result = connection.execute(
-            text("SELECT id, title, year, rating, poster_url FROM movies WHERE user_id=:user_id"),
-            {"user_id": user_id}
+            text(f"""
+                SELECT m.id, c.title, c.year, m.rating, c.poster_url
+                FROM {MOVIES_JOIN} JOIN users u ON u.id = m.user_id
+                WHERE u.username=:username
+            """),
+            {"username": username}
         ).fetchall()
 
-    return {row[0]: {"title": row[1], "year": row[2], "rating": row[3], "poster_url": row[4]} for row in result}
+    movies = {row[0]: Movie.from_row(row) for row in result}
+    list_cache.put(key, movies)
+    return movies
 
 
-def add_movie(title, year, rating, poster_url=None, user=None):
-    """Add a movie for a user."""
-    user_id = get_user_id(user)
-    if not user_id:
-        print(f"User '{user}' not found.")
-        return
+@instrumented(rows=len)
+def list_movie_columns(username):
+    """
+    Return all movies for a user as MovieColumns (typed arrays per column, no
+    per-row objects) for analytics over large libraries. Rows are in id order.
+    """
+    columns = MovieColumns()
+    with engine.connect() as connection:
+        result = connection.execute(
+            text(f"""
+                SELECT m.id, c.title, c.year, m.rating, c.poster_url
+                FROM {MOVIES_JOIN}
+                WHERE m.user_id={USER_ID_SUBQUERY}
+                ORDER BY m.id
+            """),
+            {"username": username}
+        )
+        for rows in result.partitions(5000):
+            columns.extend(rows)
+    return columns
+
 
+@instrumented
+def get_movie(username, movie_id):
+    """Return one of a user's movies with its catalog details (imdb_id, genre, runtime, plot), or None."""
     with engine.connect() as connection:
-        try:
-            connection.execute(
-                text("""
-                    INSERT INTO movies (title, year, rating, poster_url, user_id)
-                    VALUES (:title, :year, :rating, :poster_url, :user_id)
+        row = connection.execute(
+            text(f"""
+                SELECT m.id, c.title, c.year, m.rating, c.poster_url, c.imdb_id, c.genre, c.runtime, c.plot
+                FROM {MOVIES_JOIN}
+                WHERE m.id=:id AND m.user_id={USER_ID_SUBQUERY}
+            """),
+            {"id": movie_id, "username": username}
+        ).fetchone()
+    if row is None:
+        return None
+    return {"id": row[0], "title": row[1], "year": row[2], "rating": row[3], "poster_url": row[4],
+            "imdb_id": row[5], "genre": row[6], "runtime": row[7], "plot": row[8]}
+
+
+@instrumented
+def add_movie(title, year, rating, poster_url=None, user=None, imdb_id=None, genre=None, runtime=None, plot=None):
+    """Add a movie for a user, creating or completing its catalog entry."""
+    params = {"title": title, "year": year, "rating": rating, "poster_url": poster_url, "username": user,
+              "imdb_id": imdb_id, "genre": genre, "runtime": runtime, "plot": plot}
+    try:
+        with list_cache.invalidating(user, catalog=True), engine.begin() as connection:
+            if imdb_id:
+                connection.execute(text(CATALOG_ADOPT_IMDB_ID), params)
+            # Selecting from users keeps unknown users from creating catalog rows
+            connection.execute(text(CATALOG_UPSERT.format(source="""
+                SELECT :imdb_id, :title, :year, :poster_url, :genre, :runtime, :plot
+                FROM users WHERE username=:username
+            """)), params)
+            result = connection.execute(
+                text(f"""
+                    INSERT INTO movies (user_id, catalog_id, rating)
+                    SELECT id, {CATALOG_ID_SUBQUERY}, :rating FROM users WHERE username=:username
                 """),
-                {"title": title, "year": year, "rating": rating, "poster_url": poster_url, "user_id": user_id}
+                params
             )
-            connection.commit()
-            print(f"Movie '{title}' added for {user}.")
-        except Exception as e:
-            print(f"Error adding movie: {e}")
+    except IntegrityError:
+        print(f"Movie '{title}' ({year}) already exists for {user}.")
+        return
+    except Exception as e:
+        print(f"Error adding movie: {e}")
+        return
+
+    if result.rowcount:
+        print(f"Movie '{title}' added for {user}.")
+    else:
+        print(f"User '{user}' not found.")
 
 
-def delete_movie(movie_id, user=None):
-    """Delete a movie by its ID for a specific user."""
-    user_id = get_user_id(user)
-    if not user_id:
+def _report_missing(movie_id, user):
+    """Explain a zero-row DELETE/UPDATE: unknown user or unknown movie."""
+    if get_user_id(user) is None:
         print(f"User '{user}' not found.")
-        return
+    else:
+        print(f"Movie ID {movie_id} not found for {user}.")
 
-    with engine.connect() as connection:
+
+@instrumented
+def delete_movie(movie_id, user=None):
+    """Delete a movie by its ID for a specific user."""
+    with list_cache.invalidating(user), engine.connect() as connection:
         result = connection.execute(
-            text("DELETE FROM movies WHERE id=:id AND user_id=:user_id"),
-            {"id": movie_id, "user_id": user_id}
+            text(f"DELETE FROM movies WHERE id=:id AND user_id={USER_ID_SUBQUERY}"),
+            {"id": movie_id, "username": user}
         )
         connection.commit()
-        if result.rowcount:
-            print(f"Movie ID {movie_id} deleted for {user}.")
-        else:
-            print(f"Movie ID {movie_id} not found for {user}.")
 
+    if result.rowcount:
+        print(f"Movie ID {movie_id} deleted for {user}.")
+    else:
+        _report_missing(movie_id, user)
 
+
+@instrumented
 def update_movie(movie_id, rating, user=None):
     """Update a movie's rating by ID for a specific user."""
-    user_id = get_user_id(user)
-    if not user_id:
-        print(f"User '{user}' not found.")
-        return
-
-    with engine.connect() as connection:
+    with list_cache.invalidating(user), engine.connect() as connection:
         result = connection.execute(
-            text("UPDATE movies SET rating=:rating WHERE id=:id AND user_id=:user_id"),
-            {"rating": rating, "id": movie_id, "user_id": user_id}
+            text(f"UPDATE movies SET rating=:rating WHERE id=:id AND user_id={USER_ID_SUBQUERY}"),
+            {"rating": rating, "id": movie_id, "username": user}
         )
         connection.commit()
-        if result.rowcount:
-            print(f"Movie ID {movie_id} rating updated for {user}.")
+
+    if result.rowcount:
+        print(f"Movie ID {movie_id} rating updated for {user}.")
+    else:
+        _report_missing(movie_id, user)
+
+
+#  Movie Queries (sorting, filtering and pagination in SQL)
+SORT_COLUMNS = {
+    "id": "m.id",
+    "title": "c.title COLLATE NOCASE",
+    "year": "c.year",
+    "rating": "m.rating",
+}
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filter_conditions(title_like=None, min_year=None, max_year=None, min_rating=None, max_rating=None):
+    """The WHERE conditions and parameters of the query_movies filters."""
+    conditions, params = [], {}
+    if title_like:
+        conditions.append("c.title LIKE :title_like ESCAPE '\\'")
+        params["title_like"] = f"%{_escape_like(title_like)}%"
+    for name, condition, value in (("min_year", "c.year >= :min_year", min_year),
+                                   ("max_year", "c.year <= :max_year", max_year),
+                                   ("min_rating", "m.rating >= :min_rating", min_rating),
+                                   ("max_rating", "m.rating <= :max_rating", max_rating)):
+        if value is not None:
+            conditions.append(condition)
+            params[name] = value
+    return conditions, params
+
+
+@instrumented
+def query_movies(username, order_by="id", descending=False, limit=None, offset=0, after=None,
+                 title_like=None, min_year=None, max_year=None, min_rating=None, max_rating=None):
+    """
+    Return one page of a user's movies as a list of dicts (with "id").
+    Sorting (order_by: id, title, year or rating), filtering and paging all
+    happen in SQL. Ties are broken by id, so the order is stable.
+    title_like is a case-insensitive substring match.
+    after=(sort_value, id) of the last row of the previous page selects the
+    next page by keyset, which stays fast however deep you page; offset works
+    too but SQLite still has to walk the skipped rows.
+    """
+    if order_by not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by {order_by!r}")
+    column = SORT_COLUMNS[order_by]
+    direction = "DESC" if descending else "ASC"
+
+    conditions, params = _filter_conditions(title_like, min_year, max_year, min_rating, max_rating)
+    conditions.insert(0, f"m.user_id={USER_ID_SUBQUERY}")
+    params["username"] = username
+    if after is not None:
+        comparison = "<" if descending else ">"
+        if order_by == "id":
+            conditions.append(f"m.id {comparison} :after_id")
         else:
-            print(f"Movie ID {movie_id} not found for {user}.")
+            conditions.append(f"({column}, m.id) {comparison} (:after_value, :after_id)")
+            params["after_value"] = after[0]
+        params["after_id"] = after[1]
+
+    sql = f"""
+        SELECT m.id, c.title, c.year, m.rating, c.poster_url FROM {MOVIES_JOIN}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {column} {direction}{f", m.id {direction}" if order_by != "id" else ""}
+    """
+    if limit is not None or offset:
+        # LIMIT -1 is SQLite's "no limit", so an offset also works on its own
+        sql += " LIMIT :limit OFFSET :offset"
+        params.update(limit=-1 if limit is None else limit, offset=offset)
+
+    with engine.connect() as connection:
+        result = connection.execute(text(sql), params).fetchall()
+    return [{"id": row[0], "title": row[1], "year": row[2], "rating": row[3], "poster_url": row[4]}
+            for row in result]
+
+
+@instrumented
+def count_movies(username):
+    """Return how many movies a user has."""
+    with engine.connect() as connection:
+        return connection.execute(
+            text(f"SELECT COUNT(*) FROM movies WHERE user_id={USER_ID_SUBQUERY}"),
+            {"username": username}
+        ).scalar()
+
+
+@instrumented
+def list_poster_urls(usernames=None):
+    """Return the distinct poster URLs of the given users (default: all users)."""
+    sql = f"SELECT DISTINCT c.poster_url FROM {MOVIES_JOIN}"
+    params = {}
+    if usernames is not None:
+        sql += " JOIN users u ON u.id = m.user_id WHERE u.username IN :usernames"
+        params["usernames"] = list(usernames)
+    query = text(sql)
+    if usernames is not None:
+        query = query.bindparams(bindparam("usernames", expanding=True))
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(query, params) if row[0]]
+
+
+def iter_movies(username, page_size=100, order_by="id", descending=False, **filters):
+    """
+    Yield a user's movies page by page (lists of at most page_size dicts),
+    using keyset pagination so only one page is held in memory at a time.
+    Accepts the same sorting and filter arguments as query_movies.
+    """
+    after = None
+    while True:
+        page = query_movies(username, order_by=order_by, descending=descending,
+                            limit=page_size, after=after, **filters)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        after = (last[order_by], last["id"])
+
+
+#  Random Selection
+RANDOM_MAX_RATING = 10.0  # weighted picks accept a movie with probability rating / RANDOM_MAX_RATING
+RANDOM_PROBE_ROUNDS = 6  # batches of random ids to try before falling back to id seeks
+RANDOM_PROBE_MAX = 500  # ids per probe query
+RANDOM_SAMPLE_FRACTION = 0.01  # one seek costs about as much as scanning ~100 matching ids
+RANDOM_SEEK_BATCH = 32  # rows per seek, skipping movies that were picked already
+
+
+def _random_rows(connection, sql, params, ids=None):
+    query = text(sql)
+    if ids is not None:
+        query = query.bindparams(bindparam("ids", expanding=True))
+        params = {**params, "ids": ids}
+    return [{"id": row[0], "title": row[1], "year": row[2], "rating": row[3], "poster_url": row[4]}
+            for row in connection.execute(query, params)]
+
+
+def _accept(movie, chosen, weighted, rng):
+    """Add movie to chosen unless it was picked already or, when weighted, fails the rating draw."""
+    if movie["id"] in chosen:
+        return False
+    if weighted and rng.random() * RANDOM_MAX_RATING >= movie["rating"]:
+        return False
+    chosen[movie["id"]] = movie
+    return True
+
+
+def _sample_rest(connection, where, params, chosen, wanted, weighted, rng):
+    """
+    Fill chosen up to wanted from the full list of matching ids (one indexed
+    query), for when the picks are a large part of the matches. Weighted picks
+    use Efraimidis-Spirakis keys (random() ** (1 / rating)), which samples
+    without replacement proportionally to the ratings; zero ratings come last.
+    """
+    candidates = [(movie_id, rating) for movie_id, rating in connection.execute(
+        text(f"SELECT m.id, m.rating FROM {MOVIES_JOIN} WHERE {where}"), params) if movie_id not in chosen]
+    count = wanted - len(chosen)
+    if weighted:
+        keyed = [((rating > 0, rng.random() ** (1 / rating) if rating > 0 else rng.random()), movie_id)
+                 for movie_id, rating in candidates]
+        picked = [movie_id for _, movie_id in heapq.nlargest(count, keyed)]
+    else:
+        picked = rng.sample([movie_id for movie_id, _ in candidates], count)
+    query = (f"SELECT m.id, c.title, c.year, m.rating, c.poster_url FROM {MOVIES_JOIN} "
+             "WHERE m.id IN :ids")
+    found = {}
+    for start in range(0, len(picked), RANDOM_PROBE_MAX):
+        for movie in _random_rows(connection, query, {}, picked[start:start + RANDOM_PROBE_MAX]):
+            found[movie["id"]] = movie
+    for movie_id in picked:
+        chosen[movie_id] = found[movie_id]
+
+
+def _seek_rest(connection, where, params, low, high, chosen, wanted, weighted, rng):
+    """
+    Fill chosen up to wanted by seeking to the first match at or after a
+    random id. Ids picked already are skipped here rather than excluded in
+    SQL, so the query's parameters do not grow with the picks.
+    """
+    seek = (f"SELECT m.id, c.title, c.year, m.rating, c.poster_url FROM {MOVIES_JOIN} "
+            f"WHERE {where} AND m.id >= :start ORDER BY m.id LIMIT :limit")
+    rejected = 0
+    while len(chosen) < wanted:
+        start, movie = rng.randint(low, high), None
+        for _ in range(2):  # from the random id to the end, then wrapped around from the start
+            while movie is None:
+                rows = _random_rows(connection, seek, {**params, "start": start, "limit": RANDOM_SEEK_BATCH})
+                movie = next((row for row in rows if row["id"] not in chosen), None)
+                if len(rows) < RANDOM_SEEK_BATCH:
+                    break
+                start = rows[-1]["id"] + 1
+            if movie is not None:
+                break
+            start = low
+        if movie is None:
+            break
+        if not _accept(movie, chosen, weighted, rng):
+            rejected += 1
+            if rejected > 100 * wanted:  # e.g. only zero ratings left
+                weighted = False
+
+
+@instrumented
+def random_movie(username, k=None, weighted=False, seed=None, **filters):
+    """
+    Pick a random movie of a user without loading the library: returns one
+    movie dict (with "id") or None, or with k a list of up to k distinct
+    movies. weighted=True favours higher ratings (probability proportional
+    to the rating); seed makes the picks reproducible. Accepts the
+    query_movies filters (title_like, min_year, ...).
+
+    Random ids are drawn from the user's [MIN(id), MAX(id)] range (both read
+    from the (user_id, id) index) and looked up in batches, so a pick costs
+    a few indexed lookups instead of ORDER BY RANDOM()'s full scan. Ids that
+    do not exist, belong to someone else or fail the filters are just missed,
+    which keeps the picks uniform. If the matches are too sparse for that,
+    k is capped at the number of matches; when the rest is a large part of
+    them it is sampled from the list of matching ids, otherwise each remaining
+    pick seeks to the first match at or after a random id, which slightly
+    favours movies that follow gaps in the ids.
+    """
+    rng = random.Random(seed)
+    wanted = 1 if k is None else k
+    conditions, params = _filter_conditions(**filters)
+    where = " AND ".join(["m.user_id=:user_id"] + conditions)
+    chosen = {}
+    with engine.connect() as connection:
+        bounds = connection.execute(
+            text("""
+                SELECT u.id,
+                       (SELECT MIN(id) FROM movies WHERE user_id = u.id),
+                       (SELECT MAX(id) FROM movies WHERE user_id = u.id)
+                FROM users u WHERE u.username=:username
+            """),
+            {"username": username}
+        ).fetchone()
+        if wanted > 0 and bounds is not None and bounds[1] is not None:
+            user_id, low, high = bounds
+            params["user_id"] = user_id
+            # The unary + keeps SQLite from scanning the user's index instead of looking the ids up
+            probe = (f"SELECT m.id, c.title, c.year, m.rating, c.poster_url FROM {MOVIES_JOIN} "
+                     f"WHERE m.id IN :ids AND {where.replace('m.user_id', '+m.user_id', 1)}")
+            for attempt in range(RANDOM_PROBE_ROUNDS):
+                size = min(RANDOM_PROBE_MAX, max(16, 4 * (wanted - len(chosen))) << attempt)
+                ids = [rng.randint(low, high) for _ in range(size)]
+                found = {movie["id"]: movie for movie in _random_rows(connection, probe, params, ids)}
+                # Taking hits in draw order (not id order) keeps every match equally likely
+                for movie_id in ids:
+                    if movie_id in found and _accept(found[movie_id], chosen, weighted, rng) \
+                            and len(chosen) == wanted:
+                        break
+                if len(chosen) == wanted:
+                    break
+
+            if len(chosen) < wanted:
+                matches = connection.execute(
+                    text(f"SELECT COUNT(*) FROM {MOVIES_JOIN} WHERE {where}"), params).scalar()
+                wanted = min(wanted, matches)
+            if len(chosen) < wanted and wanted - len(chosen) > matches * RANDOM_SAMPLE_FRACTION:
+                _sample_rest(connection, where, params, chosen, wanted, weighted, rng)
+            elif len(chosen) < wanted:
+                _seek_rest(connection, where, params, low, high, chosen, wanted, weighted, rng)
+    movies = list(chosen.values())
+    if k is None:
+        return movies[0] if movies else None
+    return movies
+
+
+#  Full-Text Search
+SEARCH_MODES = ("prefix", "phrase", "all")
+
+
+def _fts_query(query, mode):
+    """
+    Turn user input into an FTS5 MATCH expression. Only word characters are
+    kept and every token is quoted, so FTS syntax typed by the user is inert.
+      prefix: every word must match the start of a title word ("star wa" -> Star Wars)
+      phrase: the words must appear next to each other, in order
+      all:    every word must appear as a whole word, in any order
+    """
+    tokens = re.findall(r"\w+", query)
+    if not tokens:
+        return None
+    if mode == "prefix":
+        return " ".join(f'"{token}"*' for token in tokens)
+    if mode == "phrase":
+        return '"' + " ".join(tokens) + '"'
+    if mode == "all":
+        return " ".join(f'"{token}"' for token in tokens)
+    raise ValueError(f"Unknown search mode: {mode!r}")
+
+
+@instrumented
+def search_movies(username, query, limit=20, mode="prefix"):
+    """
+    Search a user's movie titles through the FTS5 index on the catalog.
+    Returns up to `limit` movie dicts (with "id" and bm25 "score"), best match first.
+    """
+    match = _fts_query(query, mode)
+    if match is None:
+        return []
+    with engine.connect() as connection:
+        result = connection.execute(
+            text(f"""
+                SELECT m.id, c.title, c.year, m.rating, c.poster_url, bm25(catalog_fts) AS score
+                FROM catalog_fts
+                JOIN catalog c ON c.id = catalog_fts.rowid
+                JOIN movies m ON m.catalog_id = c.id
+                WHERE catalog_fts MATCH :match AND m.user_id={USER_ID_SUBQUERY}
+                ORDER BY score
+                LIMIT :limit
+            """),
+            {"match": match, "username": username, "limit": limit}
+        ).fetchall()
+    return [{"id": row[0], "title": row[1], "year": row[2], "rating": row[3],
+             "poster_url": row[4], "score": row[5]} for row in result]
+
+
+#  Statistics
+# One statement, one round trip: every part of the result is a row of the
+# UNION ALL, tagged by `kind`, with generic value columns v1..v6.
+STATS_SQL = f"""
+WITH m AS (
+    SELECT m.id, c.title, c.year, m.rating FROM {MOVIES_JOIN} WHERE m.user_id={USER_ID_SUBQUERY}
+),
+agg AS (
+    SELECT COUNT(*) AS n, AVG(rating) AS mean, AVG(rating * rating) AS mean_sq,
+           MIN(rating) AS lo, MAX(rating) AS hi
+    FROM m
+),
+ranked AS (
+    SELECT rating, ROW_NUMBER() OVER (ORDER BY rating) AS rn FROM m
+),
+median AS (
+    SELECT AVG(rating) AS value FROM ranked, agg
+    WHERE rn IN ((agg.n + 1) / 2, (agg.n + 2) / 2)
+)
+SELECT 'summary' AS kind, NULL AS label,
+       agg.n AS v1, agg.mean AS v2, agg.mean_sq AS v3, agg.lo AS v4, agg.hi AS v5, median.value AS v6
+FROM agg, median
+UNION ALL
+SELECT CASE WHEN m.rating = agg.hi THEN 'max' ELSE 'min' END, m.title,
+       m.id, m.year, m.rating, NULL, NULL, NULL
+FROM m, agg WHERE m.rating = agg.hi OR m.rating = agg.lo
+UNION ALL
+SELECT 'histogram', NULL, MIN(CAST(rating AS INTEGER), 10), COUNT(*), NULL, NULL, NULL, NULL
+FROM m GROUP BY MIN(CAST(rating AS INTEGER), 10)
+UNION ALL
+SELECT 'decade', NULL, (year / 10) * 10, COUNT(*), AVG(rating), NULL, NULL, NULL
+FROM m GROUP BY year / 10
+"""
+
+
+@instrumented
+def movie_stats(username):
+    """
+    Rating statistics for a user's library, computed in SQL in one round trip:
+      count, mean, median, stddev (population),
+      min / max: {"rating": r, "movies": [{"id", "title", "year"}, ...]} (all ties),
+      histogram: {whole-number rating bucket: count}  (8 means 8.0 <= rating < 9.0),
+      decades: {1990: {"count": n, "mean_rating": r}, ...}
+    Numeric fields are None for an empty library.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text(STATS_SQL), {"username": username}).fetchall()
+
+    stats = {"count": 0, "mean": None, "median": None, "stddev": None,
+             "min": None, "max": None, "histogram": {}, "decades": {}}
+    for kind, label, v1, v2, v3, v4, v5, v6 in rows:
+        if kind == "summary":
+            stats["count"] = v1
+            if v1:
+                stats.update(mean=v2, median=v6,
+                             stddev=math.sqrt(max(0.0, v3 - v2 * v2)),
+                             min={"rating": v4, "movies": []},
+                             max={"rating": v5, "movies": []})
+        elif kind == "histogram":
+            stats["histogram"][v1] = v2
+        elif kind == "decade":
+            stats["decades"][v1] = {"count": v2, "mean_rating": v3}
+
+    # max/min rows reference the summary, so collect them in a second pass
+    for kind, label, v1, v2, v3, *_ in rows:
+        if kind in ("max", "min"):
+            movie = {"id": v1, "title": label, "year": v2}
+            stats[kind]["movies"].append(movie)
+            # With a single distinct rating every movie is both max and min
+            if kind == "max" and v3 == stats["min"]["rating"]:
+                stats["min"]["movies"].append(movie)
+    return stats
+
+
+#  Bulk Movie Functions
+BULK_CHUNK_SIZE = 500  # ids per IN (...) lookup, well below SQLite's variable limit
+
+
+def _chunked_lookup(connection, sql, name, values, params=None):
+    """Run an `IN :name` query over values in chunks and return all rows."""
+    query = text(sql).bindparams(bindparam(name, expanding=True))
+    values = list(values)
+    rows = []
+    for i in range(0, len(values), BULK_CHUNK_SIZE):
+        rows.extend(connection.execute(query, {**(params or {}), name: values[i:i + BULK_CHUNK_SIZE]}))
+    return rows
+
+
+def _existing_movie_ids(connection, movie_ids, user_id):
+    """Return the subset of movie_ids that belong to user_id."""
+    rows = _chunked_lookup(connection, "SELECT id FROM movies WHERE user_id=:user_id AND id IN :ids",
+                           "ids", movie_ids, {"user_id": user_id})
+    return {row[0] for row in rows}
+
+
+def _catalog_ids(connection, rows, user_id):
+    """
+    Map each row to its catalog id: by imdb_id when known, otherwise by (title,
+    year), preferring a film user_id already has over the row without an imdb_id.
+    """
+    by_imdb_id = dict(_chunked_lookup(connection, "SELECT imdb_id, id FROM catalog WHERE imdb_id IN :ids",
+                                      "ids", {row["imdb_id"] for row in rows if row["imdb_id"]}))
+    titles = {row["title"] for row in rows if not row["imdb_id"]}
+    by_title_year = {(title, year): catalog_id for title, year, catalog_id in _chunked_lookup(
+        connection, "SELECT title, year, id FROM catalog WHERE title IN :titles AND imdb_id IS NULL",
+        "titles", titles)}
+    by_title_year.update(((title, year), catalog_id) for title, year, catalog_id in _chunked_lookup(
+        connection, f"SELECT c.title, c.year, c.id FROM {MOVIES_JOIN} WHERE m.user_id=:user_id AND c.title IN :titles",
+        "titles", titles, {"user_id": user_id}))
+    return [by_imdb_id.get(row["imdb_id"]) if row["imdb_id"] else by_title_year.get((row["title"], row["year"]))
+            for row in rows]
+
+
+def _bulk_movie_row(movie, user_id):
+    """Validate one input dict for add_movies_bulk; returns the insert row or None."""
+    try:
+        runtime = movie.get("runtime")
+        row = {
+            "title": movie["title"].strip(),
+            "year": int(movie["year"]),
+            "rating": float(movie["rating"]),
+            "poster_url": movie.get("poster_url") or "",
+            "imdb_id": movie.get("imdb_id") or None,
+            "genre": movie.get("genre") or None,
+            "runtime": int(runtime) if runtime not in (None, "") else None,
+            "plot": movie.get("plot") or None,
+            "user_id": user_id,
+        }
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    return row if row["title"] else None
+
+
+DUPLICATE_POLICIES = ("skip", "update")
+
+
+def _add_movies(connection, movies, user_id, on_duplicate="skip"):
+    """
+    The body of add_movies_bulk on an open transaction. Movies the user already
+    has are left alone ("duplicate") or, with on_duplicate="update", get the
+    new rating ("updated"; within one call the last rating wins).
+    """
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy: {on_duplicate!r}")
+    outcomes = []
+    new_rows = {}  # catalog_id -> insert row
+    updates = {}  # catalog_id -> update row
+    rows = [_bulk_movie_row(movie, user_id) for movie in movies]
+    valid = [row for row in rows if row]
+    if valid:
+        # Writing the catalog first takes the write lock, so the duplicate
+        # check below cannot race a concurrent add of the same movies
+        with_imdb_id = [row for row in valid if row["imdb_id"]]
+        if with_imdb_id:
+            connection.execute(text(CATALOG_ADOPT_IMDB_ID), with_imdb_id)
+        connection.execute(text(CATALOG_UPSERT.format(source=CATALOG_VALUES)), valid)
+        for row, catalog_id in zip(valid, _catalog_ids(connection, valid, user_id)):
+            row["catalog_id"] = catalog_id
+    existing = {row[0] for row in _chunked_lookup(
+        connection, "SELECT catalog_id FROM movies WHERE user_id=:user_id AND catalog_id IN :ids",
+        "ids", {row["catalog_id"] for row in valid}, {"user_id": user_id})}
+    for row in rows:
+        if row is None:
+            outcomes.append("invalid")
+        elif row["catalog_id"] not in existing and row["catalog_id"] not in new_rows:
+            new_rows[row["catalog_id"]] = row
+            outcomes.append("added")
+        elif on_duplicate == "update":
+            target = new_rows if row["catalog_id"] in new_rows else updates
+            target[row["catalog_id"]] = row
+            outcomes.append("updated")
+        else:
+            outcomes.append("duplicate")
+    if new_rows:
+        connection.execute(
+            text("INSERT INTO movies (user_id, catalog_id, rating) VALUES (:user_id, :catalog_id, :rating)"),
+            list(new_rows.values())
+        )
+    if updates:
+        connection.execute(
+            text("UPDATE movies SET rating=:rating WHERE user_id=:user_id AND catalog_id=:catalog_id"),
+            list(updates.values())
+        )
+    return outcomes
+
+
+@instrumented
+def add_movies_bulk(movies, user=None, on_duplicate="skip"):
+    """
+    Add many movies for a user in one transaction.
+    `movies` is an iterable of dicts with title, year, rating and optional
+    poster_url, imdb_id, genre, runtime and plot (stored in the shared catalog).
+    Returns one outcome per input row: "added", "duplicate", "invalid" or "user_not_found"
+    ("updated" instead of "duplicate" with on_duplicate="update").
+    """
+    movies = list(movies)
+    with list_cache.invalidating(user, catalog=True), engine.begin() as connection:
+        user_id = _resolve_user_id(connection, user)
+        if not user_id:
+            return ["user_not_found"] * len(movies)
+        return _add_movies(connection, movies, user_id, on_duplicate)
+
+
+@instrumented
+def update_ratings_bulk(updates, user=None):
+    """
+    Update many ratings for a user in one transaction.
+    `updates` is an iterable of (movie_id, rating) pairs.
+    Returns one outcome per pair: "updated", "not_found" or "user_not_found".
+    """
+    updates = list(updates)
+    with list_cache.invalidating(user), engine.begin() as connection:
+        user_id = _resolve_user_id(connection, user)
+        if not user_id:
+            return ["user_not_found"] * len(updates)
+
+        existing = _existing_movie_ids(connection, {movie_id for movie_id, _ in updates}, user_id)
+        rows = [{"id": movie_id, "rating": rating, "user_id": user_id}
+                for movie_id, rating in updates if movie_id in existing]
+        if rows:
+            connection.execute(
+                text("UPDATE movies SET rating=:rating WHERE id=:id AND user_id=:user_id"),
+                rows
+            )
+    return ["updated" if movie_id in existing else "not_found" for movie_id, _ in updates]
+
+
+@instrumented
+def delete_movies_bulk(movie_ids, user=None):
+    """
+    Delete many movies by ID for a user in one transaction.
+    Returns one outcome per ID: "deleted", "not_found" or "user_not_found".
+    """
+    movie_ids = list(movie_ids)
+    with list_cache.invalidating(user), engine.begin() as connection:
+        user_id = _resolve_user_id(connection, user)
+        if not user_id:
+            return ["user_not_found"] * len(movie_ids)
+
+        existing = _existing_movie_ids(connection, set(movie_ids), user_id)
+        if existing:
+            connection.execute(
+                text("DELETE FROM movies WHERE id=:id AND user_id=:user_id"),
+                [{"id": movie_id, "user_id": user_id} for movie_id in existing]
+            )
+
+    outcomes = []
+    for movie_id in movie_ids:
+        outcomes.append("deleted" if movie_id in existing else "not_found")
+        existing.discard(movie_id)  # a repeated ID is only deleted once
+    return outcomes
+
+
+#  Export and Import
+EXPORT_FIELDS = ("username", "title", "year", "rating", "poster_url", "imdb_id", "genre", "runtime", "plot")
+
+
+def export_movies(usernames=None, batch_size=1000):
+    """
+    Yield the movies of the given users (default: all users) as dicts of
+    EXPORT_FIELDS, ordered by user and movie ID. The rows come from a single
+    query streamed batch_size rows at a time (yield_per), so memory stays
+    constant however large the libraries are, and the whole export reads one
+    consistent snapshot.
+    """
+    sql = f"""
+        SELECT u.username, c.title, c.year, m.rating, c.poster_url, c.imdb_id, c.genre, c.runtime, c.plot
+        FROM {MOVIES_JOIN} JOIN users u ON u.id = m.user_id
+    """
+    params = {}
+    if usernames is not None:
+        sql += " WHERE u.username IN :usernames"
+        params["usernames"] = list(usernames)
+    sql += " ORDER BY m.user_id, m.id"  # the (user_id, id) index order, so nothing is sorted
+    query = text(sql)
+    if usernames is not None:
+        query = query.bindparams(bindparam("usernames", expanding=True))
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(query, params)
+        for rows in result.partitions():
+            for row in rows:
+                yield dict(zip(EXPORT_FIELDS, row))
+
+
+@instrumented
+def import_movies(records, user=None, on_duplicate="skip", create_users=True):
+    """
+    Import one batch of export_movies records in a single transaction.
+    Each record goes to its "username" (or to `user` when given); missing users
+    are created unless create_users is False; records for a username that
+    add_user would reject count as "invalid". Movies a user already has are
+    skipped or, with on_duplicate="update", get the imported rating.
+    Returns one outcome per record, as add_movies_bulk does.
+    """
+    records = list(records)
+    by_user = {}
+    for index, record in enumerate(records):
+        by_user.setdefault(user or record.get("username"), []).append(index)
+    outcomes = [None] * len(records)
+    with list_cache.invalidating(None, catalog=True), engine.begin() as connection:
+        for username, indexes in by_user.items():
+            user_id = _resolve_user_id(connection, username) if username else None
+            if user_id is None and username and username_error(username):
+                results = ["invalid"] * len(indexes)
+            elif user_id is None and username and create_users:
+                results = _add_movies(connection, [records[i] for i in indexes],
+                                      _insert_user(connection, username), on_duplicate)
+            elif user_id is None:
+                results = ["user_not_found"] * len(indexes)
+            else:
+                results = _add_movies(connection, [records[i] for i in indexes], user_id, on_duplicate)
+            for index, outcome in zip(indexes, results):
+                outcomes[index] = outcome
+    return outcomes
+
 
 if __name__ == "__main__":
     init_db()
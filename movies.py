@@ -1,13 +1,35 @@
-import random
-import re
-from datetime import datetime
-import os
+from itertools import chain, islice
+import sys
+import cli
 import movie_storage_sql as storage  # nur einmal importieren
+import site_generator
 from omdb_api import fetch_movie
 
 
 #  Helper Functions
 active_user = None  # Global Active User
+PAGE_SIZE = 20  # movies per page when listing
+SEARCH_LIMIT = 50  # best-ranked search results shown
+
+
+def print_movie_pages(pages, page_size=PAGE_SIZE):
+    """
+    Print movies page by page, asking before showing the next page. The next
+    page is fetched before asking, so there is no prompt after the last one.
+    Returns the number of movies printed.
+    """
+    count = 0
+    pages = iter(pages)
+    page = next(pages, None)
+    while page:
+        for movie in page:
+            count += 1
+            print(f"{count}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
+        page = next(pages, None) if len(page) >= page_size else None
+        if page and input("-- Enter for more, q to stop -- ").strip().lower() == "q":
+            break
+    return count
+
 
 def get_user_movies():
     if not active_user:
@@ -57,15 +79,16 @@ def choose_user():
         choice = get_numeric_input("Enter choice: ", 1, len(users)+1)
         if choice == len(users) + 1:
             new_user = input("Enter new username: ").strip()
-            if new_user:
+            error = storage.username_error(new_user)
+            if error:
+                print(error)
+            else:
                 try:
                     storage.add_user(new_user)
                     active_user = new_user
                     break
                 except Exception as e:
                     print(f"Error creating user: {e}")
-            else:
-                print("Username cannot be empty.")
         else:
             active_user = users[choice - 1]
             break
@@ -76,13 +99,16 @@ def choose_user():
 #  Movie Functions
 
 def list_movies():
-    movies = get_user_movies()
-    if not movies:
+    if not active_user:
+        print("No active user selected.")
+        return
+    pages = storage.iter_movies(active_user, page_size=PAGE_SIZE)
+    first_page = next(pages, None)
+    if not first_page:
         print(f"No movies available for {active_user}.")
         return
     print(f"Movies for {active_user}:")
-    for idx, (movie_id, movie) in enumerate(movies.items(), start=1):
-        print(f"{idx}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
+    print_movie_pages(chain([first_page], pages))
 
 
 def add_movie():
@@ -102,7 +128,11 @@ def add_movie():
             movie_data["year"],
             movie_data["rating"],
             movie_data.get("poster_url", ""),
-            user=active_user
+            user=active_user,
+            imdb_id=movie_data.get("imdb_id"),
+            genre=movie_data.get("genre"),
+            runtime=movie_data.get("runtime"),
+            plot=movie_data.get("plot")
         )
         print(f"Movie '{movie_data['title']}' added successfully for {active_user}!")
     except Exception as e:
@@ -117,7 +147,8 @@ def select_movie():
     for idx, (movie_id, movie) in enumerate(movies.items(), start=1):
         print(f"{idx}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
     choice = get_numeric_input("Enter number of movie: ", 1, len(movies))
-    movie_id = list(movies.keys())[choice - 1]
+    # Walk to the chosen entry instead of copying every key into a list
+    movie_id = next(islice(movies, choice - 1, None))
     return movie_id, movies[movie_id]
 
 
@@ -145,122 +176,105 @@ def update_movie_rating():
 
 
 def movies_sorted_by_rating():
-    movies = get_user_movies()
-    if not movies:
+    if not active_user:
+        print("No active user selected.")
+        return
+    pages = storage.iter_movies(active_user, page_size=PAGE_SIZE, order_by="rating", descending=True)
+    first_page = next(pages, None)
+    if not first_page:
         return
-    sorted_movies = sorted(movies.items(), key=lambda item: item[1]['rating'], reverse=True)
     print(f"Movies sorted by rating for {active_user}:")
-    for idx, (movie_id, movie) in enumerate(sorted_movies, start=1):
-        print(f"{idx}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
+    print_movie_pages(chain([first_page], pages))
 
 
 def search_movies():
-    query = input("Search term for movie title: ").strip().lower()
+    if not active_user:
+        print("No active user selected.")
+        return
+    query = input("Search term for movie title: ").strip()
     if not query:
         print("Search term cannot be empty.")
         return
-    movies = get_user_movies()
-    found = False
-    print("Search results:")
-    for idx, (movie_id, movie) in enumerate(movies.items(), start=1):
-        if query in movie['title'].lower():
-            print(f"{idx}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
-            found = True
-    if not found:
+    results = storage.search_movies(active_user, query, limit=SEARCH_LIMIT)
+    if not results:
         print("No movies found.")
+        return
+    print("Search results:")
+    for movie in results:
+        print(f"[ID {movie['id']}] {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
 
 
-def movie_stats():
-    movies = get_user_movies()
-    if not movies:
-        return
-    ratings = [movie["rating"] for movie in movies.values()]
-    max_rating, min_rating = max(ratings), min(ratings)
+def get_user_stats():
+    if not active_user:
+        print("No active user selected.")
+        return None
+    stats = storage.movie_stats(active_user)
+    if not stats["count"]:
+        print(f"No movies available for {active_user}.")
+        return None
+    return stats
+
+
+def print_stats_summary(stats):
+    print(f"\nMovies: {stats['count']}")
+    print(f"Average rating: {stats['mean']:.1f}")
+    print(f"Median rating: {stats['median']:.1f}")
     print("\nTop rated movies:")
-    for idx, (movie_id, movie) in enumerate(movies.items(), start=1):
-        if movie["rating"] == max_rating:
-            print(f"{idx}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
+    for movie in stats["max"]["movies"]:
+        print(f"- {movie['title']} ({movie['year']}), Rating: {stats['max']['rating']:.1f}")
     print("\nLowest rated movies:")
-    for idx, (movie_id, movie) in enumerate(movies.items(), start=1):
-        if movie["rating"] == min_rating:
-            print(f"{idx}. {movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
+    for movie in stats["min"]["movies"]:
+        print(f"- {movie['title']} ({movie['year']}), Rating: {stats['min']['rating']:.1f}")
 
 
-def random_movie():
-    movies = get_user_movies()
-    if not movies:
-        return
-    movie_id, movie = random.choice(list(movies.items()))
-    print("Random movie:")
-    print(f"{movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
+def movie_stats():
+    stats = get_user_stats()
+    if stats:
+        print_stats_summary(stats)
 
 
-def generate_website():
-    if not active_user:
-        print("No active user selected.")
+def movie_stats_extended():
+    stats = get_user_stats()
+    if not stats:
         return
+    print_stats_summary(stats)
+    print(f"\nStandard deviation: {stats['stddev']:.2f}")
 
-    template_path = os.path.join("templates", "index_template.html")
-    output_dir = "generated_sites"
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, f"{active_user}.html")
+    print("\nRating histogram:")
+    largest = max(stats["histogram"].values())
+    for bucket in range(11):
+        count = stats["histogram"].get(bucket, 0)
+        bar = "#" * round(count / largest * 40)
+        print(f"{bucket:>2} | {bar} {count}")
 
-    if not os.path.exists(template_path):
-        print(f"Template file not found: {template_path}")
-        return
+    print("\nBy decade:")
+    for decade, info in sorted(stats["decades"].items()):
+        print(f"{decade}s: {info['count']} movies, average rating {info['mean_rating']:.1f}")
 
-    try:
-        with open(template_path, "r", encoding="utf-8") as f:
-            template = f.read()
-    except Exception as e:
-        print(f"Error reading template: {e}")
-        return
 
-    movies = storage.list_movies(active_user)
-    if not movies:
-        print(f"No movies available for {active_user} to generate website.")
+def random_movie():
+    if not active_user:
+        print("No active user selected.")
+        return
+    movie = storage.random_movie(active_user)
+    if not movie:
+        print(f"No movies available for {active_user}.")
         return
+    print("Random movie:")
+    print(f"{movie['title']} ({movie['year']}), Rating: {movie['rating']:.1f}")
 
-    #  Movie Grid
-    movie_grid = ""
-    for movie_id, data in movies.items():
-        movie_grid += f"""
-        <div class="movie-item">
-            <img class="movie-poster" src="{data.get('poster_url', '')}" alt="{data['title']}">
-            <div class="movie-info">
-                <h2 class="movie-title">{data['title']}</h2>
-                <p class="movie-year">{data['year']}</p>
-                <p class="movie-rating">Rating: {data['rating']}</p>
-            </div>
-        </div>
-        """
-
-
-    # Dynamische Platzhalter ersetzen
-    def replace_placeholder(match):
-        key = match.group(0)
-        if key == "__TEMPLATE_TITLE__":
-            return f"{active_user}'s Movie Library"
-        elif key == "__TEMPLATE_MOVIE_GRID__":
-            return movie_grid
-        elif key == "__TEMPLATE_DATE__":
-            return datetime.now().strftime("%Y-%m-%d %H:%M")
-        # Fallback: leerer String für unbekannte Platzhalter
-        return ""
-
-    html_content = re.sub(r"__\w+__", replace_placeholder, template)
 
-    try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        print(f"Website for {active_user} was generated successfully: {output_path}")
-    except Exception as e:
-        print(f"Error writing website: {e}")
+def generate_website():
+    if not active_user:
+        print("No active user selected.")
+        return
+    site_generator.generate_site(active_user)
 
 
 #  Main Program
 
 def main():
+    storage.init_db()  # bring an older database up to the current schema
     print("Welcome to the Movie App! 🎬")
     choose_user()
 
@@ -275,7 +289,8 @@ def main():
         "7": ("Search movie", search_movies),
         "8": ("Movies sorted by rating", movies_sorted_by_rating),
         "9": ("Generate website", generate_website),
-        "10": ("Switch user", choose_user)
+        "10": ("Switch user", choose_user),
+        "11": ("Extended stats", movie_stats_extended)
     }
 
     while True:
@@ -298,4 +313,6 @@ def main():
 
 #---------------- Start ---------------
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli.main(sys.argv[1:]))
     main()
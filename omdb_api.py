@@ -1,24 +1,153 @@
+import os
+import random
+import sys
+import time
+from collections import deque
+
 import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
 from config import OMDB_API_KEY
+from omdb_cache import OmdbCache
+from omdb_snapshot import SNAPSHOT_PATH, OmdbSnapshot
 
 BASE_URL = "https://www.omdbapi.com/"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Requests per second allowed by our OMDb plan, used by omdb_async's client (0 disables the limit)
+RATE_LIMIT = float(os.getenv("OMDB_RATE_LIMIT", 10))
+# Where lookups are answered: "online" (OMDb only), "offline" (the local snapshot only)
+# or "fallback" (OMDb, and the snapshot when OMDb cannot be reached)
+MODES = ("online", "offline", "fallback")
 
 
-def fetch_movie(title: str) -> dict:
-    """Fetch movie details from OMDb including poster, safely handling special cases."""
-    params = {"apikey": OMDB_API_KEY, "t": title}
-    try:
-        response = requests.get(BASE_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-    except requests.RequestException as e:
-        print(f"Error: Could not reach OMDb API. {e}")
-        return {}
+def _parse_mode(value):
+    """OMDB_MODE as one of MODES; an unknown value warns and falls back to "online"."""
+    mode = (value or "online").strip().lower()
+    if mode not in MODES:
+        print(f"Warning: Unknown OMDB_MODE {value!r} (expected {', '.join(MODES)}); using online.",
+              file=sys.stderr)
+        return "online"
+    return mode
 
-    if data.get("Response") == "False":
-        print(f"Movie not found: {title}")
-        return {}
 
+MODE = _parse_mode(os.getenv("OMDB_MODE"))
+
+OMDB_FETCH_SECONDS = metrics.histogram("omdb_fetch_seconds", "Movie lookup latency in seconds, cache hits included",
+                                       ("mode",))
+OMDB_LOOKUPS = metrics.counter("omdb_lookups_total", "Movie lookups by outcome", ("outcome",))
+OMDB_HTTP_SECONDS = metrics.histogram("omdb_http_request_seconds", "OMDb HTTP request latency in seconds")
+OMDB_HTTP_REQUESTS = metrics.counter("omdb_http_requests_total", "OMDb HTTP requests by status code", ("status",))
+
+
+class _ClientBase:
+    """Settings, retry backoff and latency bookkeeping shared by the sync and async clients."""
+
+    def __init__(self, base_url, api_key, timeout, max_retries, backoff, max_backoff):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.latencies = deque(maxlen=1000)  # seconds per HTTP request
+
+    def _record(self, seconds, status):
+        """Remember one request's latency; status is the HTTP code or "error"."""
+        self.latencies.append(seconds)
+        OMDB_HTTP_SECONDS.observe(seconds)
+        OMDB_HTTP_REQUESTS.inc(status=status)
+
+    def _retry_delay(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (0-based)."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        # "Full jitter": random delay up to the exponential cap
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def latency_stats(self) -> dict:
+        """Count, mean and p50/p95/max of the recorded request latencies in ms."""
+        samples = sorted(self.latencies)
+        if not samples:
+            return {"count": 0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            "count": len(samples),
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+class OmdbClient(_ClientBase):
+    """
+    OMDb HTTP client that keeps connections alive in a pooled requests.Session,
+    retries 429/5xx answers and connection errors with jittered exponential
+    backoff, and records the latency of every request it sends.
+    """
+
+    def __init__(self, base_url=BASE_URL, api_key=OMDB_API_KEY, timeout=10,
+                 max_retries=3, backoff=0.5, max_backoff=8.0, pool_size=10):
+        super().__init__(base_url, api_key, timeout, max_retries, backoff, max_backoff)
+        self.session = requests.Session()
+        # Retries are handled in get_json so we can time and jitter them ourselves
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _timed_get(self, params):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            status = response.status_code
+            return response
+        finally:
+            self._record(time.perf_counter() - start, status)
+
+    def get_json(self, title: str) -> dict:
+        """Return the raw OMDb JSON for a title; raises requests.RequestException."""
+        params = {"apikey": self.api_key, "t": title}
+        for attempt in range(self.max_retries + 1):
+            last_try = attempt == self.max_retries
+            try:
+                response = self._timed_get(params)
+            except (requests.ConnectionError, requests.Timeout):
+                if last_try:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_try:
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+# Shared client, response cache and offline snapshot; set cache to None to always ask OMDb
+client = OmdbClient()
+cache = OmdbCache()
+snapshot = OmdbSnapshot(SNAPSHOT_PATH)
+mode = MODE
+
+
+def _known(value):
+    """OMDb reports missing fields as "N/A"; store them as None."""
+    return None if value in (None, "", "N/A") else value
+
+
+def parse_movie(data: dict) -> dict:
+    """Turn an OMDb JSON answer into our movie dict, normalizing year, rating and runtime."""
     #  Year
     year_str = data.get("Year", "0")
     try:
@@ -35,9 +164,88 @@ def fetch_movie(title: str) -> dict:
     except ValueError:
         rating = 0.0
 
-    return {
+    #  Runtime ("142 min")
+    runtime_digits = ''.join(c for c in data.get("Runtime", "") if c.isdigit())
+    runtime = int(runtime_digits) if runtime_digits else None
+
+    movie = {
         "title": data.get("Title", "Unknown"),
         "year": year,
         "rating": rating,
-        "poster_url": data.get("Poster", "")
+        "poster_url": data.get("Poster", ""),
+        "imdb_id": _known(data.get("imdbID")),
+        "genre": _known(data.get("Genre")),
+        "runtime": runtime,
+        "plot": _known(data.get("Plot"))
     }
+    return movie
+
+
+def _cached(title):
+    """The cached answer for a title (an empty dict for "not found"), or None."""
+    if cache is None:
+        return None
+    cached = cache.get(title)
+    if cached is not None:
+        OMDB_LOOKUPS.inc(outcome="cached")
+        if not cached:
+            print(f"Movie not found: {title}")
+    return cached
+
+
+def _from_response(title, data):
+    """Parse and cache an OMDb answer; {} when OMDb does not know the title."""
+    if data.get("Response") == "False":
+        print(f"Movie not found: {title}")
+        OMDB_LOOKUPS.inc(outcome="not_found")
+        movie = {}
+    else:
+        OMDB_LOOKUPS.inc(outcome="found")
+        movie = parse_movie(data)
+    if cache is not None:
+        cache.set(title, movie)
+    return movie
+
+
+def _from_snapshot(title):
+    """
+    Answer from the offline snapshot: the same movie dict as online, or {} when
+    the snapshot does not know the title. Snapshot answers are not cached, so
+    they never hide a later online answer.
+    """
+    if snapshot is None or not snapshot.available():
+        print(f"Error: No OMDb snapshot at {snapshot.path if snapshot else SNAPSHOT_PATH}.")
+        OMDB_LOOKUPS.inc(outcome="error")
+        return {}
+    movie = snapshot.lookup(title)
+    if movie is None:
+        print(f"Movie not found: {title}")
+        OMDB_LOOKUPS.inc(outcome="snapshot_not_found")
+        return {}
+    OMDB_LOOKUPS.inc(outcome="snapshot_found")
+    return movie
+
+
+def _unreachable(title, error):
+    """OMDb could not be reached: {} online, the snapshot's answer in fallback mode."""
+    print(f"Error: Could not reach OMDb API. {error}")
+    if mode == "fallback":
+        return _from_snapshot(title)
+    OMDB_LOOKUPS.inc(outcome="error")
+    return {}
+
+
+@metrics.timed(OMDB_FETCH_SECONDS, mode="sync")
+def fetch_movie(title: str) -> dict:
+    """Fetch movie details from OMDb including poster, safely handling special cases."""
+    cached = _cached(title)
+    if cached is not None:
+        return cached
+    if mode == "offline":
+        return _from_snapshot(title)
+
+    try:
+        data = client.get_json(title)
+    except requests.RequestException as e:
+        return _unreachable(title, e)
+    return _from_response(title, data)
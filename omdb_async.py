@@ -0,0 +1,150 @@
+"""
+asyncio OMDb lookups on aiohttp, kept apart from omdb_api so that the menu,
+CLI and bulk import do not need aiohttp. They share omdb_api's response
+cache, snapshot, mode, parsing and retry rules.
+"""
+import asyncio
+import time
+
+import aiohttp
+
+import metrics
+import omdb_api
+
+
+class AsyncRateLimiter:
+    """Token bucket for coroutines: at most `rate` acquisitions per second on average."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AsyncOmdbClient(omdb_api._ClientBase):
+    """
+    asyncio OMDb client on one aiohttp session: at most `concurrency`
+    requests in flight, at most `rate` requests per second (retries
+    included), and the same retry/backoff rules as OmdbClient.
+    The session is created on first use and belongs to that event loop;
+    use the client as `async with AsyncOmdbClient() as client:`.
+    """
+
+    def __init__(self, base_url=omdb_api.BASE_URL, api_key=omdb_api.OMDB_API_KEY, timeout=10,
+                 max_retries=3, backoff=0.5, max_backoff=8.0, concurrency=10, rate=None):
+        super().__init__(base_url, api_key, timeout, max_retries, backoff, max_backoff)
+        rate = omdb_api.RATE_LIMIT if rate is None else rate
+        self.concurrency = concurrency
+        self.limiter = AsyncRateLimiter(rate) if rate else None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+            )
+        return self._session
+
+    async def _request(self, params):
+        """One rate-limited, timed GET; returns (status, headers, JSON body or None)."""
+        if self.limiter:
+            await self.limiter.acquire()
+        start = time.perf_counter()
+        status = "error"
+        try:
+            async with self._get_session().get(self.base_url, params=params) as response:
+                status = response.status
+                if response.status >= 400:
+                    return response, None
+                return response, await response.json(content_type=None)
+        finally:
+            self._record(time.perf_counter() - start, status)
+
+    async def get_json(self, title: str) -> dict:
+        """Return the raw OMDb JSON for a title; raises aiohttp.ClientError or asyncio.TimeoutError."""
+        params = {"apikey": self.api_key, "t": title}
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                last_try = attempt == self.max_retries
+                try:
+                    response, data = await self._request(params)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if last_try:
+                        raise
+                    await asyncio.sleep(self._retry_delay(attempt))
+                    continue
+
+                if response.status in omdb_api.RETRY_STATUSES and not last_try:
+                    await asyncio.sleep(self._retry_delay(attempt, response))
+                    continue
+                response.raise_for_status()
+                return data
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+@metrics.timed(omdb_api.OMDB_FETCH_SECONDS, mode="async")
+async def fetch_movie_async(title: str, client: AsyncOmdbClient = None) -> dict:
+    """
+    Async fetch_movie: same cache, parsing and error handling. Pass a shared
+    AsyncOmdbClient for many lookups; without one a client is opened for this call.
+    The cache and snapshot are SQLite files, so they are read and written in a
+    worker thread rather than blocking the event loop.
+    """
+    cached = await asyncio.to_thread(omdb_api._cached, title)
+    if cached is not None:
+        return cached
+    if omdb_api.mode == "offline":
+        return await asyncio.to_thread(omdb_api._from_snapshot, title)
+    if client is None:
+        async with AsyncOmdbClient() as own_client:
+            return await _fetch_async(title, own_client)
+    return await _fetch_async(title, client)
+
+
+async def _fetch_async(title, client):
+    try:
+        data = await client.get_json(title)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return await asyncio.to_thread(omdb_api._unreachable, title, repr(e))
+    return await asyncio.to_thread(omdb_api._from_response, title, data)
+
+
+async def fetch_many_async(titles, concurrency=10, rate=None, client=None) -> dict:
+    """
+    Look many titles up concurrently: at most `concurrency` requests in flight
+    and at most `rate` per second (default: OMDB_RATE_LIMIT). Returns
+    {title: movie dict} in input order, with {} for titles that were not found.
+    """
+    titles = list(dict.fromkeys(titles))
+    if client is None:
+        async with AsyncOmdbClient(concurrency=concurrency, rate=rate) as own_client:
+            return await fetch_many_async(titles, client=own_client)
+    movies = await asyncio.gather(*(fetch_movie_async(title, client) for title in titles))
+    return dict(zip(titles, movies))
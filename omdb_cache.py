@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine, text
+
+CACHE_DB_URL = os.getenv("OMDB_CACHE_DB_URL", "sqlite:///data/omdb_cache.db")
+CACHE_TTL = int(os.getenv("OMDB_CACHE_TTL", 7 * 24 * 3600))
+CACHE_NEGATIVE_TTL = int(os.getenv("OMDB_CACHE_NEGATIVE_TTL", 24 * 3600))
+CACHE_SIZE = int(os.getenv("OMDB_CACHE_SIZE", 1024))
+
+
+def normalize_title(title: str) -> str:
+    """Cache key for a title: case-folded with collapsed whitespace."""
+    return " ".join(title.split()).casefold()
+
+
+class OmdbCache:
+    """
+    Two-level cache for OMDb lookups: an in-process LRU for hot titles in front
+    of a SQLite table that survives restarts. Values are the parsed movie dicts
+    returned by fetch_movie; an empty dict marks a title OMDb does not know.
+    """
+
+    def __init__(self, db_url=CACHE_DB_URL, ttl=CACHE_TTL,
+                 negative_ttl=CACHE_NEGATIVE_TTL, max_entries=CACHE_SIZE):
+        self.engine = create_engine(db_url, echo=False)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lru = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _ensure_table(self):
+        if self._table_ready:
+            return
+        with self.engine.connect() as connection:
+            connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS omdb_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """))
+            connection.commit()
+        self._table_ready = True
+
+    def _remember(self, key, expires_at, value):
+        """Put an entry into the LRU, evicting the coldest one if full."""
+        self._lru[key] = (expires_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, title):
+        """Return the cached movie dict for a title, or None on a miss."""
+        key = normalize_title(title)
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._lru.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return dict(entry[1])
+                del self._lru[key]
+                self.stats["expirations"] += 1
+
+        self._ensure_table()
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                text("SELECT value, expires_at FROM omdb_cache WHERE key=:key"),
+                {"key": key}
+            ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            if row[1] <= now:
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.stats["hits"] += 1
+            return dict(value)
+
+    def set(self, title, value):
+        """Store a movie dict (or {} for 'not found') under the title."""
+        key = normalize_title(title)
+        ttl = self.ttl if value else self.negative_ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, dict(value))
+
+        self._ensure_table()
+        with self.engine.connect() as connection:
+            connection.execute(
+                text("""
+                    INSERT OR REPLACE INTO omdb_cache (key, value, expires_at)
+                    VALUES (:key, :value, :expires_at)
+                """),
+                {"key": key, "value": json.dumps(value), "expires_at": expires_at}
+            )
+            connection.commit()
+
+    def purge_expired(self):
+        """Drop expired rows from the disk store and return how many were removed."""
+        self._ensure_table()
+        with self.engine.connect() as connection:
+            result = connection.execute(
+                text("DELETE FROM omdb_cache WHERE expires_at <= :now"),
+                {"now": time.time()}
+            )
+            connection.commit()
+        with self._lock:
+            self.stats["expirations"] += result.rowcount
+        return result.rowcount
+
+    def clear(self):
+        """Empty both cache levels and reset the counters."""
+        self._ensure_table()
+        with self.engine.connect() as connection:
+            connection.execute(text("DELETE FROM omdb_cache"))
+            connection.commit()
+        with self._lock:
+            self._lru.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
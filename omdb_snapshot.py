@@ -0,0 +1,259 @@
+"""
+Offline OMDb lookups from a local snapshot.
+
+A snapshot starts as a JSONL dump with one raw OMDb answer per line (the
+JSON the API returns for ?t=...). compile_snapshot() parses every record
+with omdb_api.parse_movie, so years, ratings and runtimes are normalized
+exactly like online answers, and writes an indexed SQLite file. OmdbSnapshot
+opens that file read-only and memory-mapped; nothing is loaded up front, so
+the first lookup is as fast as the rest.
+"""
+import difflib
+import json
+import os
+import re
+import tempfile
+import time
+import unicodedata
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from omdb_cache import normalize_title
+
+SNAPSHOT_PATH = os.getenv("OMDB_SNAPSHOT_PATH", "data/omdb_snapshot.db")
+FUZZY_MIN_SIMILARITY = float(os.getenv("OMDB_SNAPSHOT_MIN_SIMILARITY", 0.85))
+FUZZY_CANDIDATES = 50  # trigram matches re-ranked by similarity
+BATCH_SIZE = 5000  # records per insert while compiling
+MMAP_SIZE = 256 * 1024 * 1024
+ARTICLES = ("the", "a", "an")
+
+
+def fuzzy_key(title: str) -> str:
+    """
+    Looser match key than normalize_title: accents, punctuation and a leading
+    article are dropped and "&" reads as "and", so "The Good, the Bad & the
+    Ugly" and "good the bad and the ugly" share a key.
+    """
+    title = unicodedata.normalize("NFKD", title.casefold().replace("&", " and "))
+    words = re.findall(r"[^\W_]+", "".join(c for c in title if not unicodedata.combining(c)))
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def _votes(value):
+    """imdbVotes ("1,234,567" or "N/A") as an int; ties between equal titles go to the most voted."""
+    digits = "".join(c for c in str(value or "") if c.isdigit())
+    return int(digits) if digits else 0
+
+
+def _quoted(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigram_query(key):
+    """
+    An FTS5 query for titles like key with one misspelled word: all other words
+    must appear as is, which keeps the candidates few even for titles made of
+    common words. The misspelled word's trigrams only add to the bm25 rank
+    (OR-ed with a word that is required anyway), since a typo in a short word
+    can break all of them. A one-word key matches on any of its trigrams.
+    None if key has no word of 3+ characters (shorter ones cannot be matched).
+    """
+    words = [word for word in key.split() if len(word) >= 3]
+    trigrams = [" OR ".join(_quoted(word[j:j + 3]) for j in range(len(word) - 2)) for word in words]
+    if len(words) < 2:
+        return trigrams[0] if words else None
+    alternatives = []
+    for i in range(len(words)):
+        others = [_quoted(other) for other in words[:i] + words[i + 1:]]
+        alternatives.append(f"{' AND '.join(others)} AND ({trigrams[i]} OR {others[0]})")
+    return " OR ".join(f"({alternative})" for alternative in alternatives)
+
+
+#  Compiling
+SCHEMA = [
+    """CREATE TABLE snapshot (
+           id INTEGER PRIMARY KEY,
+           key TEXT NOT NULL,
+           fuzzy TEXT NOT NULL,
+           votes INTEGER NOT NULL,
+           movie TEXT NOT NULL
+       )""",
+    "CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)",
+]
+INDEXES = [
+    "CREATE INDEX idx_snapshot_key ON snapshot(key, votes DESC)",
+    "CREATE INDEX idx_snapshot_fuzzy ON snapshot(fuzzy, votes DESC)",
+]
+TRIGRAM_INDEX = [
+    """CREATE VIRTUAL TABLE snapshot_trigrams USING fts5(
+           fuzzy, content='snapshot', content_rowid='id', tokenize='trigram'
+       )""",
+    "INSERT INTO snapshot_trigrams(snapshot_trigrams) VALUES ('rebuild')",
+]
+
+
+def read_records(source):
+    """Yield the OMDb answers of a JSONL dump, skipping blank lines and "Response": "False" entries."""
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("Response") != "False" and record.get("Title"):
+                yield record
+
+
+def compile_snapshot(source, path=SNAPSHOT_PATH, batch_size=BATCH_SIZE):
+    """
+    Compile a JSONL dump of OMDb answers into an indexed snapshot at path.
+    The database is built next to path and swapped in when complete, so
+    running lookups keep the old snapshot until then. Returns the number of
+    records compiled.
+    """
+    from omdb_api import parse_movie  # imported lazily: omdb_api imports this module
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{tmp_path}", echo=False)
+    count = 0
+    try:
+        with engine.begin() as connection:
+            # A half-built file is thrown away anyway, so skip the journal and fsyncs
+            connection.exec_driver_sql("PRAGMA journal_mode=OFF")
+            connection.exec_driver_sql("PRAGMA synchronous=OFF")
+            for statement in SCHEMA:
+                connection.exec_driver_sql(statement)
+            insert = text("INSERT INTO snapshot (key, fuzzy, votes, movie) VALUES (:key, :fuzzy, :votes, :movie)")
+            batch = []
+            for record in read_records(source):
+                movie = parse_movie(record)
+                batch.append({"key": normalize_title(movie["title"]), "fuzzy": fuzzy_key(movie["title"]),
+                              "votes": _votes(record.get("imdbVotes")), "movie": json.dumps(movie)})
+                if len(batch) >= batch_size:
+                    connection.execute(insert, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                connection.execute(insert, batch)
+                count += len(batch)
+            # Indexes are built once after loading, which is much faster than maintaining them
+            for statement in INDEXES:
+                connection.exec_driver_sql(statement)
+            try:
+                for statement in TRIGRAM_INDEX:
+                    connection.exec_driver_sql(statement)
+            except OperationalError:
+                pass  # SQLite before 3.34 has no trigram tokenizer: lookups skip the typo-tolerant stage
+            connection.execute(
+                text("INSERT INTO meta (name, value) VALUES (:name, :value)"),
+                [{"name": "source", "value": os.path.abspath(source)},
+                 {"name": "records", "value": str(count)},
+                 {"name": "compiled_at", "value": str(time.time())}]
+            )
+        engine.dispose()
+        os.replace(tmp_path, path)
+    except BaseException:
+        engine.dispose()
+        os.remove(tmp_path)
+        raise
+    return count
+
+
+#  Lookups
+class OmdbSnapshot:
+    """
+    Read-only title lookups in a compiled snapshot. lookup() tries, in order:
+    the normalized title (case and whitespace, as in the OMDb cache), the
+    looser fuzzy_key, and finally the trigram index for typos, accepting the
+    most similar candidate if it scores at least min_similarity. Among equal
+    titles (remakes) the one with the most IMDb votes wins, as on OMDb.
+    The file is opened on the first lookup.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, min_similarity=FUZZY_MIN_SIMILARITY):
+        self.path = path
+        self.min_similarity = min_similarity
+        self._engine = None
+        self._trigrams = None
+        self.stats = {"exact": 0, "normalized": 0, "fuzzy": 0, "misses": 0}
+
+    def available(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        if self._engine is None:
+            if not self.available():
+                raise FileNotFoundError(f"No OMDb snapshot at {self.path}")
+            engine = create_engine(f"sqlite:///{self.path}", echo=False)
+
+            @event.listens_for(engine, "connect")
+            def read_only(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA query_only=1")
+                cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+                cursor.close()
+
+            self._engine = engine
+        return self._engine.connect()
+
+    def _best(self, connection, column, value):
+        row = connection.execute(
+            text(f"SELECT movie FROM snapshot WHERE {column}=:value ORDER BY votes DESC LIMIT 1"),
+            {"value": value}
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _closest(self, connection, key):
+        query = _trigram_query(key)
+        if query is None:
+            return None
+        if self._trigrams is None:
+            self._trigrams = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name='snapshot_trigrams'")).fetchone() is not None
+        if not self._trigrams:
+            return None
+        rows = connection.execute(
+            text("""
+                SELECT s.fuzzy, s.votes, s.movie FROM snapshot_trigrams
+                JOIN snapshot s ON s.id = snapshot_trigrams.rowid
+                WHERE snapshot_trigrams MATCH :query
+                ORDER BY rank LIMIT :limit
+            """),
+            {"query": query, "limit": FUZZY_CANDIDATES}
+        ).fetchall()
+        scored = [(difflib.SequenceMatcher(None, key, fuzzy).ratio(), votes, movie) for fuzzy, votes, movie in rows]
+        best = max(scored, default=None, key=lambda candidate: candidate[:2])
+        if best is None or best[0] < self.min_similarity:
+            return None
+        return json.loads(best[2])
+
+    def lookup(self, title: str):
+        """The movie dict for a title (as fetch_movie returns it), or None if the snapshot has no match."""
+        with self._connect() as connection:
+            movie = self._best(connection, "key", normalize_title(title))
+            if movie is not None:
+                self.stats["exact"] += 1
+                return movie
+            key = fuzzy_key(title)
+            movie = self._best(connection, "fuzzy", key) if key else None
+            if movie is not None:
+                self.stats["normalized"] += 1
+                return movie
+            movie = self._closest(connection, key)
+        self.stats["fuzzy" if movie is not None else "misses"] += 1
+        return movie
+
+    def info(self):
+        """The snapshot's metadata: source, records and compiled_at."""
+        with self._connect() as connection:
+            return dict(connection.execute(text("SELECT name, value FROM meta")).fetchall())
+
+    def close(self):
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
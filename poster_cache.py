@@ -0,0 +1,156 @@
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POSTER_SUBDIR = "_posters"
+MANIFEST_NAME = "index.json"
+THUMB_WIDTH = 300
+MAX_POSTER_BYTES = 10 * 1024 * 1024
+
+
+def _extension(url, content_type):
+    ext = mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ""
+    if not ext:
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return {".jpe": ".jpg", ".jpeg": ".jpg"}.get(ext, ext) or ".img"
+
+
+def make_thumbnail(data, path, width=THUMB_WIDTH):
+    """
+    Write a JPEG thumbnail of at most `width` pixels wide and return its
+    (width, height). Returns None when Pillow is not installed or the image
+    cannot be decoded; callers then fall back to the original file.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((width, width * 4))
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(path, "JPEG", quality=85, optimize=True)
+            return image.size
+    except Exception as e:
+        print(f"Could not create thumbnail: {e}")
+        return None
+
+
+def image_size(path):
+    """(width, height) of an image file, or None without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(path) as image:
+        return image.size
+
+
+class PosterCache:
+    """
+    Downloads poster images once and stores them content-addressed
+    (<sha256>.<ext>) in one directory shared by all users, next to a
+    thumbnail (<sha256>-w<width>.jpg). index.json maps each poster URL to
+    its files and thumbnail size, so a URL is never fetched twice.
+    """
+
+    def __init__(self, poster_dir, workers=8, timeout=10, thumb_width=THUMB_WIDTH):
+        self.poster_dir = poster_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.thumb_width = thumb_width
+        self.manifest_path = os.path.join(poster_dir, MANIFEST_NAME)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.poster_dir, prefix=".tmp-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_cached(self, url):
+        entry = self.manifest.get(url)
+        return bool(entry) and os.path.exists(os.path.join(self.poster_dir, entry["thumb"]))
+
+    def _download(self, url):
+        """Fetch one poster and store it; returns its manifest entry or None."""
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.content
+        except requests.RequestException as e:
+            print(f"Could not download poster {url}: {e}")
+            return None
+        if not data or len(data) > MAX_POSTER_BYTES:
+            return None
+
+        digest = hashlib.sha256(data).hexdigest()
+        original = digest + _extension(url, response.headers.get("Content-Type"))
+        original_path = os.path.join(self.poster_dir, original)
+        if not os.path.exists(original_path):
+            fd, tmp_path = tempfile.mkstemp(dir=self.poster_dir, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, original_path)
+
+        thumb = f"{digest}-w{self.thumb_width}.jpg"
+        thumb_path = os.path.join(self.poster_dir, thumb)
+        if os.path.exists(thumb_path):
+            # Same image already reached through another URL
+            size = image_size(thumb_path)
+        else:
+            size = make_thumbnail(data, thumb_path, self.thumb_width)
+        if size is None:
+            return {"file": original, "thumb": original, "width": None, "height": None}
+        return {"file": original, "thumb": thumb, "width": size[0], "height": size[1]}
+
+    def fetch(self, urls):
+        """
+        Make sure every poster URL is stored locally, downloading the missing
+        ones concurrently. Returns {url: manifest entry} for the URLs that are
+        available; failed downloads are left out (and retried next time).
+        """
+        os.makedirs(self.poster_dir, exist_ok=True)
+        wanted = {url for url in urls if url and url.startswith(("http://", "https://"))}
+        missing = sorted(url for url in wanted if not self._is_cached(url))
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for url, entry in zip(missing, executor.map(self._download, missing)):
+                    if entry:
+                        self.manifest[url] = entry
+            self._save_manifest()
+
+        return {url: self.manifest[url] for url in wanted if url in self.manifest}
+
+    def close(self):
+        self.session.close()
+
+
+def fetch_posters(urls, output_dir, workers=8):
+    """Store the given poster URLs under <output_dir>/_posters; returns {url: entry}."""
+    cache = PosterCache(os.path.join(output_dir, POSTER_SUBDIR), workers=workers)
+    try:
+        return cache.fetch(urls)
+    finally:
+        cache.close()
@@ -0,0 +1,292 @@
+import contextlib
+import functools
+import hashlib
+import io
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import quote
+
+import metrics
+import movie_storage_sql as storage
+from poster_cache import POSTER_SUBDIR, fetch_posters
+from template_engine import Markup, escape, load_template
+
+TEMPLATE_PATH = os.path.join("templates", "index_template.html")
+ITEM_TEMPLATE_PATH = os.path.join("templates", "movie_item_template.html")
+OUTPUT_DIR = "generated_sites"
+FETCH_SIZE = 500  # rows per database page while streaming
+
+# Labelled by status only: a user label would add series per user without bound;
+# per-user timings are printed in the generate_all_sites summary instead
+SITE_RENDER_SECONDS = metrics.histogram("site_render_seconds", "generate_site time in seconds by status", ("status",))
+SITE_RENDERS = metrics.counter("site_renders_total", "generate_site results by status", ("status",))
+
+
+def poster_src(movie, posters=None):
+    """Local thumbnail path and size for a movie's poster, or its remote URL."""
+    url = movie.get("poster_url") or ""
+    entry = posters.get(url) if posters else None
+    if not entry:
+        return url, None, None
+    return f"{POSTER_SUBDIR}/{entry['thumb']}", entry["width"], entry["height"]
+
+
+def movie_item_values(movie, posters=None):
+    src, width, height = poster_src(movie, posters)
+    size = Markup(f' width="{int(width)}" height="{int(height)}"') if width and height else Markup()
+    return {
+        "__MOVIE_POSTER__": src,
+        "__MOVIE_POSTER_SIZE__": size,
+        "__MOVIE_TITLE__": movie["title"],
+        "__MOVIE_YEAR__": movie["year"],
+        "__MOVIE_RATING__": movie["rating"],
+    }
+
+
+def iter_movie_grid(item_template, movies, posters=None):
+    """Yield the grid markup one movie at a time."""
+    for movie in movies:
+        yield item_template.render(movie_item_values(movie, posters))
+
+
+def write_atomic(path, chunks):
+    """Stream chunks into a temp file next to path, then swap it in with os.replace."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".html")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def iter_user_movies(username):
+    """Stream a user's movies from the database in id order."""
+    for page in storage.iter_movies(username, page_size=FETCH_SIZE):
+        yield from page
+
+
+def content_hash(username, templates, page_size=None, posters=None):
+    """Hash of everything a site is built from (templates, paging, movie rows, posters)."""
+    digest = hashlib.sha256()
+    for template in templates:
+        digest.update(template.source.encode("utf-8"))
+    digest.update(repr((page_size, posters is not None)).encode("utf-8"))
+    for movie in iter_user_movies(username):
+        digest.update(repr((movie["id"], movie["title"], movie["year"], movie["rating"],
+                            poster_src(movie, posters))).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def page_filename(username, number):
+    """
+    File name of a site page: <username>.html, then <username>~page-2.html, ...
+    Usernames cannot contain "~", so one user's pages never share a name with
+    another user's site. Raises ValueError for a name created before that rule.
+    """
+    if storage.PAGE_SEPARATOR in username:
+        raise ValueError(f"Username cannot be used for a site: {username}")
+    return f"{username}.html" if number == 1 else f"{username}{storage.PAGE_SEPARATOR}page-{number}.html"
+
+
+def site_path(output_dir, name):
+    """
+    Path of a generated file directly inside output_dir. Raises ValueError if
+    name (built from a username) would resolve anywhere else.
+    """
+    path = os.path.join(output_dir, name)
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(output_dir):
+        raise ValueError(f"Refusing to write outside {output_dir}: {name}")
+    return path
+
+
+def pagination_html(username, number, total):
+    """Links to every page of a paginated site, the current one highlighted."""
+    if total <= 1:
+        return ""
+    links = []
+    for page in range(1, total + 1):
+        if page == number:
+            links.append(f'<span class="current-page">{page}</span>')
+        else:
+            links.append(f'<a href="{escape(quote(page_filename(username, page)))}">{page}</a>')
+    return Markup('<nav class="pagination">' + " ".join(links) + "</nav>")
+
+
+def _page_values(username, grid, pagination=Markup()):
+    return {
+        "__TEMPLATE_TITLE__": f"{username}'s Movie Library",
+        "__TEMPLATE_MOVIE_GRID__": grid,
+        "__TEMPLATE_DATE__": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "__TEMPLATE_PAGINATION__": pagination,
+    }
+
+
+def _remove_stale_pages(username, output_dir, keep):
+    """Delete page files beyond the current page count (library got smaller)."""
+    pattern = re.compile(re.escape(username + storage.PAGE_SEPARATOR) + r"page-(\d+)\.html$")
+    for name in os.listdir(output_dir):
+        match = pattern.match(name)
+        if match and int(match.group(1)) > keep:
+            os.remove(os.path.join(output_dir, name))
+
+
+def _record_render(func):
+    """Record generate_site's duration and returned status."""
+    @functools.wraps(func)
+    def wrapper(username, *args, **kwargs):
+        start = time.perf_counter()
+        status = func(username, *args, **kwargs)
+        SITE_RENDER_SECONDS.observe(time.perf_counter() - start, status=status)
+        SITE_RENDERS.inc(status=status)
+        return status
+    return wrapper
+
+
+@_record_render
+def generate_site(username, template_path=None, output_dir=None,
+                  page_size=None, force=False, item_template_path=None, local_posters=False, posters=None):
+    """
+    Render a user's movie library to <output_dir>/<username>.html.
+    Movies are streamed from the database and the HTML is streamed into a
+    temp file that atomically replaces the old site, so neither the library
+    nor the page is held in memory. With page_size, the library is split into
+    <username>.html, <username>-page-2.html, ... linked by a page index.
+    The site is skipped when its content hash matches the last build (unless force).
+    With local_posters, posters are downloaded once into <output_dir>/_posters
+    (see poster_cache) and the page uses the local thumbnails; posters is an
+    already fetched {url: entry} mapping to use instead of fetching.
+    Returns "generated", "unchanged", "no_movies", "no_template" or "error".
+    """
+    template_path = template_path or TEMPLATE_PATH
+    item_template_path = item_template_path or ITEM_TEMPLATE_PATH
+    output_dir = output_dir or OUTPUT_DIR
+    for path in (template_path, item_template_path):
+        if not os.path.exists(path):
+            print(f"Template file not found: {path}")
+            return "no_template"
+    try:
+        template = load_template(template_path)
+        item_template = load_template(item_template_path)
+    except Exception as e:
+        print(f"Error reading template: {e}")
+        return "error"
+
+    total = storage.count_movies(username)
+    if not total:
+        print(f"No movies available for {username} to generate website.")
+        return "no_movies"
+
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        output_path = site_path(output_dir, page_filename(username, 1))
+        hash_path = site_path(output_dir, f".{username}.sha256")
+        site_path(output_dir, page_filename(username, 2))
+    except ValueError as e:
+        print(e)
+        return "error"
+    if local_posters and posters is None:
+        posters = fetch_posters(storage.list_poster_urls([username]), output_dir)
+    new_hash = content_hash(username, (template, item_template), page_size, posters)
+    if not force and os.path.exists(output_path) and os.path.exists(hash_path):
+        with open(hash_path, "r", encoding="utf-8") as f:
+            if f.read().strip() == new_hash:
+                print(f"Website for {username} is up to date: {output_path}")
+                return "unchanged"
+
+    try:
+        if page_size:
+            page_count = -(-total // page_size)
+            pages = storage.iter_movies(username, page_size=page_size)
+            for number, page in enumerate(pages, start=1):
+                values = _page_values(username, iter_movie_grid(item_template, page, posters),
+                                      pagination_html(username, number, page_count))
+                write_atomic(site_path(output_dir, page_filename(username, number)),
+                             template.render_iter(values))
+            _remove_stale_pages(username, output_dir, page_count)
+        else:
+            values = _page_values(username, iter_movie_grid(item_template, iter_user_movies(username), posters))
+            write_atomic(output_path, template.render_iter(values))
+            _remove_stale_pages(username, output_dir, 1)
+
+        with open(hash_path, "w", encoding="utf-8") as f:
+            f.write(new_hash)
+    except Exception as e:
+        print(f"Error writing website: {e}")
+        return "error"
+
+    print(f"Website for {username} was generated successfully: {output_path}")
+    return "generated"
+
+
+#  Batch Generation
+_worker_posters = None  # the posters generate_all_sites fetched, handed to each worker once
+
+
+def _init_worker(db_url, posters=None):
+    """Give each worker process its own engine (and so its own DB connections)."""
+    global _worker_posters
+    storage.engine = storage.create_storage_engine(db_url)
+    _worker_posters = posters
+
+
+def _generate_timed(username, options, posters=None):
+    start = time.perf_counter()
+    posters = posters if posters is not None else _worker_posters
+    # Worker output would interleave; the summary reports each status instead
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            status = generate_site(username, posters=posters, **options)
+        except Exception as e:
+            status = f"error: {e}"
+    return {"user": username, "status": status, "seconds": time.perf_counter() - start}
+
+
+def generate_all_sites(usernames=None, workers=None, **options):
+    """
+    Generate the sites of all users (or the given subset) across a process pool.
+    Each worker opens its own database connections; users whose data has not
+    changed since the last build are skipped by generate_site's content hash.
+    workers=1 runs everything in this process. Extra keyword arguments are passed
+    to generate_site. Prints a per-user timing summary and returns the results.
+    """
+    usernames = list(usernames) if usernames else storage.list_users()
+    start = time.perf_counter()
+    posters = None
+    if options.get("local_posters"):
+        # Download every unique poster once up front and hand the result to the
+        # workers, so they neither retry failed URLs nor rewrite the manifest
+        posters = fetch_posters(storage.list_poster_urls(usernames), options.get("output_dir") or OUTPUT_DIR)
+
+    if workers == 1:
+        results = [_generate_timed(username, options, posters) for username in usernames]
+    else:
+        db_url = storage.engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(db_url, posters)) as executor:
+            futures = [executor.submit(_generate_timed, username, options) for username in usernames]
+            results = [future.result() for future in as_completed(futures)]
+        # Metrics recorded inside the workers stay there; record the results here instead
+        for result in results:
+            status = result["status"].split(":")[0]
+            SITE_RENDER_SECONDS.observe(result["seconds"], status=status)
+            SITE_RENDERS.inc(status=status)
+
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda result: result["seconds"], reverse=True)
+    print(f"{'User':<24} {'Status':<12} {'Seconds':>8}")
+    for result in results:
+        print(f"{result['user']:<24} {result['status']:<12} {result['seconds']:8.3f}")
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{len(results)} sites in {elapsed:.2f}s ({summary})")
+    return results
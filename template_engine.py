@@ -0,0 +1,74 @@
+import html
+import os
+import re
+import threading
+from collections.abc import Iterator
+
+PLACEHOLDER = re.compile(r"(__\w+__)")
+
+
+class Markup(str):
+    """A string that is already valid HTML and must not be escaped again."""
+
+
+def escape(value):
+    """HTML-escape a value for use in text or a quoted attribute."""
+    if isinstance(value, Markup):
+        return value
+    return Markup(html.escape(str(value), quote=True))
+
+
+class Template:
+    """
+    A template parsed once into literal and __PLACEHOLDER__ segments.
+    Values passed to render are escaped unless they are Markup; a list or an
+    iterator (e.g. a generator of rendered items) is streamed as already-safe
+    HTML. None and unknown placeholders render as empty strings.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        parts = PLACEHOLDER.split(source)
+        # (is_placeholder, text) pairs; empty literals are dropped
+        self.segments = [(i % 2 == 1, part) for i, part in enumerate(parts) if part]
+
+    def render_iter(self, values):
+        """Yield the rendered template chunk by chunk."""
+        for is_placeholder, text in self.segments:
+            if not is_placeholder:
+                yield text
+                continue
+            value = values.get(text)
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, Iterator)):
+                yield from value
+            else:
+                yield escape(value)
+
+    def render(self, values):
+        """Render the whole template to one string with a single join."""
+        return "".join(self.render_iter(values))
+
+
+_cache = {}  # path -> (mtime_ns, Template)
+_cache_lock = threading.Lock()
+
+
+def load_template(path):
+    """Return the parsed template for a file, re-parsing only when its mtime changes."""
+    mtime = os.stat(path).st_mtime_ns
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        template = Template(f.read())
+    with _cache_lock:
+        _cache[path] = (mtime, template)
+    return template
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
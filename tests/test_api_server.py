@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestClient, TestServer
+
+import api_server
+import movie_storage_sql as storage
+import omdb_api
+
+TEMPLATE = "<title>__TEMPLATE_TITLE__</title>__TEMPLATE_MOVIE_GRID__"
+
+
+# Fixture: temp-file DB (storage calls run on worker threads) with one user
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    engine = storage.create_storage_engine(f"sqlite:///{tmp_path / 'movies.db'}")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("Alice")
+    storage.add_movies_bulk([{"title": "Heat", "year": 1995, "rating": 8.3},
+                             {"title": "Alien", "year": 1979, "rating": 8.5}], user="Alice")
+    yield engine
+    engine.dispose()
+
+
+def run_api(tmp_path, scenario):
+    """Run `scenario(client)` against a test server for a fresh app."""
+    async def main():
+        app = api_server.create_app(db_workers=4, omdb_workers=2, output_dir=str(tmp_path / "sites"))
+        async with TestClient(TestServer(app)) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+# Test users and movie CRUD over HTTP
+def test_users_and_movies(library, tmp_path):
+    async def scenario(client):
+        response = await client.post("/users", json={"username": "Bob"})
+        assert response.status == 201
+        assert (await client.post("/users", json={"username": "Bob"})).status == 409
+        assert (await client.post("/users", json={"username": "../../x"})).status == 400
+        assert await (await client.get("/users")).json() == [{"username": "Alice"}, {"username": "Bob"}]
+
+        response = await client.get("/users/Alice/movies", params={"sort": "rating", "desc": "1"})
+        assert [m["title"] for m in await response.json()] == ["Alien", "Heat"]
+        assert (await client.get("/users/Nobody/movies")).status == 404
+        assert (await client.get("/users/Alice/movies", params={"sort": "bogus"})).status == 400
+
+        response = await client.post("/users/Alice/movies", json={"title": "Up", "year": 2009, "rating": 8.2})
+        assert response.status == 201
+        assert (await client.post("/users/Alice/movies",
+                                  json={"title": "Up", "year": 2009, "rating": 8.2})).status == 409
+        [up] = await (await client.get("/users/Alice/search", params={"q": "up"})).json()
+
+        movie = await (await client.get(f"/users/Alice/movies/{up['id']}")).json()
+        assert movie["title"] == "Up" and "genre" in movie
+
+        response = await client.patch(f"/users/Alice/movies/{up['id']}", json={"rating": 9.5})
+        assert (await response.json())["outcome"] == "updated"
+        assert (await client.patch(f"/users/Alice/movies/{up['id']}", json={"rating": 11})).status == 400
+        assert (await client.delete(f"/users/Alice/movies/{up['id']}")).status == 200
+        assert (await client.delete(f"/users/Alice/movies/{up['id']}")).status == 404
+
+        stats = await (await client.get("/users/Alice/stats")).json()
+        assert stats["count"] == 2 and stats["max"]["rating"] == 8.5
+
+        response = await client.get("/metrics")
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'storage_call_seconds_count{function="movie_stats"}' in await response.text()
+        exported = await (await client.get("/metrics", params={"format": "json"})).json()
+        assert exported["db_query_seconds"]["type"] == "histogram"
+
+    run_api(tmp_path, scenario)
+
+
+# Test concurrent adds of the same title share one OMDb lookup
+def test_omdb_lookups_single_flight(library, tmp_path, monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def slow_fetch(title):
+        with lock:
+            calls.append(title)
+        time.sleep(0.2)
+        return {"title": "Heat 2", "year": 2026, "rating": 7.0, "poster_url": ""}
+
+    monkeypatch.setattr(omdb_api, "fetch_movie", slow_fetch)
+
+    async def scenario(client):
+        responses = await asyncio.gather(*(client.post("/users/Alice/movies", json={"title": title})
+                                           for title in ("heat 2", "Heat 2", " HEAT 2 ")))
+        statuses = sorted(response.status for response in responses)
+        assert statuses == [201, 409, 409]
+        flight = client.server.app[api_server.OMDB_FLIGHT]
+        assert (flight.calls, flight.shared) == (1, 2)
+
+    run_api(tmp_path, scenario)
+    assert len(calls) == 1
+
+
+# Test the site endpoint generates the page and redirects to it
+def test_user_site(library, tmp_path, monkeypatch):
+    template = tmp_path / "index.html"
+    template.write_text(TEMPLATE, encoding="utf-8")
+    monkeypatch.setattr(api_server.site_generator, "TEMPLATE_PATH", str(template))
+
+    async def scenario(client):
+        response = await client.get("/users/Alice/site")
+        assert response.status == 200
+        assert str(response.url).endswith("/sites/Alice.html")
+        assert "Alien" in await response.text()
+        assert (await client.get("/users/Alice/site", params={"page": 2})).status == 404
+
+        # The redirect is URL-quoted, so a "#" in the name is not read as a fragment
+        await client.post("/users", json={"username": "a#b"})
+        await client.post("/users/a%23b/movies", json={"title": "Heat", "year": 1995, "rating": 8.3})
+        response = await client.get("/users/a%23b/site", allow_redirects=False)
+        assert response.headers["Location"] == "/sites/a%23b.html"
+        response = await client.get("/users/a%23b/site")
+        assert response.status == 200 and "Heat" in await response.text()
+
+    run_api(tmp_path, scenario)
@@ -0,0 +1,45 @@
+import movie_storage_sql as storage
+from benchmarks import suite, synthetic
+
+
+# Test the synthetic data is deterministic and users share part of the catalog
+def test_synthetic_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "engine", storage.engine)  # create_database replaces it
+    assert synthetic.movie_pool(50, seed=1) == synthetic.movie_pool(50, seed=1)
+    usernames, pool = synthetic.create_database(str(tmp_path), users=3, movies_per_user=40, seed=1)
+
+    assert usernames == ["user0000", "user0001", "user0002"]
+    assert all(storage.count_movies(username) == 40 for username in usernames)
+    with storage.engine.connect() as connection:
+        catalog_size = connection.exec_driver_sql("SELECT COUNT(*) FROM catalog").scalar()
+    assert catalog_size < 3 * 40
+    assert synthetic.fake_fetch(pool)(pool[0]["title"])["year"] == pool[0]["year"]
+    storage.engine.dispose()
+
+
+# Test a small suite run restores the engine and reports every selected scenario
+def test_run_suite():
+    engine = storage.engine
+    results = suite.run_suite(users=2, movies_per_user=30, repeat=1, only=["list_movies", "bulk"])
+    assert storage.engine is engine
+    assert set(results["results"]) == {"list_movies", "list_movies_cached", "add_movies_bulk",
+                                       "update_ratings_bulk", "delete_movies_bulk", "bulk_import"}
+    assert results["results"]["bulk_import"]["ops"] == 60  # the pool is twice a library
+    assert results["meta"]["calibration_ms"] > 0
+
+
+# Test regressions, improvements, new and missing scenarios in the baseline comparison
+def test_compare():
+    def document(calibration, **medians):
+        return {"meta": {"calibration_ms": calibration},
+                "results": {name: {"median_ms": ms} for name, ms in medians.items()}}
+
+    baseline = document(10.0, a=10.0, b=10.0, c=10.0, gone=1.0)
+    current = document(13.0, a=13.0, b=11.0, c=7.0, added=1.0)
+    statuses = {row["scenario"]: row["status"] for row in suite.compare(current, baseline, threshold=0.25)}
+    assert statuses == {"a": "regression", "b": "ok", "c": "faster", "gone": "missing", "added": "new"}
+
+    # 30% more calibration time: the machine was slower, so a 30% slowdown is expected
+    statuses = {row["scenario"]: row["status"]
+                for row in suite.compare(current, baseline, threshold=0.25, normalize=True)}
+    assert statuses["a"] == "ok" and statuses["c"] == "faster"
@@ -0,0 +1,81 @@
+import json
+import time
+
+import pytest
+from sqlalchemy import create_engine
+
+import bulk_import
+import cli
+import movie_storage_sql as storage
+
+
+# Fixture: In-Memory DB with one user
+@pytest.fixture
+def in_memory_db(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("Importer")
+    return engine
+
+
+def fake_fetch(title):
+    if title.startswith("Unknown"):
+        return {}
+    return {"title": title.title(), "year": 2000, "rating": 7.0, "poster_url": f"{title}.jpg"}
+
+
+# Tests read_titles
+def test_read_titles_plain_text(tmp_path):
+    path = tmp_path / "titles.txt"
+    path.write_text("Heat\n\nAlien\nHeat\n", encoding="utf-8")
+    assert bulk_import.read_titles(str(path)) == ["Heat", "Alien"]
+
+
+def test_read_titles_csv_with_header(tmp_path):
+    path = tmp_path / "titles.csv"
+    path.write_text("year,title\n1995,Heat\n1979,\"Alien, Director's Cut\"\n", encoding="utf-8")
+    assert bulk_import.read_titles(str(path)) == ["Heat", "Alien, Director's Cut"]
+
+
+def test_read_titles_jsonl(tmp_path):
+    path = tmp_path / "titles.jsonl"
+    path.write_text(json.dumps({"title": "Heat"}) + "\n" + json.dumps("Alien") + "\n", encoding="utf-8")
+    assert bulk_import.read_titles(str(path)) == ["Heat", "Alien"]
+
+
+# Test rate limiter spacing
+def test_rate_limiter_limits_throughput():
+    limiter = bulk_import.RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    # First token is free, the other five need ~1/50 s each
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+# Test concurrent import end to end
+def test_import_titles(in_memory_db, capsys):
+    titles = [f"movie {i}" for i in range(25)] + ["Unknown 1"]
+    summary = bulk_import.import_titles(titles, "Importer", workers=4, rate=0,
+                                        batch_size=10, fetch=fake_fetch)
+    assert summary["found"] == 25
+    assert summary["inserted"] == 25
+    assert summary["not_found"] == ["Unknown 1"]
+    assert len(storage.list_movies("Importer")) == 25
+    assert "titles/s" in capsys.readouterr().out
+
+
+# Test import for unknown user
+def test_import_titles_unknown_user(in_memory_db, capsys):
+    assert bulk_import.import_titles(["Heat"], "NoUser", fetch=fake_fetch) is None
+    assert "User 'NoUser' not found." in capsys.readouterr().out
+
+
+# Test CLI subcommand
+def test_cli_import(in_memory_db, tmp_path, monkeypatch):
+    path = tmp_path / "titles.txt"
+    path.write_text("Heat\nAlien\n", encoding="utf-8")
+    monkeypatch.setattr(bulk_import, "fetch_movie", fake_fetch)
+    assert cli.main(["import", str(path), "--user", "Importer", "--rate", "0"]) == 0
+    assert len(storage.list_movies("Importer")) == 2
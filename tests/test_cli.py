@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+import cli
+import movie_storage_sql as storage
+
+
+# Fixture: In-Memory DB with one user and a few movies
+@pytest.fixture
+def library(monkeypatch):
+    engine = storage.create_storage_engine("sqlite:///:memory:")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("Alice")
+    storage.add_movies_bulk([
+        {"title": "Heat", "year": 1995, "rating": 8.3},
+        {"title": "Alien", "year": 1979, "rating": 8.5},
+        {"title": "Cats", "year": 2019, "rating": 2.8},
+    ], user="Alice")
+    return engine
+
+
+def run_json(capsys, *argv):
+    code = cli.main([*argv, "--format", "json"])
+    return code, json.loads(capsys.readouterr().out)
+
+
+# Test list with sorting/filters as JSON and as a table
+def test_list(library, capsys):
+    code, movies = run_json(capsys, "list", "--user", "Alice", "--sort", "rating", "--desc", "--min-year", "1990")
+    assert code == cli.EXIT_OK
+    assert [m["title"] for m in movies] == ["Heat", "Cats"]
+    code, movies = run_json(capsys, "list", "--user", "Alice", "--sort", "rating", "--desc", "--offset", "1")
+    assert [m["title"] for m in movies] == ["Heat", "Cats"]  # --offset also works without --limit
+
+    assert cli.main(["list", "--user", "Alice", "--sort", "title"]) == cli.EXIT_OK
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["ID", "TITLE", "YEAR", "RATING"]
+    assert lines[1].split()[1:] == ["Alien", "1979", "8.5"]
+
+
+# Test --metrics-out writes the command's metrics
+def test_metrics_out(library, tmp_path):
+    path = tmp_path / "metrics.prom"
+    assert cli.main(["--metrics-out", str(path), "list", "--user", "Alice"]) == cli.EXIT_OK
+    assert 'storage_call_seconds_count{function="query_movies"}' in path.read_text(encoding="utf-8")
+
+
+# Test unknown users exit with EXIT_NOT_FOUND and report on stderr
+def test_unknown_user(library, capsys):
+    assert cli.main(["list", "--user", "Nobody"]) == cli.EXIT_NOT_FOUND
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "User 'Nobody' not found." in captured.err
+
+
+# Test add without OMDb lookup, duplicates, update and delete
+def test_add_update_delete(library, capsys):
+    code, movie = run_json(capsys, "add", "Up", "--user", "Alice", "--year", "2009", "--rating", "8.2")
+    assert code == cli.EXIT_OK and movie["outcome"] == "added"
+    assert cli.main(["add", "Up", "--user", "Alice", "--year", "2009", "--rating", "8.2"]) == cli.EXIT_FAILURE
+    capsys.readouterr()
+
+    [up] = storage.search_movies("Alice", "Up")
+    code, result = run_json(capsys, "update", str(up["id"]), "9.0", "--user", "Alice")
+    assert code == cli.EXIT_OK and result["outcome"] == "updated"
+    assert cli.main(["update", str(up["id"]), "11", "--user", "Alice"]) == cli.EXIT_FAILURE
+
+    assert cli.main(["delete", str(up["id"]), "--user", "Alice"]) == cli.EXIT_OK
+    assert cli.main(["delete", str(up["id"]), "--user", "Alice"]) == cli.EXIT_NOT_FOUND
+    assert storage.count_movies("Alice") == 3
+
+
+# Test add looks the movie up on OMDb, keeping stdout clean for JSON
+def test_add_via_omdb(library, capsys, monkeypatch):
+    def fake_fetch(title):
+        print("Fetching...")
+        return {"title": "Heat 2", "year": 2026, "rating": 7.0, "poster_url": "p.jpg"} if title == "heat 2" else {}
+
+    monkeypatch.setattr(cli, "fetch_movie", fake_fetch)
+    code, movie = run_json(capsys, "add", "heat 2", "--user", "Alice")
+    assert code == cli.EXIT_OK and movie["title"] == "Heat 2"
+    assert cli.main(["add", "nope", "--user", "Alice"]) == cli.EXIT_NOT_FOUND
+    assert "Movie not found: nope" in capsys.readouterr().err
+
+
+# Test stats, search, random and users
+def test_read_commands(library, capsys):
+    code, stats = run_json(capsys, "stats", "--user", "Alice")
+    assert code == cli.EXIT_OK and stats["count"] == 3 and stats["max"]["rating"] == 8.5
+
+    code, results = run_json(capsys, "search", "ali", "--user", "Alice")
+    assert code == cli.EXIT_OK and [m["title"] for m in results] == ["Alien"]
+    assert cli.main(["search", "zzz", "--user", "Alice"]) == cli.EXIT_NOT_FOUND
+    capsys.readouterr()
+
+    code, movie = run_json(capsys, "random", "--user", "Alice")
+    assert code == cli.EXIT_OK and movie["title"] in ("Heat", "Alien", "Cats")
+    code, picked = run_json(capsys, "random", "--user", "Alice", "-k", "2", "--seed", "3", "--min-rating", "5")
+    assert code == cli.EXIT_OK and len(picked) == 2 and all(m["rating"] >= 5 for m in picked)
+    assert cli.main(["random", "--user", "Alice", "--min-year", "2100"]) == cli.EXIT_NOT_FOUND
+    capsys.readouterr()
+
+    code, users = run_json(capsys, "users", "--create", "Bob")
+    assert code == cli.EXIT_OK and users == [{"username": "Alice"}, {"username": "Bob"}]
+    assert cli.main(["users", "--create", "Bob"]) == cli.EXIT_FAILURE
+    assert "User already exists: Bob" in capsys.readouterr().err
+
+
+# Test argparse usage errors exit with status 2
+def test_usage_error(library):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["list"])
+    assert exc.value.code == 2
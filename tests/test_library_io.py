@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+import cli
+import library_io
+import movie_storage_sql as storage
+
+
+# Fixture: In-Memory DB with two users' libraries
+@pytest.fixture
+def library(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("Alice")
+    storage.add_user("Bob")
+    storage.add_movies_bulk([
+        {"title": "Heat", "year": 1995, "rating": 8.3, "imdb_id": "tt0113277", "genre": "Crime", "runtime": 170},
+        {"title": "Alien, the \"Director's Cut\"", "year": 1979, "rating": 8.5, "plot": "In space.\nNo one hears."},
+    ], user="Alice")
+    storage.add_movies_bulk([{"title": "Heat", "year": 1995, "rating": 6.0}], user="Bob")
+    return engine
+
+
+def fresh_database(monkeypatch):
+    monkeypatch.setattr(storage, "engine", create_engine("sqlite:///:memory:", echo=False))
+    storage.init_db()
+
+
+def libraries():
+    return {username: sorted((m["title"], m["year"], m["rating"]) for m in storage.list_movies(username).values())
+            for username in storage.list_users()}
+
+
+# Test export_movies streams every user's movies in user and id order, or only selected users
+def test_export_movies(library):
+    records = list(storage.export_movies(batch_size=1))
+    assert [(r["username"], r["title"]) for r in records] == [
+        ("Alice", "Heat"), ("Alice", "Alien, the \"Director's Cut\""), ("Bob", "Heat")]
+    assert records[0] == {"username": "Alice", "title": "Heat", "year": 1995, "rating": 8.3, "poster_url": "",
+                          "imdb_id": "tt0113277", "genre": "Crime", "runtime": 170, "plot": None}
+    assert [r["username"] for r in storage.export_movies(["Bob", "Nobody"])] == ["Bob"]
+
+
+# Test an export round-trips through both formats into an empty database
+@pytest.mark.parametrize("name", ["backup.jsonl", "backup.csv"])
+def test_round_trip(library, tmp_path, monkeypatch, capsys, name):
+    expected = libraries()
+    details = storage.get_movie("Alice", next(iter(storage.list_movies("Alice"))))
+    path = str(tmp_path / name)
+    summary = library_io.export_library(path, report_every=2)
+    assert summary["rows"] == 3 and summary["users"] == 2
+    assert "2 rows exported" in capsys.readouterr().out
+
+    fresh_database(monkeypatch)
+    summary = library_io.import_library(path, batch_size=2)
+    assert (summary["rows"], summary["added"], summary["duplicate"]) == (3, 3, 0)
+    assert libraries() == expected
+    movie_id = next(iter(storage.list_movies("Alice")))
+    assert {**storage.get_movie("Alice", movie_id), "id": details["id"]} == details
+
+    # Importing again finds duplicates; "update" takes the file's ratings
+    storage.update_movie(movie_id, 1.0, user="Alice")
+    assert library_io.import_library(path)["duplicate"] == 3
+    assert storage.list_movies("Alice")[movie_id]["rating"] == 1.0
+    assert library_io.import_library(path, on_duplicate="update")["updated"] == 3
+    assert libraries() == expected
+
+
+# Test importing into one user, without creating users, and invalid rows
+def test_import_options(library, tmp_path, monkeypatch):
+    path = tmp_path / "backup.jsonl"
+    library_io.export_library(str(path))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"username": "Carol", "title": "Broken", "year": "n/a", "rating": 5}) + "\n\n")
+
+    fresh_database(monkeypatch)
+    storage.add_user("Dave")
+    summary = library_io.import_library(str(path), user="Dave")
+    # Alice's Heat has an IMDb ID and Bob's has none, so they are different catalog films
+    assert (summary["added"], summary["duplicate"], summary["invalid"]) == (3, 0, 1)
+    assert storage.list_users() == ["Dave"]
+    summary = library_io.import_library(str(path), create_users=False)
+    assert summary["user_not_found"] == 4
+    # Users are created through the same validation as add_user
+    record = {"username": "../x", "title": "Heat", "year": 1995, "rating": 8.3}
+    assert storage.import_movies([record, {**record, "username": "Eve"}]) == ["invalid", "added"]
+    assert storage.list_users() == ["Dave", "Eve"]
+    with pytest.raises(ValueError):
+        library_io.import_library(str(path), fmt="xml")
+
+
+# Test the export and import-library CLI commands
+def test_cli_export_import(library, tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "alice.csv")
+    assert cli.main(["export", path, "--users", "Alice"]) == cli.EXIT_OK
+    assert "Exported 2 movies of 1 users" in capsys.readouterr().out
+    assert cli.main(["export", path, "--users", "Nobody"]) == cli.EXIT_NOT_FOUND
+
+    fresh_database(monkeypatch)
+    assert cli.main(["import-library", path, "--on-duplicate", "update"]) == cli.EXIT_OK
+    assert "2 added" in capsys.readouterr().out
+    assert cli.main(["import-library", path, "--user", "Bob", "--no-create-users"]) == cli.EXIT_FAILURE
+    assert cli.main(["import-library", str(tmp_path / "missing.jsonl")]) == cli.EXIT_FAILURE
+    assert "Cannot import" in capsys.readouterr().err
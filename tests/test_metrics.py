@@ -0,0 +1,135 @@
+import json
+
+import pytest
+
+import metrics
+import movie_storage_sql as storage
+import omdb_api
+import site_generator
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def library(monkeypatch):
+    engine = storage.create_storage_engine("sqlite:///:memory:")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("Alice")
+    storage.add_movies_bulk([{"title": "Heat", "year": 1995, "rating": 8.3},
+                             {"title": "Alien", "year": 1979, "rating": 8.5}], user="Alice")
+    return engine
+
+
+# Test counters, histogram buckets, quantile estimates and label checks
+def test_counter_and_histogram():
+    requests_total = metrics.counter("test_requests_total", "Requests", ("status",))
+    latency = metrics.histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    assert metrics.counter("test_requests_total", "Requests", ("status",)) is requests_total
+    with pytest.raises(ValueError):
+        metrics.histogram("test_requests_total", "Requests", ("status",))
+    with pytest.raises(ValueError):
+        metrics.counter("test_requests_total", "Requests", ("code",))
+    with pytest.raises(ValueError):
+        requests_total.inc(code=200)
+
+    requests_total.inc(status=200)
+    requests_total.inc(2, status=200)
+    for value in (0.05, 0.05, 0.5, 3.0):
+        latency.observe(value)
+
+    assert requests_total.value(status=200) == 3
+    summary = latency.summary()
+    assert summary["count"] == 4 and summary["max"] == 3.0
+    assert summary["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert 0 < summary["p50"] <= 0.1
+    assert 1.0 < summary["p99"] <= 3.0
+
+    metrics.enabled = False
+    try:
+        requests_total.inc(status=200)
+    finally:
+        metrics.enabled = True
+    assert requests_total.value(status=200) == 3
+
+
+# Test the Prometheus text format and the JSON export
+def test_exports(tmp_path):
+    requests_total = metrics.counter("test_requests_total", "Requests", ("status",))
+    latency = metrics.histogram("test_path_seconds", "Latency", ("path",), buckets=(0.1, 1.0))
+    requests_total.inc(status=200)
+    latency.observe(0.5, path='/a"b')
+
+    text = metrics.to_prometheus()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{status="200"} 1' in text
+    assert "# TYPE test_path_seconds histogram" in text
+    assert 'test_path_seconds_bucket{path="/a\\"b",le="0.1"} 0' in text
+    assert 'test_path_seconds_bucket{path="/a\\"b",le="+Inf"} 1' in text
+    assert 'test_path_seconds_count{path="/a\\"b"} 1' in text
+
+    path = tmp_path / "metrics.json"
+    metrics.write(str(path))
+    exported = json.loads(path.read_text(encoding="utf-8"))
+    assert exported["test_requests_total"]["samples"] == [{"labels": {"status": "200"}, "value": 1}]
+    [sample] = exported["test_path_seconds"]["samples"]
+    assert sample["labels"] == {"path": '/a"b'} and sample["count"] == 1
+
+
+# Test storage calls, rows and per-function query timing
+def test_storage_instrumentation(library):
+    metrics.reset()
+    storage.list_movies("Alice")
+    storage.query_movies("Alice", limit=1)
+    storage.get_movie("Alice", 999)
+
+    calls = metrics.registry.get("storage_call_seconds")
+    rows = metrics.registry.get("storage_rows_returned_total")
+    assert calls.summary(function="list_movies")["count"] == 1
+    assert rows.value(function="list_movies") == 2
+    assert rows.value(function="query_movies") == 1
+    assert rows.value(function="get_movie") == 0
+
+    queries = metrics.DB_QUERY_SECONDS
+    assert queries.summary(function="query_movies", statement="SELECT")["count"] == 1
+    assert queries.summary(function="list_movies", statement="SELECT")["count"] == 1
+    assert metrics.current_operation() is None
+
+    # A failing statement does not leave its start time behind
+    with storage.engine.connect() as connection:
+        with pytest.raises(Exception):
+            connection.exec_driver_sql("SELECT * FROM no_such_table")
+        assert connection.info["metrics_query_start"] == []
+
+
+# Test OMDb lookups are counted by outcome and timed
+def test_omdb_instrumentation(monkeypatch):
+    answers = {"Heat": {"Response": "True", "Title": "Heat", "Year": "1995", "imdbRating": "8.3"},
+               "Nope": {"Response": "False"}}
+    monkeypatch.setattr(omdb_api, "cache", None)
+    monkeypatch.setattr(omdb_api.client, "get_json", lambda title: answers[title])
+    omdb_api.fetch_movie("Heat")
+    omdb_api.fetch_movie("Nope")
+
+    assert omdb_api.OMDB_LOOKUPS.value(outcome="found") == 1
+    assert omdb_api.OMDB_LOOKUPS.value(outcome="not_found") == 1
+    assert omdb_api.OMDB_FETCH_SECONDS.summary(mode="sync")["count"] == 2
+
+
+# Test render time and counts by status
+def test_site_render_instrumentation(library, tmp_path):
+    template = tmp_path / "index.html"
+    template.write_text("__TEMPLATE_MOVIE_GRID__", encoding="utf-8")
+    out_dir = str(tmp_path / "sites")
+    site_generator.generate_site("Alice", template_path=str(template), output_dir=out_dir)
+    site_generator.generate_site("Alice", template_path=str(template), output_dir=out_dir)
+
+    assert site_generator.SITE_RENDER_SECONDS.summary(status="generated")["count"] == 1
+    assert site_generator.SITE_RENDER_SECONDS.summary(status="unchanged")["count"] == 1
+    assert site_generator.SITE_RENDERS.value(status="generated") == 1
+    assert site_generator.SITE_RENDERS.value(status="unchanged") == 1
@@ -0,0 +1,56 @@
+import json
+import pickle
+
+import pytest
+
+from movie_records import Movie, MovieColumns
+
+ROWS = [(3, "Heat", 1995, 8.3, "heat.jpg"), (7, "Alien", 1979, 8.5, None), (9, "Up", 2009, 8.2, "up.jpg")]
+
+
+# Test Movie is a plain tuple that also reads fields by name like the old row dicts
+def test_movie_dict_style_reads():
+    movie = Movie.from_row(ROWS[0])
+    old = {"title": "Heat", "year": 1995, "rating": 8.3, "poster_url": "heat.jpg"}
+
+    assert (movie.id, movie.title, movie["year"], movie.get("rating")) == (3, "Heat", 1995, 8.3)
+    assert movie.get("missing", "default") == "default"
+    with pytest.raises(KeyError):
+        movie["missing"]
+    assert movie.to_dict() == old and movie != old
+    assert f"{movie['rating']:.1f}" == "8.3"
+    # Iteration, len(), indexing and JSON all follow the tuple of five values
+    assert tuple(movie) == ROWS[0] and len(movie) == 5 and movie[1] == "Heat"
+    movie_id, title, *_ = movie
+    assert (movie_id, title) == (3, "Heat")
+    assert json.loads(json.dumps(movie)) == list(ROWS[0])
+
+
+# Test Movie is immutable, hashable and survives pickling
+def test_movie_immutable():
+    movie = Movie(*ROWS[0])
+    with pytest.raises(TypeError):
+        movie["rating"] = 9.0
+    with pytest.raises(AttributeError):
+        movie.rating = 9.0
+    changed = movie.replace(rating=9.0)
+    assert changed.rating == 9.0 and movie.rating == 8.3
+    assert {movie: 1}[Movie(*ROWS[0])] == 1
+    assert pickle.loads(pickle.dumps(movie)) == movie
+    assert repr(movie).startswith("Movie(id=3, title='Heat'")
+
+
+# Test the columnar container
+def test_movie_columns():
+    columns = MovieColumns(ROWS)
+    columns.extend([])
+    assert len(columns) == 3
+    assert list(columns.ratings) == [8.3, 8.5, 8.2]
+    assert columns.ids.typecode == "q" and columns.ratings.typecode == "d"
+    assert columns[1] == Movie(*ROWS[1])
+    assert columns.get(9).title == "Up" and columns.get(4) is None
+    assert [movie.title for movie in columns[:2]] == ["Heat", "Alien"]
+    assert list(columns.column("year")) == [1995, 1979, 2009]
+    assert columns.to_dict() == {row[0]: Movie(*row) for row in ROWS}
+    columns.extend([(12, "Jaws", 1975, 8.1, "")])
+    assert columns.get(12).year == 1975
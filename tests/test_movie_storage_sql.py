@@ -2,6 +2,7 @@ import pytest
 from sqlalchemy import create_engine, text
 
 import movie_storage_sql as storage
+from movie_records import Movie
 
 
 # Fixture: In-Memory DB
@@ -30,6 +31,16 @@ def test_add_and_list_user(in_memory_db):
     assert "Alice" in users
 
 
+# Test usernames that would be unsafe as file names are rejected
+def test_add_user_invalid(in_memory_db, capsys):
+    for username in ("../../x", "a/b", "a\\b", "..", ".hidden", "a\x00b", " padded", "x" * 65):
+        assert storage.username_error(username)
+        storage.add_user(username)
+        assert "Error creating user" in capsys.readouterr().out
+    assert storage.list_users() == []
+    assert storage.username_error("Zoë Smith") is None
+
+
 # Test get_user_id
 def test_get_user_id(in_memory_db):
     storage.add_user("Bob")
@@ -76,3 +87,545 @@ def test_movie_for_nonexistent_user(in_memory_db):
     # update_movie & delete_movie sollten nichts tun und keine Exception werfen
     storage.update_movie(1, 5.0, user="NoUser")
     storage.delete_movie(1, user="NoUser")
+
+
+# Test add_movies_bulk
+def test_add_movies_bulk(in_memory_db):
+    storage.add_user("TestUser")
+    outcomes = storage.add_movies_bulk([
+        {"title": "Bulk1", "year": 2001, "rating": 6.5, "poster_url": "b1.jpg"},
+        {"title": "", "year": 2002, "rating": 7.0},
+        {"title": "Bulk3", "year": "not a year", "rating": 7.0},
+        {"title": "Bulk4", "year": 2004, "rating": 8.0},
+    ], user="TestUser")
+    assert outcomes == ["added", "invalid", "invalid", "added"]
+    titles = sorted(m["title"] for m in storage.list_movies("TestUser").values())
+    assert titles == ["Bulk1", "Bulk4"]
+
+
+# Test add_movies_bulk duplicate policies
+def test_add_movies_bulk_duplicates(in_memory_db):
+    storage.add_user("TestUser")
+    storage.add_movies_bulk([{"title": "A", "year": 2000, "rating": 5.0}], user="TestUser")
+    rows = [{"title": "A", "year": 2000, "rating": 6.0}, {"title": "B", "year": 2000, "rating": 6.0},
+            {"title": "B", "year": 2000, "rating": 7.0}]
+    assert storage.add_movies_bulk(rows, user="TestUser") == ["duplicate", "added", "duplicate"]
+    assert sorted(m["rating"] for m in storage.list_movies("TestUser").values()) == [5.0, 6.0]
+    rows.append({"title": "C", "year": 2000, "rating": 8.0})
+    assert storage.add_movies_bulk(rows, user="TestUser", on_duplicate="update") == [
+        "updated", "updated", "updated", "added"]
+    assert sorted(m["rating"] for m in storage.list_movies("TestUser").values()) == [6.0, 7.0, 8.0]
+    with pytest.raises(ValueError):
+        storage.add_movies_bulk(rows, user="TestUser", on_duplicate="replace")
+
+
+# Test update_ratings_bulk
+def test_update_ratings_bulk(in_memory_db):
+    storage.add_user("TestUser")
+    storage.add_user("Other")
+    storage.add_movies_bulk([{"title": "A", "year": 2000, "rating": 5.0},
+                             {"title": "B", "year": 2000, "rating": 5.0}], user="TestUser")
+    storage.add_movies_bulk([{"title": "C", "year": 2000, "rating": 5.0}], user="Other")
+    ids = list(storage.list_movies("TestUser").keys())
+    other_id = list(storage.list_movies("Other").keys())[0]
+
+    outcomes = storage.update_ratings_bulk([(ids[0], 9.0), (other_id, 1.0), (9999, 1.0)], user="TestUser")
+    assert outcomes == ["updated", "not_found", "not_found"]
+    assert storage.list_movies("TestUser")[ids[0]]["rating"] == 9.0
+    assert storage.list_movies("Other")[other_id]["rating"] == 5.0
+
+
+# Test delete_movies_bulk
+def test_delete_movies_bulk(in_memory_db):
+    storage.add_user("TestUser")
+    storage.add_movies_bulk([{"title": t, "year": 2000, "rating": 5.0} for t in "XYZ"], user="TestUser")
+    ids = list(storage.list_movies("TestUser").keys())
+    outcomes = storage.delete_movies_bulk([ids[0], ids[1], ids[0], 9999], user="TestUser")
+    assert outcomes == ["deleted", "deleted", "not_found", "not_found"]
+    assert list(storage.list_movies("TestUser").keys()) == [ids[2]]
+
+
+# Test bulk functions with non-existent user
+def test_bulk_for_nonexistent_user(in_memory_db):
+    assert storage.add_movies_bulk([{"title": "A", "year": 2000, "rating": 5.0}], user="NoUser") == ["user_not_found"]
+    assert storage.update_ratings_bulk([(1, 5.0)], user="NoUser") == ["user_not_found"]
+    assert storage.delete_movies_bulk([1, 2], user="NoUser") == ["user_not_found"] * 2
+
+
+# Test migrations bring a fresh DB to the latest version and are idempotent
+def test_migrations_applied(in_memory_db):
+    latest = storage.MIGRATIONS[-1][0]
+    assert storage.get_schema_version() == latest
+    storage.init_db()
+    with in_memory_db.connect() as conn:
+        versions = [row[0] for row in conn.execute(text("SELECT version FROM schema_version ORDER BY version"))]
+    assert versions == [version for version, _, _ in storage.MIGRATIONS]
+
+
+# Test migrating a legacy DB that already contains duplicate movies
+def test_migration_dedupes_legacy_rows(monkeypatch, capsys):
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    monkeypatch.setattr(storage, "engine", engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL)"))
+        conn.execute(text("""CREATE TABLE movies (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                             year INTEGER NOT NULL, rating REAL NOT NULL, poster_url TEXT, user_id INTEGER NOT NULL)"""))
+        conn.execute(text("INSERT INTO users (username) VALUES ('Legacy')"))
+        for rating in (5.0, 6.0):
+            conn.execute(text("INSERT INTO movies (title, year, rating, user_id) VALUES ('Dup', 2000, :r, 1)"),
+                         {"r": rating})
+    storage.init_db()
+    assert "removed 1 duplicate movies, keeping the oldest copy of each (Legacy: 1)" in capsys.readouterr().out
+    movies = storage.list_movies("Legacy")
+    assert [m["rating"] for m in movies.values()] == [5.0]
+    # The full-text migration backfills existing rows
+    assert [m["title"] for m in storage.search_movies("Legacy", "dup")] == ["Dup"]
+
+
+# Test unique (user, title, year) constraint
+def test_duplicate_movie_rejected(in_memory_db, capsys):
+    storage.add_user("TestUser")
+    storage.add_movie("Same", 2000, 5.0, user="TestUser")
+    storage.add_movie("Same", 2000, 6.0, user="TestUser")
+    assert len(storage.list_movies("TestUser")) == 1
+    assert "already exists" in capsys.readouterr().out
+    outcomes = storage.add_movies_bulk([{"title": "Same", "year": 2000, "rating": 1.0},
+                                        {"title": "Other", "year": 2000, "rating": 1.0},
+                                        {"title": "Other", "year": 2000, "rating": 2.0}], user="TestUser")
+    assert outcomes == ["duplicate", "added", "duplicate"]
+
+
+def query_plan(engine, sql):
+    with engine.connect() as conn:
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), {"user_id": 1, "title": "x"}).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+# Test the indexes are used by the user-scoped queries
+def test_query_plan_uses_user_index(in_memory_db):
+    plan = query_plan(in_memory_db, "SELECT id, catalog_id, rating FROM movies WHERE user_id=:user_id")
+    assert "USING INDEX" in plan and "user_id=?" in plan
+    assert "SCAN movies" not in plan
+
+
+def test_query_plan_uses_rating_index(in_memory_db):
+    plan = query_plan(in_memory_db, "SELECT id, rating FROM movies WHERE user_id=:user_id ORDER BY rating DESC")
+    assert "idx_movies_user_rating" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_query_plan_uses_catalog_indexes(in_memory_db):
+    plan = query_plan(in_memory_db, "SELECT id FROM catalog WHERE imdb_id=:title")
+    assert "uq_catalog_imdb_id" in plan
+    plan = query_plan(in_memory_db, "SELECT id FROM catalog WHERE title=:title AND year=2000 AND imdb_id IS NULL")
+    assert "uq_catalog_title_year" in plan
+    plan = query_plan(in_memory_db, "SELECT id FROM catalog WHERE title=:title COLLATE NOCASE")
+    assert "idx_catalog_title" in plan
+    plan = query_plan(in_memory_db, f"SELECT m.id FROM {storage.MOVIES_JOIN} WHERE m.user_id=:user_id")
+    assert "SCAN" not in plan
+
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+# Test engine factory applies pragmas on connect
+def test_engine_factory_file_pragmas(tmp_path):
+    engine = storage.create_storage_engine(f"sqlite:///{tmp_path / 'tuned.db'}",
+                                           busy_timeout_ms=1234, cache_size_kb=4096)
+    assert pragma(engine, "journal_mode") == "wal"
+    assert pragma(engine, "synchronous") == 1  # NORMAL
+    assert pragma(engine, "busy_timeout") == 1234
+    assert pragma(engine, "cache_size") == -4096
+    assert engine.pool.__class__.__name__ == "QueuePool"
+    engine.dispose()
+
+
+# Test engine factory is driven by the environment
+def test_engine_factory_from_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("MOVIES_DB_URL", f"sqlite:///{tmp_path / 'env.db'}")
+    monkeypatch.setenv("MOVIES_DB_JOURNAL_MODE", "delete")
+    monkeypatch.setenv("MOVIES_DB_BUSY_TIMEOUT_MS", "250")
+    engine = storage.create_storage_engine()
+    assert engine.url.database.endswith("env.db")
+    assert pragma(engine, "journal_mode") == "delete"
+    assert pragma(engine, "busy_timeout") == 250
+    engine.dispose()
+
+
+# Test in-memory engine is shared across threads
+def test_engine_factory_in_memory_shared(monkeypatch):
+    import threading
+    engine = storage.create_storage_engine("sqlite:///:memory:")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    thread = threading.Thread(target=storage.add_user, args=("Threaded",))
+    thread.start()
+    thread.join()
+    assert storage.list_users() == ["Threaded"]
+
+
+# Test invalid pragma values are rejected
+def test_engine_factory_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        storage.create_storage_engine("sqlite:///:memory:", journal_mode="bogus")
+
+
+# Test movie operations need no separate get_user_id round trip
+# (adding is two statements in one transaction: catalog upsert, then the user's row)
+def test_movie_operations_single_statement(in_memory_db):
+    from sqlalchemy import event
+    storage.add_user("TestUser")
+    statements = []
+    event.listen(in_memory_db, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    storage.add_movie("One", 2000, 5.0, user="TestUser")
+    movie_id = list(storage.list_movies("TestUser").keys())[0]
+    storage.update_movie(movie_id, 6.0, user="TestUser")
+    storage.delete_movie(movie_id, user="TestUser")
+    assert len(statements) == 5
+
+
+@pytest.fixture
+def library(in_memory_db):
+    storage.add_user("TestUser")
+    storage.add_movies_bulk([
+        {"title": "alien", "year": 1979, "rating": 8.5},
+        {"title": "Aliens", "year": 1986, "rating": 8.4},
+        {"title": "Heat", "year": 1995, "rating": 8.3},
+        {"title": "Cats", "year": 2019, "rating": 2.8},
+        {"title": "100% Wolf", "year": 2020, "rating": 5.0},
+        {"title": "Tie", "year": 2001, "rating": 8.3},
+    ], user="TestUser")
+    return in_memory_db
+
+
+# Test query_movies sorting and limits
+def test_query_movies_sorted(library):
+    top = storage.query_movies("TestUser", order_by="rating", descending=True, limit=3)
+    assert [m["title"] for m in top] == ["alien", "Aliens", "Tie"]
+    by_title = storage.query_movies("TestUser", order_by="title")
+    assert [m["title"] for m in by_title][:3] == ["100% Wolf", "alien", "Aliens"]
+    assert storage.query_movies("TestUser", order_by="year", limit=2, offset=1)[0]["title"] == "Aliens"
+
+
+# Test query_movies filters
+def test_query_movies_filters(library):
+    assert {m["title"] for m in storage.query_movies("TestUser", title_like="ALIEN")} == {"alien", "Aliens"}
+    assert [m["title"] for m in storage.query_movies("TestUser", title_like="%")] == ["100% Wolf"]
+    titles = {m["title"] for m in storage.query_movies("TestUser", min_year=1990, max_year=2010, min_rating=8)}
+    assert titles == {"Heat", "Tie"}
+    assert storage.query_movies("NoUser") == []
+    with pytest.raises(ValueError):
+        storage.query_movies("TestUser", order_by="poster_url; DROP TABLE movies")
+
+
+# Test keyset pagination returns every row exactly once, in order
+@pytest.mark.parametrize("order_by", ["id", "title", "year", "rating"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_iter_movies_keyset(library, order_by, descending):
+    expected = storage.query_movies("TestUser", order_by=order_by, descending=descending)
+    pages = list(storage.iter_movies("TestUser", page_size=4, order_by=order_by, descending=descending))
+    assert [len(page) for page in pages] == [4, 2]
+    assert [m["id"] for page in pages for m in page] == [m["id"] for m in expected]
+
+
+# Test random_movie: seeds, k without replacement, filters and unknown users
+def test_random_movie(library):
+    all_ids = {m["id"] for m in storage.query_movies("TestUser")}
+    movie = storage.random_movie("TestUser", seed=7)
+    assert movie["id"] in all_ids and movie == storage.random_movie("TestUser", seed=7)
+    picked = storage.random_movie("TestUser", k=4, seed=1)
+    assert len({m["id"] for m in picked}) == 4 and picked == storage.random_movie("TestUser", k=4, seed=1)
+    assert {m["id"] for m in storage.random_movie("TestUser", k=10)} == all_ids
+    assert {m["title"] for m in storage.random_movie("TestUser", k=5, title_like="alien")} == {"alien", "Aliens"}
+    assert storage.random_movie("TestUser", min_rating=9) is None
+    assert storage.random_movie("NoUser") is None and storage.random_movie("NoUser", k=3) == []
+
+
+# Test picks are uniform across id gaps, and weighted picks favour high ratings
+def test_random_movie_distribution(in_memory_db):
+    storage.add_user("Ann")
+    storage.add_user("Bob")
+    for i in range(40):  # interleaved ids leave gaps in each user's id range
+        storage.add_movie(f"Film {i}", 2000, 9.0 if i % 2 else 1.0, user="Ann" if i % 4 < 2 else "Bob")
+    picks = [storage.random_movie("Ann", seed=seed)["rating"] for seed in range(400)]
+    assert 150 < picks.count(9.0) < 250
+    weighted = [storage.random_movie("Ann", weighted=True, seed=seed)["rating"] for seed in range(400)]
+    assert weighted.count(9.0) > 300  # expected 9 / (9 + 1) of the picks
+
+
+# Test k up to the whole library, through both fallbacks after the probes
+@pytest.mark.parametrize("probe_rounds", [storage.RANDOM_PROBE_ROUNDS, 0])
+def test_random_movie_whole_library(in_memory_db, monkeypatch, probe_rounds):
+    monkeypatch.setattr(storage, "RANDOM_PROBE_ROUNDS", probe_rounds)
+    storage.add_user("Ann")
+    storage.add_movies_bulk([{"title": f"Film {i}", "year": 2000, "rating": float(i % 10)}
+                             for i in range(3000)], user="Ann")
+    all_ids = {m["id"] for m in storage.query_movies("Ann")}
+    for weighted in (False, True):
+        picked = storage.random_movie("Ann", k=3000, weighted=weighted, seed=1)
+        assert len(picked) == 3000 and {m["id"] for m in picked} == all_ids
+    assert len(storage.random_movie("Ann", k=5000)) == 3000
+    # Few picks out of many matches seek past the movies picked already
+    assert len({m["id"] for m in storage.random_movie("Ann", k=30, seed=2)}) == 30
+    picked = storage.random_movie("Ann", k=3, min_rating=9, seed=2)
+    assert len({m["id"] for m in picked}) == 3 and all(m["rating"] == 9 for m in picked)
+    assert len(storage.random_movie("Ann", k=300, weighted=True, max_rating=0)) == 300
+
+
+# Test random picks look ids up by primary key and seek by the (user_id, id) index
+def test_query_plan_random_movie(library):
+    plan = query_plan(library, "SELECT MIN(id) FROM movies WHERE user_id=:user_id")
+    assert "idx_movies_user_id" in plan
+    plan = query_plan(library, f"SELECT m.id FROM {storage.MOVIES_JOIN} WHERE m.id IN (1, 5) AND +m.user_id=:user_id")
+    assert "INTEGER PRIMARY KEY" in plan and "SCAN" not in plan
+    plan = query_plan(library, f"SELECT m.id FROM {storage.MOVIES_JOIN} WHERE m.user_id=:user_id "
+                               "AND m.id >= 3 ORDER BY m.id LIMIT 1")
+    assert "idx_movies_user_id" in plan and "TEMP B-TREE" not in plan
+
+
+# Test keyset page query is served by the rating index without sorting
+def test_query_plan_keyset_by_rating(library):
+    plan = query_plan(library, f"""
+        SELECT m.id FROM movies m WHERE m.user_id={storage.USER_ID_SUBQUERY}
+        AND (m.rating, m.id) < (:after_value, :after_id)
+        ORDER BY m.rating DESC, m.id DESC LIMIT 10
+    """.replace(":username", "'TestUser'").replace(":after_value", "9").replace(":after_id", "1"))
+    assert "idx_movies_user_rating" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+# Test movie_stats aggregates
+def test_movie_stats(library):
+    stats = storage.movie_stats("TestUser")
+    ratings = [8.5, 8.4, 8.3, 2.8, 5.0, 8.3]
+    assert stats["count"] == 6
+    assert stats["mean"] == pytest.approx(sum(ratings) / 6)
+    assert stats["median"] == pytest.approx(8.3)
+    mean = sum(ratings) / 6
+    assert stats["stddev"] == pytest.approx((sum((r - mean) ** 2 for r in ratings) / 6) ** 0.5)
+    assert stats["max"]["rating"] == 8.5
+    assert [m["title"] for m in stats["max"]["movies"]] == ["alien"]
+    assert [m["title"] for m in stats["min"]["movies"]] == ["Cats"]
+    assert stats["histogram"] == {2: 1, 5: 1, 8: 4}
+    assert stats["decades"][1970] == {"count": 1, "mean_rating": 8.5}
+    assert stats["decades"][2010]["count"] == 1
+
+
+# Test movie_stats ties, single rating and empty libraries
+def test_movie_stats_edge_cases(in_memory_db):
+    storage.add_user("TestUser")
+    assert storage.movie_stats("TestUser")["count"] == 0
+    assert storage.movie_stats("NoUser")["mean"] is None
+    storage.add_movies_bulk([{"title": t, "year": 2000, "rating": 10.0} for t in ("A", "B")], user="TestUser")
+    stats = storage.movie_stats("TestUser")
+    assert stats["median"] == 10.0
+    assert stats["stddev"] == 0.0
+    assert len(stats["max"]["movies"]) == 2
+    assert len(stats["min"]["movies"]) == 2
+    assert stats["histogram"] == {10: 2}
+
+
+# Test movie_stats is one statement
+def test_movie_stats_single_statement(library):
+    from sqlalchemy import event
+    statements = []
+    event.listen(library, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    storage.movie_stats("TestUser")
+    assert len(statements) == 1
+
+
+# Test FTS search modes and ranking
+def test_search_movies_modes(library):
+    storage.add_movies_bulk([{"title": "Star Wars", "year": 1977, "rating": 8.6},
+                             {"title": "Wars of the Stars", "year": 1990, "rating": 3.0},
+                             {"title": "Amélie", "year": 2001, "rating": 8.3}], user="TestUser")
+    assert {m["title"] for m in storage.search_movies("TestUser", "ali")} == {"alien", "Aliens"}
+    assert {m["title"] for m in storage.search_movies("TestUser", "star war")} == {"Star Wars", "Wars of the Stars"}
+    assert [m["title"] for m in storage.search_movies("TestUser", "star wars", mode="phrase")] == ["Star Wars"]
+    assert [m["title"] for m in storage.search_movies("TestUser", "alien", mode="all")] == ["alien"]
+    assert [m["title"] for m in storage.search_movies("TestUser", "amelie")] == ["Amélie"]
+    results = storage.search_movies("TestUser", "stars", mode="all")
+    assert results[0]["score"] <= results[-1]["score"]
+    assert storage.search_movies("TestUser", "wars", limit=1)[0]["id"] > 0
+    assert storage.search_movies("TestUser", '"*) OR (') == []
+    assert storage.search_movies("NoUser", "alien") == []
+
+
+# Test triggers keep the FTS index in sync
+def test_search_index_follows_writes(library):
+    [movie] = storage.search_movies("TestUser", "heat")
+    with library.begin() as conn:
+        conn.execute(text("UPDATE catalog SET title='Heatwave' WHERE title='Heat'"))
+    assert storage.search_movies("TestUser", "heat", mode="all") == []
+    assert storage.search_movies("TestUser", "heatwave")[0]["id"] == movie["id"]
+    storage.delete_movie(movie["id"], user="TestUser")
+    assert storage.search_movies("TestUser", "heatwave") == []
+
+
+# Test search is scoped to the user
+def test_search_movies_per_user(library):
+    storage.add_user("Other")
+    storage.add_movie("Alien Resurrection", 1997, 6.2, user="Other")
+    assert {m["title"] for m in storage.search_movies("Other", "alien")} == {"Alien Resurrection"}
+
+
+# Test users share one catalog row per film and keep their own ratings
+def test_catalog_shared_between_users(library):
+    storage.add_user("Other")
+    storage.add_movie("Heat", 1995, 6.0, user="Other")
+    storage.add_movies_bulk([{"title": "Heat", "year": 1995, "rating": 7.0}], user="Other")  # duplicate
+    storage.add_movie("Heat", 1995, 6.0, user="NoUser")
+    with library.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM catalog WHERE title='Heat'")).scalar() == 1
+    assert [m["rating"] for m in storage.query_movies("Other")] == [6.0]
+    [mine] = storage.search_movies("TestUser", "heat")
+    assert mine["rating"] == 8.3
+
+    # An OMDb add gives the row without an IMDb ID its ID and details; films that
+    # have one (here a remake with the same title and year) never merge
+    storage.add_user("Third")
+    storage.add_movies_bulk([{"title": "Heat", "year": 1995, "rating": 7.0, "imdb_id": "tt0113277",
+                              "genre": "Crime, Drama", "runtime": 170, "plot": "A heist.",
+                              "poster_url": "heat.jpg"},
+                             {"title": "Heat", "year": 1995, "rating": 5.0, "imdb_id": "tt9999999"}], user="Third")
+    assert sorted(m["rating"] for m in storage.query_movies("Third")) == [5.0, 7.0]
+    details = storage.get_movie("TestUser", mine["id"])
+    assert (details["imdb_id"], details["genre"], details["runtime"]) == ("tt0113277", "Crime, Drama", 170)
+    assert storage.get_movie("Other", mine["id"]) is None
+    with library.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM catalog WHERE title='Heat'")).scalar() == 2
+
+    # Without an IMDb ID, a title and year the user already has is a duplicate
+    storage.add_movie("Heat", 1995, 6.0, user="Third")
+    storage.add_movies_bulk([{"title": "Heat", "year": 1995, "rating": 1.0}], user="Third")
+    assert sorted(m["rating"] for m in storage.query_movies("Third")) == [5.0, 7.0]
+
+    # The IMDb ID identifies the film even when the title is spelled differently
+    storage.add_user("Fourth")
+    storage.add_movie("heat", 1995, 9.0, user="Fourth", imdb_id="tt0113277")
+    assert [m["title"] for m in storage.query_movies("Fourth")] == ["Heat"]
+
+
+# Test an OMDb add of a film added without an IMDb ID does not add it twice
+def test_imdb_add_adopts_manual_catalog_row(library):
+    storage.add_user("Rosa")
+    storage.add_movie("Blow", 2001, 7.0, user="Rosa")
+    assert storage.add_movies_bulk([{"title": "Blow", "year": 2001, "rating": 9.0, "imdb_id": "tt0221027",
+                                     "genre": "Crime"}], user="Rosa") == ["duplicate"]
+    storage.add_movie("Blow", 2001, 8.0, user="Rosa", imdb_id="tt0221027")
+    [movie] = storage.query_movies("Rosa")
+    assert movie["rating"] == 7.0
+    details = storage.get_movie("Rosa", movie["id"])
+    assert (details["imdb_id"], details["genre"]) == ("tt0221027", "Crime")
+    with library.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM catalog WHERE title='Blow'")).scalar() == 1
+
+
+# Test migrating a pre-catalog DB keeps movie IDs and ratings and shares rows
+def test_migration_builds_catalog(monkeypatch):
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    monkeypatch.setattr(storage, "engine", engine)
+    monkeypatch.setattr(storage, "MIGRATIONS", [m for m in storage.MIGRATIONS if m[0] < 6])
+    storage.init_db()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (username) VALUES ('Ann'), ('Ben')"))
+        conn.execute(text("""INSERT INTO movies (id, title, year, rating, poster_url, user_id) VALUES
+                             (3, 'Heat', 1995, 8.0, 'heat.jpg', 1), (5, 'Heat', 1995, 7.0, '', 2),
+                             (8, 'Up', 2009, 8.2, 'up.jpg', 2)"""))
+
+    monkeypatch.undo()
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.migrate()
+    assert storage.list_movies("Ann") == {3: Movie(3, "Heat", 1995, 8.0, "heat.jpg")}
+    assert storage.list_movies("Ben") == {5: Movie(5, "Heat", 1995, 7.0, "heat.jpg"),
+                                          8: Movie(8, "Up", 2009, 8.2, "up.jpg")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM catalog")).scalar() == 2
+    assert [m["title"] for m in storage.search_movies("Ben", "up")] == ["Up"]
+    # New rows continue after the preserved IDs
+    storage.add_movie("Alien", 1979, 8.5, user="Ann")
+    assert max(storage.list_movies("Ann")) == 9
+
+
+# Test list_movies returns Movie records and list_movie_columns the same rows column-wise
+def test_list_movie_records_and_columns(library):
+    movies = storage.list_movies("TestUser")
+    assert all(isinstance(movie, Movie) and movie.id == movie_id for movie_id, movie in movies.items())
+    columns = storage.list_movie_columns("TestUser")
+    assert columns.to_dict() == movies
+    assert sorted(columns.ratings) == sorted(movie.rating for movie in movies.values())
+    assert len(storage.list_movie_columns("NoUser")) == 0
+
+
+# Test list_movies is served from the cache until a write bumps the user's version
+def test_list_cache_invalidation(library, monkeypatch):
+    cache = storage.ListCache(max_entries=2)
+    monkeypatch.setattr(storage, "list_cache", cache)
+    first = storage.list_movies("TestUser")
+    # Rows are immutable records; callers may still change the mapping they got
+    movie_id = next(iter(first))
+    with pytest.raises(TypeError):
+        first[movie_id]["title"] = "mutated by caller"
+    first[movie_id] = first[movie_id].replace(title="mutated by caller")
+    assert storage.list_movies("TestUser") == storage.list_movies("TestUser") != first
+    assert cache.stats == {"hits": 2, "misses": 1, "evictions": 0}
+
+    movie_id = next(iter(first))
+    storage.update_movie(movie_id, 1.0, user="TestUser")
+    assert storage.list_movies("TestUser")[movie_id]["rating"] == 1.0
+    storage.update_ratings_bulk([(movie_id, 2.0)], user="TestUser")
+    assert storage.list_movies("TestUser")[movie_id]["rating"] == 2.0
+    storage.delete_movie(movie_id, user="TestUser")
+    assert movie_id not in storage.list_movies("TestUser")
+    storage.add_movies_bulk([{"title": "New", "year": 2024, "rating": 5.0}], user="TestUser")
+    assert "New" in {m["title"] for m in storage.list_movies("TestUser").values()}
+    assert cache.hit_rate() == pytest.approx(2 / 7)
+
+
+# Test another user's add completing a shared catalog row invalidates everyone
+def test_list_cache_catalog_bump(library, monkeypatch):
+    monkeypatch.setattr(storage, "list_cache", storage.ListCache())
+    assert {m["poster_url"] for m in storage.list_movies("TestUser").values()} == {""}
+    storage.add_user("Other")
+    storage.add_movie("Heat", 1995, 6.0, poster_url="heat.jpg", user="Other")
+    assert "heat.jpg" in {m["poster_url"] for m in storage.list_movies("TestUser").values()}
+
+
+# Test the cache is bounded (LRU) and can be disabled
+def test_list_cache_bounded(library, monkeypatch):
+    cache = storage.ListCache(max_entries=1)
+    monkeypatch.setattr(storage, "list_cache", cache)
+    storage.list_movies("TestUser")
+    storage.list_movies("NoUser")
+    storage.list_movies("TestUser")
+    assert cache.stats == {"hits": 0, "misses": 3, "evictions": 2}
+    monkeypatch.setattr(storage, "list_cache", storage.ListCache(max_entries=0))
+    storage.list_movies("TestUser")
+    assert storage.list_cache.stats["hits"] == 0 and not storage.list_cache._entries
+
+
+# Test "shared" mode sees writes from another process (another connection)
+def test_list_cache_shared_mode(tmp_path, monkeypatch):
+    import sqlite3
+    engine = storage.create_storage_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("TestUser")
+    storage.add_movie("Heat", 1995, 8.3, user="TestUser")
+    for mode, expected in (("local", 8.3), ("shared", 1.0)):
+        monkeypatch.setattr(storage, "list_cache", storage.ListCache(mode=mode))
+        storage.list_movies("TestUser")
+        other = sqlite3.connect(tmp_path / "shared.db")
+        other.execute("UPDATE movies SET rating = 1.0")
+        other.commit()
+        other.close()
+        assert [m["rating"] for m in storage.list_movies("TestUser").values()] == [expected]
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE movies SET rating = 8.3"))
+    with pytest.raises(ValueError):
+        storage.ListCache(mode="bogus")
+    engine.dispose()
@@ -1,8 +1,5 @@
-import os
-import re
-import random
 import pytest
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 
 # Mock DB when importing movies.py
 with patch("movie_storage_sql.init_db"), \
@@ -57,6 +54,15 @@ def test_choose_user_new(mock_add, mock_users, mock_input):
     mock_add.assert_called_once_with("NewUser")
 
 
+@patch("builtins.input", side_effect=["3", "../x", "3", "NewUser"])
+@patch("movie_storage_sql.list_users", return_value=["User1", "User2"])
+@patch("movie_storage_sql.add_user")
+def test_choose_user_invalid_name(mock_add, mock_users, mock_input, capsys):
+    movies.choose_user()
+    assert "Username cannot start with '.'" in capsys.readouterr().out
+    mock_add.assert_called_once_with("NewUser")
+
+
 # Test add_movie
 @patch("builtins.input", side_effect=["TestMovie"])
 @patch("movies.fetch_movie")
@@ -99,92 +105,135 @@ def test_update_movie_rating(mock_update, mock_input, mock_select):
 
 
 # Test movies_sorted_by_rating
-@patch("movies.get_user_movies")
-def test_movies_sorted_by_rating(mock_get_movies, capsys):
+@patch("movies.storage.iter_movies")
+def test_movies_sorted_by_rating(mock_iter, capsys):
     movies.active_user = "TestUser"
-    mock_get_movies.return_value = {
-        "1": {"title": "A", "year": 2020, "rating": 5},
-        "2": {"title": "B", "year": 2021, "rating": 8},
-    }
+    mock_iter.return_value = iter([[
+        {"id": 2, "title": "B", "year": 2021, "rating": 8},
+        {"id": 1, "title": "A", "year": 2020, "rating": 5},
+    ]])
     movies.movies_sorted_by_rating()
     captured = capsys.readouterr()
     assert "B" in captured.out.splitlines()[1]
+    mock_iter.assert_called_once_with("TestUser", page_size=movies.PAGE_SIZE, order_by="rating", descending=True)
+
+
+# Test listing streams further pages only on request
+@patch("movies.storage.iter_movies")
+@patch("builtins.input", side_effect=["q"])
+def test_list_movies_pages(mock_input, mock_iter, capsys):
+    movies.active_user = "TestUser"
+    full_page = [{"id": i, "title": f"M{i}", "year": 2000, "rating": 5.0} for i in range(movies.PAGE_SIZE)]
+    mock_iter.return_value = iter([full_page, [{"id": 99, "title": "Later", "year": 2000, "rating": 5.0}]])
+    movies.list_movies()
+    captured = capsys.readouterr()
+    assert "M0" in captured.out
+    assert "Later" not in captured.out
+
+
+# Test no prompt follows a final full page
+@patch("movies.storage.iter_movies")
+@patch("builtins.input")
+def test_list_movies_last_page_full(mock_input, mock_iter, capsys):
+    movies.active_user = "TestUser"
+    full_page = [{"id": i, "title": f"M{i}", "year": 2000, "rating": 5.0} for i in range(movies.PAGE_SIZE)]
+    mock_iter.return_value = iter([full_page])
+    movies.list_movies()
+    assert f"M{movies.PAGE_SIZE - 1}" in capsys.readouterr().out
+    mock_input.assert_not_called()
 
 
 # Test search_movies
-@patch("movies.get_user_movies")
+@patch("movies.storage.search_movies")
 @patch("builtins.input", side_effect=["Movie1"])
-def test_search_movies_found(mock_input, mock_get_movies, capsys):
+def test_search_movies_found(mock_input, mock_search, capsys):
     movies.active_user = "TestUser"
-    mock_get_movies.return_value = {"1": {"title": "Movie1", "year": 2020, "rating": 7.0}}
+    mock_search.return_value = [{"id": 42, "title": "Movie1", "year": 2020, "rating": 7.0, "score": -1.0}]
     movies.search_movies()
     captured = capsys.readouterr()
-    assert "Movie1" in captured.out
+    assert "[ID 42] Movie1" in captured.out
+    mock_search.assert_called_once_with("TestUser", "Movie1", limit=movies.SEARCH_LIMIT)
+
+
+@patch("movies.storage.search_movies")
+@patch("builtins.input")
+def test_search_movies_no_user(mock_input, mock_search, capsys):
+    movies.search_movies()
+    assert "No active user selected" in capsys.readouterr().out
+    mock_input.assert_not_called()
+    mock_search.assert_not_called()
+
+
+@patch("movies.storage.search_movies", return_value=[])
+@patch("builtins.input", side_effect=["Nothing"])
+def test_search_movies_not_found(mock_input, mock_search, capsys):
+    movies.active_user = "TestUser"
+    movies.search_movies()
+    assert "No movies found." in capsys.readouterr().out
 
 
 # Test random_movie
-@patch("movies.get_user_movies")
-def test_random_movie(mock_get_movies, capsys):
+@patch("movies.storage.random_movie")
+def test_random_movie(mock_random, capsys):
     movies.active_user = "TestUser"
-    mock_get_movies.return_value = {"1": {"title": "Movie1", "year": 2020, "rating": 7.0}}
-    random.seed(0)
+    mock_random.return_value = {"id": 1, "title": "Movie1", "year": 2020, "rating": 7.0}
     movies.random_movie()
     captured = capsys.readouterr()
     assert "Movie1" in captured.out
+    mock_random.assert_called_once_with("TestUser")
 
 
 # Test generate_website
-@patch("os.path.exists", return_value=True)  # Template exists
-@patch("movies.storage.list_movies")
-@patch("os.makedirs")
-@patch("builtins.open", new_callable=mock_open,
-       read_data="__TEMPLATE_TITLE__ __TEMPLATE_MOVIE_GRID__ __TEMPLATE_DATE__")
-def test_generate_website_success(mock_file, mock_makedirs, mock_list_movies, mock_exists):
+@patch("movies.site_generator.generate_site")
+def test_generate_website_success(mock_generate):
     movies.active_user = "TestUser"
-    mock_list_movies.return_value = {
-        "1": {"title": "Movie1", "year": 2020, "rating": 7.0, "poster_url": "poster1.jpg"}
-    }
-
     movies.generate_website()
-
-    # Check directories created
-    mock_makedirs.assert_called_once_with("generated_sites", exist_ok=True)
-
-    # Check file was written
-    mock_file.assert_called_with(os.path.join("generated_sites", "TestUser.html"), "w", encoding="utf-8")
-
-    handle = mock_file()
-    written_content = "".join(call.args[0] for call in handle.write.call_args_list)
-    assert "TestUser's Movie Library" in written_content
-    assert "Movie1" in written_content
-    assert "poster1.jpg" in written_content
-    assert re.search(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}", written_content)
+    mock_generate.assert_called_once_with("TestUser")
 
 
 # Test generate_website with no active user
-def test_generate_website_no_user(capsys):
+@patch("movies.site_generator.generate_site")
+def test_generate_website_no_user(mock_generate, capsys):
     movies.active_user = None
     movies.generate_website()
     captured = capsys.readouterr()
     assert "No active user selected" in captured.out
+    mock_generate.assert_not_called()
 
 
-# Test generate_website with missing template
-@patch("os.path.exists", return_value=False)
-def test_generate_website_no_template(mock_exists, capsys):
+STATS = {
+    "count": 2, "mean": 6.5, "median": 6.5, "stddev": 1.5,
+    "min": {"rating": 5.0, "movies": [{"id": 1, "title": "Low", "year": 1995}]},
+    "max": {"rating": 8.0, "movies": [{"id": 2, "title": "High", "year": 2001}]},
+    "histogram": {5: 1, 8: 1},
+    "decades": {1990: {"count": 1, "mean_rating": 5.0}, 2000: {"count": 1, "mean_rating": 8.0}},
+}
+
+
+# Test movie_stats
+@patch("movies.storage.movie_stats", return_value=STATS)
+def test_movie_stats(mock_stats, capsys):
     movies.active_user = "TestUser"
-    movies.generate_website()
-    captured = capsys.readouterr()
-    assert "Template file not found" in captured.out
+    movies.movie_stats()
+    out = capsys.readouterr().out
+    assert "Average rating: 6.5" in out
+    assert out.index("High") < out.index("Lowest rated") < out.index("Low (1995)")
 
 
-# Test generate_website with no movies
-@patch("os.path.exists", return_value=True)
-@patch("movies.storage.list_movies", return_value={})
-@patch("builtins.open", new_callable=mock_open,
-       read_data="__TEMPLATE_TITLE__ __TEMPLATE_MOVIE_GRID__ __TEMPLATE_DATE__")
-def test_generate_website_no_movies(mock_file, mock_list_movies, mock_exists, capsys):
+# Test extended stats view
+@patch("movies.storage.movie_stats", return_value=STATS)
+def test_movie_stats_extended(mock_stats, capsys):
     movies.active_user = "TestUser"
-    movies.generate_website()
-    captured = capsys.readouterr()
-    assert f"No movies available for {movies.active_user}" in captured.out
+    movies.movie_stats_extended()
+    out = capsys.readouterr().out
+    assert "Standard deviation: 1.50" in out
+    assert " 8 | " in out
+    assert "1990s: 1 movies" in out
+
+
+# Test stats with empty library
+@patch("movies.storage.movie_stats", return_value={"count": 0})
+def test_movie_stats_empty(mock_stats, capsys):
+    movies.active_user = "TestUser"
+    movies.movie_stats()
+    assert "No movies available" in capsys.readouterr().out
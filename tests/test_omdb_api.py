@@ -0,0 +1,218 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import requests
+
+import omdb_api
+import omdb_async
+
+
+# Local stub OMDb server: answers from a queue of (status, payload) tuples
+class StubOmdbHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(parse_qs(urlparse(self.path).query))
+            server.client_ports.add(self.client_address[1])
+            status, payload = server.responses.pop(0) if server.responses else server.default
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+FOUND = {"Response": "True", "Title": "Heat", "Year": "1995", "imdbRating": "8.3", "Poster": "heat.jpg",
+         "imdbID": "tt0113277", "Genre": "Crime, Drama", "Runtime": "170 min", "Plot": "N/A"}
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOmdbHandler)
+    server.requests = []
+    server.client_ports = set()
+    server.responses = []
+    server.default = (200, FOUND)
+    server.lock = threading.Lock()
+    server.delay = 0
+    server.active = server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub_server, monkeypatch):
+    client = omdb_api.OmdbClient(
+        base_url=f"http://127.0.0.1:{stub_server.server_address[1]}/",
+        api_key="test-key", timeout=2, max_retries=2, backoff=0.01, max_backoff=0.05,
+    )
+    monkeypatch.setattr(omdb_api, "client", client)
+    monkeypatch.setattr(omdb_api, "cache", None)
+    yield client
+    client.close()
+
+
+# Test request parameters and parsing through fetch_movie
+def test_fetch_movie_via_client(client, stub_server):
+    movie = omdb_api.fetch_movie("Heat")
+    assert movie == {"title": "Heat", "year": 1995, "rating": 8.3, "poster_url": "heat.jpg",
+                     "imdb_id": "tt0113277", "genre": "Crime, Drama", "runtime": 170, "plot": None}
+    assert stub_server.requests[0]["t"] == ["Heat"]
+    assert stub_server.requests[0]["apikey"] == ["test-key"]
+
+
+# Test keep-alive: many lookups share one TCP connection
+def test_session_reuses_connection(client, stub_server):
+    for _ in range(5):
+        client.get_json("Heat")
+    assert len(stub_server.requests) == 5
+    assert len(stub_server.client_ports) == 1
+
+
+# Test retry on 429/5xx
+def test_retries_on_rate_limit_and_server_error(client, stub_server):
+    stub_server.responses = [(429, {}), (503, {})]
+    assert client.get_json("Heat")["Title"] == "Heat"
+    assert len(stub_server.requests) == 3
+
+
+# Test retries are bounded
+def test_retries_exhausted(client, stub_server, capsys):
+    stub_server.default = (500, {})
+    with pytest.raises(requests.HTTPError):
+        client.get_json("Heat")
+    assert len(stub_server.requests) == client.max_retries + 1
+    # fetch_movie turns the failure into an empty result
+    assert omdb_api.fetch_movie("Heat") == {}
+    assert "Could not reach OMDb API" in capsys.readouterr().out
+
+
+# Test client errors are not retried
+def test_no_retry_on_client_error(client, stub_server):
+    stub_server.default = (401, {"Response": "False", "Error": "Invalid API key!"})
+    with pytest.raises(requests.HTTPError):
+        client.get_json("Heat")
+    assert len(stub_server.requests) == 1
+
+
+# Test backoff delay stays within the jittered cap
+def test_retry_delay_bounds(client):
+    for attempt in range(6):
+        assert 0 <= client._retry_delay(attempt) <= client.max_backoff
+
+
+# Test per-request latency timing
+def test_latency_stats(client):
+    assert client.latency_stats() == {"count": 0}
+    client.get_json("Heat")
+    client.get_json("Heat")
+    stats = client.latency_stats()
+    assert stats["count"] == 2
+    assert 0 < stats["p50_ms"] <= stats["max_ms"]
+
+
+def async_client(stub_server, **kwargs):
+    return omdb_async.AsyncOmdbClient(
+        base_url=f"http://127.0.0.1:{stub_server.server_address[1]}/",
+        api_key="test-key", timeout=2, max_retries=2, backoff=0.01, max_backoff=0.05, **kwargs
+    )
+
+
+# Test the async lookups parse like fetch_movie and dedupe titles
+def test_fetch_many_async(client, stub_server):
+    async def run():
+        async with async_client(stub_server, rate=0) as aclient:
+            return await omdb_async.fetch_many_async(["Heat", "Alien", "Heat"], client=aclient)
+
+    movies = asyncio.run(run())
+    assert list(movies) == ["Heat", "Alien"]
+    assert movies["Heat"] == omdb_api.fetch_movie("Heat")
+    assert sorted(request["t"][0] for request in stub_server.requests) == ["Alien", "Heat", "Heat"]
+
+
+# Test at most `concurrency` requests are in flight
+def test_fetch_many_async_bounded_concurrency(client, stub_server):
+    stub_server.delay = 0.05
+
+    async def run():
+        async with async_client(stub_server, concurrency=3, rate=0) as aclient:
+            return await omdb_async.fetch_many_async([f"Movie {i}" for i in range(12)], client=aclient)
+
+    movies = asyncio.run(run())
+    assert all(movie["title"] == "Heat" for movie in movies.values()) and len(movies) == 12
+    assert stub_server.max_active == 3
+
+
+# Test the token bucket keeps to the requests/second limit
+def test_fetch_many_async_rate_limited(client, stub_server):
+    async def run():
+        async with async_client(stub_server, concurrency=6, rate=20) as aclient:
+            return await omdb_async.fetch_many_async([f"Movie {i}" for i in range(6)], client=aclient)
+
+    start = time.perf_counter()
+    assert len(asyncio.run(run())) == 6
+    # One token is available up front, the other five arrive every 50 ms
+    assert time.perf_counter() - start >= 0.24
+    assert len(stub_server.requests) == 6
+
+
+# Test retries, "not found" and exhausted retries in the async client
+def test_fetch_movie_async_errors(client, stub_server, capsys):
+    async def run():
+        async with async_client(stub_server, rate=0) as aclient:
+            stub_server.responses = [(429, {}), (503, {})]
+            found = await omdb_async.fetch_movie_async("Heat", aclient)
+            stub_server.responses = [(200, {"Response": "False", "Error": "Movie not found!"})]
+            missing = await omdb_async.fetch_movie_async("Nope", aclient)
+            stub_server.default = (500, {})
+            failed = await omdb_async.fetch_movie_async("Heat", aclient)
+            return found, missing, failed
+
+    found, missing, failed = asyncio.run(run())
+    assert found["title"] == "Heat"
+    assert missing == {} and failed == {}
+    assert len(stub_server.requests) == 3 + 1 + 3
+    out = capsys.readouterr().out
+    assert "Movie not found: Nope" in out and "Could not reach OMDb API" in out
+
+
+# Test the async lookups use the SQLite cache from a worker thread, not the event loop
+def test_fetch_movie_async_cache_off_loop(client, stub_server, monkeypatch):
+    threads = []
+
+    class RecordingCache:
+        def get(self, title):
+            threads.append(threading.get_ident())
+            return None
+
+        def set(self, title, movie):
+            threads.append(threading.get_ident())
+
+    monkeypatch.setattr(omdb_api, "cache", RecordingCache())
+
+    async def run():
+        async with async_client(stub_server, rate=0) as aclient:
+            return threading.get_ident(), await omdb_async.fetch_movie_async("Heat", aclient)
+
+    loop_thread, movie = asyncio.run(run())
+    assert movie["title"] == "Heat"
+    assert len(threads) == 2 and loop_thread not in threads
@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+import omdb_api
+from omdb_cache import OmdbCache, normalize_title
+
+
+# Fixture: cache backed by a temporary SQLite file
+@pytest.fixture
+def cache(tmp_path):
+    return OmdbCache(db_url=f"sqlite:///{tmp_path / 'cache.db'}", ttl=60, negative_ttl=30, max_entries=2)
+
+
+@pytest.fixture
+def api_cache(cache, monkeypatch):
+    monkeypatch.setattr(omdb_api, "cache", cache)
+    return cache
+
+
+def omdb_response(payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    response.raise_for_status.return_value = None
+    return response
+
+
+# Test title normalization
+def test_normalize_title():
+    assert normalize_title("  The   Matrix ") == normalize_title("the matrix")
+
+
+# Test miss then hit
+def test_cache_miss_then_hit(cache):
+    assert cache.get("Inception") is None
+    cache.set("Inception", {"title": "Inception", "year": 2010, "rating": 8.8, "poster_url": ""})
+    assert cache.get("inception")["year"] == 2010
+    assert cache.stats["misses"] == 1
+    assert cache.stats["hits"] == 1
+
+
+# Test disk store survives a fresh process (new cache object)
+def test_cache_persists_on_disk(cache):
+    cache.set("Heat", {"title": "Heat", "year": 1995, "rating": 8.3, "poster_url": ""})
+    fresh = OmdbCache(db_url=str(cache.engine.url), ttl=60)
+    assert fresh.get("heat")["title"] == "Heat"
+
+
+# Test TTL expiry
+def test_cache_expired_entry_is_a_miss(cache):
+    with patch("omdb_cache.time.time", return_value=1000.0):
+        cache.set("Alien", {"title": "Alien", "year": 1979, "rating": 8.5, "poster_url": ""})
+    with patch("omdb_cache.time.time", return_value=1000.0 + 61):
+        assert cache.get("Alien") is None
+    assert cache.stats["expirations"] >= 1
+
+
+# Test LRU eviction counter
+def test_cache_lru_eviction(cache):
+    for title in ["A", "B", "C"]:
+        cache.set(title, {"title": title, "year": 2000, "rating": 5.0, "poster_url": ""})
+    assert cache.stats["evictions"] == 1
+    # Evicted from memory but still served from disk
+    assert cache.get("A")["title"] == "A"
+
+
+# Test fetch_movie only calls OMDb once per title
+@patch.object(omdb_api.client.session, "get")
+def test_fetch_movie_uses_cache(mock_get, api_cache):
+    mock_get.return_value = omdb_response(
+        {"Response": "True", "Title": "Up", "Year": "2009", "imdbRating": "8.3", "Poster": "up.jpg"}
+    )
+    first = omdb_api.fetch_movie("Up")
+    second = omdb_api.fetch_movie("  up ")
+    assert first == second
+    assert first["year"] == 2009
+    mock_get.assert_called_once()
+
+
+# Test negative caching of "Response": "False"
+@patch.object(omdb_api.client.session, "get")
+def test_fetch_movie_negative_cache(mock_get, api_cache, capsys):
+    mock_get.return_value = omdb_response({"Response": "False", "Error": "Movie not found!"})
+    assert omdb_api.fetch_movie("Nope") == {}
+    assert omdb_api.fetch_movie("Nope") == {}
+    mock_get.assert_called_once()
+    assert "Movie not found: Nope" in capsys.readouterr().out
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+import requests
+
+import cli
+import movie_storage_sql as storage
+import omdb_api
+import omdb_async
+import omdb_snapshot
+from omdb_snapshot import OmdbSnapshot, fuzzy_key
+
+RECORDS = [
+    {"Response": "True", "Title": "The Good, the Bad and the Ugly", "Year": "1966", "imdbRating": "8.8",
+     "imdbVotes": "800,000", "imdbID": "tt0060196", "Poster": "gbu.jpg", "Runtime": "178 min", "Plot": "N/A"},
+    {"Response": "True", "Title": "Heat", "Year": "1995", "imdbRating": "8.3", "imdbVotes": "700,000",
+     "imdbID": "tt0113277"},
+    {"Response": "True", "Title": "Heat", "Year": "1986", "imdbRating": "5.0", "imdbVotes": "5,000",
+     "imdbID": "tt0093164"},
+    {"Response": "True", "Title": "Amélie", "Year": "2001–", "imdbRating": "N/A", "imdbID": "tt0211915"},
+    {"Response": "False", "Error": "Movie not found!"},
+]
+
+
+# Fixture: a snapshot compiled from RECORDS in a temp dir
+@pytest.fixture
+def snapshot_path(tmp_path):
+    source = tmp_path / "omdb.jsonl"
+    source.write_text("\n".join(json.dumps(record) for record in RECORDS) + "\n\n", encoding="utf-8")
+    path = str(tmp_path / "snapshot.db")
+    assert omdb_snapshot.compile_snapshot(str(source), path) == 4
+    return path
+
+
+@pytest.fixture
+def offline_api(snapshot_path, monkeypatch):
+    snapshot = OmdbSnapshot(snapshot_path)
+    monkeypatch.setattr(omdb_api, "snapshot", snapshot)
+    monkeypatch.setattr(omdb_api, "cache", None)
+    yield snapshot
+    snapshot.close()
+
+
+# Test the looser title key
+def test_fuzzy_key():
+    assert fuzzy_key("The Good, the Bad & the Ugly") == "good the bad and the ugly"
+    assert fuzzy_key("  AMÉLIE!") == fuzzy_key("amelie") == "amelie"
+    assert fuzzy_key("The") == "the"
+
+
+# Test exact, normalized and typo lookups, remakes going to the most voted
+def test_snapshot_lookup(snapshot_path):
+    snapshot = OmdbSnapshot(snapshot_path)
+    heat = snapshot.lookup("  heat ")
+    assert (heat["year"], heat["imdb_id"]) == (1995, "tt0113277")
+    # Same normalization as an online answer
+    assert snapshot.lookup("The Good, the Bad and the Ugly") == omdb_api.parse_movie(RECORDS[0])
+    assert snapshot.lookup("Amelie") == {"title": "Amélie", "year": 2001, "rating": 0.0, "poster_url": "",
+                                         "imdb_id": "tt0211915", "genre": None, "runtime": None, "plot": None}
+    assert snapshot.lookup("good the bad & the ugly")["year"] == 1966
+    assert snapshot.lookup("The Good the Bad and teh Ugly")["year"] == 1966
+    assert snapshot.lookup("Heatwave") is None and snapshot.lookup("?") is None
+    assert snapshot.stats == {"exact": 2, "normalized": 2, "fuzzy": 1, "misses": 2}
+    assert snapshot.info()["records"] == "4"
+    snapshot.close()
+
+
+# Test offline mode answers from the snapshot without touching the network
+@patch.object(omdb_api.client, "get_json")
+def test_offline_mode(mock_get_json, offline_api, monkeypatch, capsys):
+    monkeypatch.setattr(omdb_api, "mode", "offline")
+    assert omdb_api.fetch_movie("heat")["year"] == 1995
+    assert asyncio.run(omdb_async.fetch_movie_async("amelie"))["title"] == "Amélie"
+    assert omdb_api.fetch_movie("Unknown Film") == {}
+    assert "Movie not found: Unknown Film" in capsys.readouterr().out
+    mock_get_json.assert_not_called()
+
+    monkeypatch.setattr(offline_api, "path", offline_api.path + ".missing")
+    monkeypatch.setattr(offline_api, "_engine", None)
+    assert omdb_api.fetch_movie("heat") == {}
+    assert "No OMDb snapshot" in capsys.readouterr().out
+
+
+# Test fallback mode uses the snapshot only when OMDb cannot be reached
+@patch.object(omdb_api.client, "get_json")
+def test_fallback_mode(mock_get_json, offline_api, monkeypatch):
+    mock_get_json.return_value = {"Response": "True", "Title": "Heat (online)", "Year": "1995", "imdbRating": "8.3"}
+    monkeypatch.setattr(omdb_api, "mode", "fallback")
+    assert omdb_api.fetch_movie("heat")["title"] == "Heat (online)"
+    mock_get_json.side_effect = requests.ConnectionError("offline")
+    assert omdb_api.fetch_movie("heat")["title"] == "Heat"
+
+    # Online mode never consults the snapshot
+    monkeypatch.setattr(omdb_api, "mode", "online")
+    assert omdb_api.fetch_movie("heat") == {}
+    assert offline_api.stats["exact"] == 1
+
+
+# Test an unknown OMDB_MODE warns and falls back to online instead of failing at import
+def test_parse_mode(capsys):
+    assert omdb_api._parse_mode(" Offline ") == "offline"
+    assert omdb_api._parse_mode(None) == "online"
+    assert omdb_api._parse_mode("ofline") == "online"
+    assert "Unknown OMDB_MODE 'ofline'" in capsys.readouterr().err
+
+
+# Test the compile-snapshot CLI command
+def test_cli_compile_snapshot(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(storage, "engine", storage.create_storage_engine("sqlite:///:memory:"))
+    source = tmp_path / "omdb.jsonl"
+    source.write_text(json.dumps(RECORDS[1]) + "\n", encoding="utf-8")
+    out = str(tmp_path / "out.db")
+    assert cli.main(["compile-snapshot", str(source), "--out", out, "--format", "json"]) == cli.EXIT_OK
+    assert json.loads(capsys.readouterr().out) == {"records": 1, "snapshot": out}
+    assert OmdbSnapshot(out).lookup("Heat")["year"] == 1995
+    assert cli.main(["compile-snapshot", str(tmp_path / "missing.jsonl"), "--out", out]) == cli.EXIT_FAILURE
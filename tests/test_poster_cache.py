@@ -0,0 +1,99 @@
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import movie_storage_sql as storage
+import poster_cache
+import site_generator
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def png_bytes(width, height, color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# Local stub image server: path -> (status, body); counts hits per path
+class StubImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        status, body = self.server.files.get(self.path, (404, b"not found"))
+        self.send_response(status)
+        self.send_header("Content-Type", "image/png" if status == 200 else "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def image_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubImageHandler)
+    server.lock = threading.Lock()
+    server.hits = {}
+    red = png_bytes(600, 900, "red")
+    server.files = {"/red.png": (200, red), "/red-again.png": (200, red),
+                    "/blue.png": (200, png_bytes(100, 150, "blue"))}
+    server.base = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# Test download, content addressing, thumbnails and dedupe
+def test_fetch_posters(image_server, tmp_path):
+    urls = [image_server.base + path for path in ("/red.png", "/red-again.png", "/blue.png", "/missing.png")]
+    posters = poster_cache.fetch_posters(urls + [urls[0], "", "file:///etc/passwd"], str(tmp_path))
+
+    assert set(posters) == set(urls[:3])
+    red, red_again, blue = (posters[url] for url in urls[:3])
+    assert red == red_again  # same content, stored once
+    assert red["file"].endswith(".png")
+    assert (red["width"], red["height"]) == (300, 450)
+    assert (blue["width"], blue["height"]) == (100, 150)  # never upscaled
+    poster_dir = tmp_path / poster_cache.POSTER_SUBDIR
+    assert len([name for name in os.listdir(poster_dir) if name.endswith(".png")]) == 2
+    assert image_server.hits["/red.png"] == 1
+
+    # Second run (e.g. another user) reuses the manifest: no new requests
+    poster_cache.fetch_posters(urls, str(tmp_path))
+    assert image_server.hits["/red.png"] == 1
+    assert image_server.hits["/missing.png"] == 2  # failures are retried
+    manifest = json.loads((poster_dir / "index.json").read_text(encoding="utf-8"))
+    assert set(manifest) == set(urls[:3])
+
+
+# Test generated sites link the local thumbnails with size and lazy loading
+def test_generate_site_local_posters(image_server, tmp_path, monkeypatch):
+    engine = storage.create_storage_engine("sqlite:///:memory:")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    for user in ("Ann", "Ben"):
+        storage.add_user(user)
+        storage.add_movie("Red", 2000, 7.0, poster_url=image_server.base + "/red.png", user=user)
+    storage.add_movie("Gone", 2001, 5.0, poster_url=image_server.base + "/missing.png", user="Ann")
+
+    out_dir = str(tmp_path / "sites")
+    site_generator.generate_all_sites(workers=1, output_dir=out_dir, local_posters=True)
+    html = (tmp_path / "sites" / "Ann.html").read_text(encoding="utf-8")
+    entry = poster_cache.fetch_posters([image_server.base + "/red.png"], out_dir)[image_server.base + "/red.png"]
+    assert f'src="_posters/{entry["thumb"]}"' in html
+    assert 'width="300" height="450"' in html
+    assert 'loading="lazy"' in html
+    # A poster that could not be downloaded keeps its remote URL
+    assert f'src="{image_server.base}/missing.png"' in html
+    # Posters are fetched once for all users; the failed one is not retried per site
+    assert image_server.hits["/red.png"] == 1 and image_server.hits["/missing.png"] == 1
@@ -0,0 +1,182 @@
+import os
+import re
+
+import pytest
+
+import movie_storage_sql as storage
+import site_generator
+
+TEMPLATE = "<title>__TEMPLATE_TITLE__</title>__TEMPLATE_MOVIE_GRID__ __TEMPLATE_DATE__ __TEMPLATE_PAGINATION__ __UNKNOWN__"
+
+
+# Fixture: In-Memory DB with a small library
+@pytest.fixture
+def library(monkeypatch):
+    engine = storage.create_storage_engine("sqlite:///:memory:")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    storage.add_user("TestUser")
+    storage.add_movies_bulk([{"title": f"Movie{i}", "year": 2000 + i, "rating": 7.0,
+                              "poster_url": f"poster{i}.jpg"} for i in range(5)], user="TestUser")
+    return engine
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    path = tmp_path / "index_template.html"
+    path.write_text(TEMPLATE, encoding="utf-8")
+    return str(path)
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# Test placeholders are streamed into the output file
+def test_generate_site(library, template_path, tmp_path, capsys):
+    out_dir = str(tmp_path / "sites")
+    assert site_generator.generate_site("TestUser", template_path, out_dir) == "generated"
+    html = read(os.path.join(out_dir, "TestUser.html"))
+    assert "<title>TestUser&#x27;s Movie Library</title>" in html
+    assert "Movie0" in html and "Movie4" in html
+    assert "poster1.jpg" in html
+    assert re.search(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}", html)
+    assert "__UNKNOWN__" not in html
+    assert "generated successfully" in capsys.readouterr().out
+    # No temp files left behind
+    assert sorted(os.listdir(out_dir)) == [".TestUser.sha256", "TestUser.html"]
+
+
+# Test unchanged libraries are skipped and changes are picked up
+def test_generate_site_skips_unchanged(library, template_path, tmp_path):
+    out_dir = str(tmp_path / "sites")
+    assert site_generator.generate_site("TestUser", template_path, out_dir) == "generated"
+    assert site_generator.generate_site("TestUser", template_path, out_dir) == "unchanged"
+    assert site_generator.generate_site("TestUser", template_path, out_dir, force=True) == "generated"
+    storage.add_movie("Movie99", 2020, 9.0, user="TestUser")
+    assert site_generator.generate_site("TestUser", template_path, out_dir) == "generated"
+    assert "Movie99" in read(os.path.join(out_dir, "TestUser.html"))
+
+
+# Test paginated output with page index and stale page cleanup
+def test_generate_site_paginated(library, template_path, tmp_path):
+    out_dir = str(tmp_path / "sites")
+    assert site_generator.generate_site("TestUser", template_path, out_dir, page_size=2) == "generated"
+    first = read(os.path.join(out_dir, "TestUser.html"))
+    third = read(os.path.join(out_dir, "TestUser~page-3.html"))
+    assert "Movie0" in first and "Movie2" not in first
+    assert "Movie4" in third
+    assert 'href="TestUser~page-2.html"' in first
+    assert 'href="TestUser.html"' in third
+    assert '<span class="current-page">3</span>' in third
+
+    storage.delete_movies_bulk(list(storage.list_movies("TestUser"))[:2], user="TestUser")
+    site_generator.generate_site("TestUser", template_path, out_dir, page_size=2)
+    assert not os.path.exists(os.path.join(out_dir, "TestUser~page-3.html"))
+
+
+# Test that one user's pages never overwrite or delete another user's site
+def test_generate_site_page_names_do_not_collide(library, template_path, tmp_path):
+    out_dir = str(tmp_path / "sites")
+    storage.add_user("bob")
+    storage.add_user("bob-page-2")
+    storage.add_movie("BobMovie0", 2000, 7.0, user="bob")
+    storage.add_movie("BobMovie1", 2001, 7.0, user="bob")
+    storage.add_movie("OtherMovie", 2002, 7.0, user="bob-page-2")
+    assert site_generator.generate_site("bob-page-2", template_path, out_dir) == "generated"
+    assert site_generator.generate_site("bob", template_path, out_dir, page_size=1) == "generated"
+    assert "OtherMovie" in read(os.path.join(out_dir, "bob-page-2.html"))
+    assert "BobMovie1" in read(os.path.join(out_dir, "bob~page-2.html"))
+
+    assert site_generator.generate_site("bob", template_path, out_dir) == "generated"
+    assert "OtherMovie" in read(os.path.join(out_dir, "bob-page-2.html"))
+    assert not os.path.exists(os.path.join(out_dir, "bob~page-2.html"))
+    assert storage.username_error("bob~page-2")
+
+
+# Test page links are URL-quoted, so a "#" in the name is not read as a fragment
+def test_generate_site_page_links_quoted(library, template_path, tmp_path):
+    out_dir = str(tmp_path / "sites")
+    storage.add_user("a#b")
+    storage.add_movie("One", 2000, 7.0, user="a#b")
+    storage.add_movie("Two", 2001, 7.0, user="a#b")
+    assert site_generator.generate_site("a#b", template_path, out_dir, page_size=1) == "generated"
+    assert 'href="a%23b~page-2.html"' in read(os.path.join(out_dir, "a#b.html"))
+    assert 'href="a%23b.html"' in read(os.path.join(out_dir, "a#b~page-2.html"))
+
+
+# Test missing template and empty library
+def test_generate_site_no_template(library, tmp_path, capsys):
+    assert site_generator.generate_site("TestUser", str(tmp_path / "missing.html"), str(tmp_path)) == "no_template"
+    assert "Template file not found" in capsys.readouterr().out
+
+
+def test_generate_site_no_movies(library, template_path, tmp_path, capsys):
+    storage.add_user("Empty")
+    assert site_generator.generate_site("Empty", template_path, str(tmp_path)) == "no_movies"
+    assert "No movies available for Empty" in capsys.readouterr().out
+
+
+# Test a username that resolves outside output_dir is refused (e.g. created before validation)
+def test_generate_site_refuses_unsafe_username(library, template_path, tmp_path, capsys):
+    with library.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO users (username) VALUES ('../evil')")
+    storage.add_movie("Movie0", 2000, 7.0, user="../evil")
+    out_dir = tmp_path / "sites"
+    assert site_generator.generate_site("../evil", template_path, str(out_dir)) == "error"
+    assert "Refusing to write outside" in capsys.readouterr().out
+    assert not (tmp_path / "evil.html").exists()
+    with pytest.raises(ValueError):
+        site_generator.site_path(str(out_dir), "sub/x.html")
+
+
+# Test titles are HTML-escaped in the output
+def test_generate_site_escapes_titles(library, template_path, tmp_path):
+    storage.add_movie('<script>alert("x")</script>', 2020, 5.0, poster_url='a.jpg" onerror="x', user="TestUser")
+    out_dir = str(tmp_path / "sites")
+    site_generator.generate_site("TestUser", template_path, out_dir)
+    html = read(os.path.join(out_dir, "TestUser.html"))
+    assert "<script>" not in html
+    assert "&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt;" in html
+    assert 'src="a.jpg&quot; onerror=&quot;x"' in html
+
+
+# Fixture: temp-file DB (worker processes need a database they can open)
+@pytest.fixture
+def file_library(tmp_path, monkeypatch):
+    engine = storage.create_storage_engine(f"sqlite:///{tmp_path / 'movies.db'}")
+    monkeypatch.setattr(storage, "engine", engine)
+    storage.init_db()
+    for user in ("Ann", "Ben", "Cid"):
+        storage.add_user(user)
+        storage.add_movies_bulk([{"title": f"{user} Movie {i}", "year": 2000, "rating": 6.0}
+                                 for i in range(3)], user=user)
+    storage.add_user("Nobody")
+    yield engine
+    engine.dispose()
+
+
+# Test all users are generated in a process pool and unchanged ones are skipped
+def test_generate_all_sites(file_library, template_path, tmp_path, capsys):
+    out_dir = str(tmp_path / "sites")
+    results = site_generator.generate_all_sites(workers=2, template_path=template_path, output_dir=out_dir)
+    statuses = {r["user"]: r["status"] for r in results}
+    assert statuses == {"Ann": "generated", "Ben": "generated", "Cid": "generated", "Nobody": "no_movies"}
+    assert "Ben Movie 2" in read(os.path.join(out_dir, "Ben.html"))
+    assert "4 sites in" in capsys.readouterr().out
+
+    storage.add_movie("Ben Movie 3", 2001, 7.0, user="Ben")
+    results = site_generator.generate_all_sites(["Ann", "Ben"], workers=2,
+                                                template_path=template_path, output_dir=out_dir)
+    assert {r["user"]: r["status"] for r in results} == {"Ann": "unchanged", "Ben": "generated"}
+
+
+# Test in-process mode and the CLI command
+def test_generate_all_sites_cli(file_library, template_path, tmp_path, monkeypatch):
+    import cli
+    out_dir = str(tmp_path / "sites")
+    monkeypatch.setattr(site_generator, "TEMPLATE_PATH", template_path)
+    monkeypatch.setattr(site_generator, "OUTPUT_DIR", out_dir)
+    assert cli.main(["generate-all", "--users", "Ann", "Cid", "--workers", "1"]) == 0
+    assert sorted(os.listdir(out_dir)) == [".Ann.sha256", ".Cid.sha256", "Ann.html", "Cid.html"]
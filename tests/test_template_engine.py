@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+import template_engine
+from template_engine import Markup, Template, escape, load_template
+
+
+# Test parsing into literal and placeholder segments
+def test_template_segments():
+    template = Template("<h1>__TITLE__</h1>__BODY__")
+    assert template.segments == [(False, "<h1>"), (True, "__TITLE__"), (False, "</h1>"), (True, "__BODY__")]
+
+
+# Test rendering, escaping and unknown placeholders
+def test_render_escapes_values():
+    template = Template("<h1>__TITLE__</h1><p>__YEAR__</p>__RAW__ __MISSING__")
+    html = template.render({"__TITLE__": "Tom & Jerry <3", "__YEAR__": 1940, "__RAW__": Markup("<br>")})
+    assert html == "<h1>Tom &amp; Jerry &lt;3</h1><p>1940</p><br> "
+
+
+# Test iterables are streamed chunk by chunk
+def test_render_iter_streams_iterables():
+    chunks = list(Template("a__X__b").render_iter({"__X__": iter(["1", "2"])}))
+    assert chunks == ["a", "1", "2", "b"]
+
+
+# Test None renders as empty, and bytes or other scalars are escaped rather than iterated
+def test_render_none_and_scalars():
+    template = Template("<p>__NONE__|__BYTES__|__FLAG__|__LIST__</p>")
+    html = template.render({"__NONE__": None, "__BYTES__": b"<b>", "__FLAG__": True,
+                            "__LIST__": [Markup("<i>"), "x"]})
+    assert html == "<p>|b&#x27;&lt;b&gt;&#x27;|True|<i>x</p>"
+
+
+def test_escape_is_idempotent_for_markup():
+    assert escape(escape("<")) == "&lt;"
+    assert escape('"') == "&quot;"
+
+
+# Test templates are cached by mtime
+def test_load_template_cache(tmp_path):
+    template_engine.clear_cache()
+    path = tmp_path / "page.html"
+    path.write_text("v1 __X__", encoding="utf-8")
+    first = load_template(str(path))
+    assert load_template(str(path)) is first
+
+    path.write_text("v2 __X__", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second = load_template(str(path))
+    assert second is not first
+    assert second.render({"__X__": "ok"}) == "v2 ok"
+
+
+def test_load_template_missing(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_template(str(tmp_path / "missing.html"))